@@ -1,8 +1,13 @@
+from models.ai.batch_eval import get_evaluator
 from models.ai.light import LightBoard, LightPlayer
 from models.piece.piece import Piece
 from models.piece.chess_pieces import ChessPawn
 from models.game.game import Game
-from models.piece.pieces_info import PIECE_CLASSES, PIECE_VALUES, POSITION_SCORES_SETTING
+from models.ai.evaluation_params import PIECE_VALUES, POSITION_SCORES_SETTING
+from models.piece.pieces_info import PIECE_CLASSES
+from models.ai.difficulty import BOOK_MIN_DEPTH
+from models.ai.search_context import SearchContext, SearchTimeout
+from models.ai.transposition_table import EXACT, LOWER_BOUND, UPPER_BOUND
 import random
 
 class AIPlayer:
@@ -11,17 +16,41 @@ class AIPlayer:
     PROMOTE_LINE = 3
 
     @staticmethod
-    def take_action(game: Game, depth: int=3):
+    def take_action(game: Game, depth: int=3, context: SearchContext | None = None, result_cache=None, use_book: bool = True):
         try:
             white_player = LightPlayer(game.white)
             black_player = LightPlayer(game.black)
             board = LightBoard(game, white_player, black_player)
+            team = game.current_player.team
+
+            context = context or SearchContext()
+            # 評価に乱数を足した探索の結果は他の探索と共有しない
+            if context.eval_noise:
+                result_cache = None
+            # 浅い探索が序盤・終盤だけ強くならないように、定跡と終盤データベースは深い探索でだけ使う
+            deep_enough = depth >= BOOK_MIN_DEPTH
+            if context.tablebases is None and context.use_tablebase and deep_enough:
+                from models.ai.tablebase import get_tablebases
+                context.tablebases = get_tablebases()
 
             # AIによる最適なアクションを決定
             if depth > 0:
-                action, _ = AIPlayer.find_best_move(board, game.current_player.team, depth)
+                action, source = None, None
+                if use_book and context.use_book and deep_enough:
+                    action, source = AIPlayer.get_book_action(board, team), "book"
+                if action is None and context.tablebases is not None:
+                    action, source = context.tablebases.best_move(board, team), "tablebase"
+                if action is None:
+                    action, source = AIPlayer.get_cached_action(board, team, depth, result_cache), "cache"
+                if action is None:
+                    (action, score), source = AIPlayer.search(board, team, depth, context), "search"
+                    completed_depth = context.completed_depth
+                    if result_cache is not None and action and completed_depth > 0:
+                        result_cache.put(board.key, team, completed_depth, action, score)
             else:
-                action = AIPlayer.get_random_action(board, game.current_player.team)
+                action, source = AIPlayer.get_random_action(board, team), "random"
+            if context.stats is not None:
+                context.stats.source = source
 
             if not action:
                 print("詰みです")
@@ -65,6 +94,78 @@ class AIPlayer:
             print(f"AIアクションの実行中にエラーが発生しました: {e}")
             return None
         
+    @staticmethod
+    def get_book_action(board: LightBoard, team: str) -> dict | None:
+        """Return the opening book move for this position, if a book is installed."""
+        from models.ai.opening_book import get_opening_book
+
+        book = get_opening_book()
+        return book.get_move(board, team) if book is not None else None
+
+    @staticmethod
+    def get_cached_action(board: LightBoard, team: str, depth: int, result_cache) -> dict | None:
+        """Return the cached move for this position and depth if it is still legal here."""
+        if result_cache is None:
+            return None
+        cached = result_cache.get(board.key, team, depth)
+        if cached is None or cached["move"] not in AIPlayer.get_possible_moves(board, team, depth):
+            return None
+        return cached["move"]
+
+    @staticmethod
+    def analyze(board: LightBoard, team: str, depth: int, k: int, context: SearchContext | None = None) -> list[dict]:
+        """
+        Multi-PV analysis: find the top `k` moves with their scores and principal variations.
+
+        Each candidate is found by searching again with the previously found root
+        moves excluded. All searches share the transposition table, deadline and
+        node budget of `context`; once they run out, the candidates found so far
+        are returned, each with the depth it reached.
+
+        Args:
+            board (LightBoard): The current board state
+            team (str): The team to move
+            depth (int): The search depth of every candidate
+            k (int): Number of candidates
+            context (SearchContext | None): Shared search state
+
+        Returns:
+            list[dict]: Candidates `{"move", "score", "pv", "depth"}`, best first
+        """
+        context = context or SearchContext()
+        candidates = []
+        for _ in range(k):
+            move, score = AIPlayer.search(board, team, depth, context)
+            if not move:
+                break
+            candidates.append({"move": move, "score": score, "pv": context.completed_pv, "depth": context.completed_depth})
+            context.excluded_root_moves.append(move)
+
+        context.excluded_root_moves = []
+        return candidates
+
+    @staticmethod
+    def describe_action(game: Game, action: dict) -> dict | None:
+        """Convert a search move into the client action format (piece id, from, to, promote)."""
+        if action["type"] == "move":
+            piece = game.board.get_piece(action["from"])
+            return {
+                "pieceId": piece.piece_id if piece else None,
+                "actionType": "move",
+                "from": action["from"],
+                "to": action["to"],
+                "promote": action["promote"],
+            }
+        player = game.black if action["team"] == "black" else game.white
+        piece = player.get_captured_piece_by_name(action["name"])
+        return {
+            "pieceId": piece.piece_id if piece else None,
+            "actionType": "place",
+            "from": None,
+            "to": action["position"],
+            "promote": False,
+        }
+
     @staticmethod
     def get_random_action(board, team):
         moves = AIPlayer.get_possible_moves(board, team, 0)
@@ -173,7 +274,7 @@ class AIPlayer:
             {"type": "place", "team": team, "name": piece_name, "position": position}
             for piece_name, ids in player.captured_pieces.items() if len(ids) >= 1 and board.placeable_state[piece_name]
             for position in PIECE_CLASSES[piece_name].get_legal_places_static(
-                team, board.board_size, board.pieces, board.immobile_rows.get(piece_name)
+                team, board.board_size, board.pieces, board.immobile_rows.get(piece_name), board.pawn_columns, board.empty_squares
             )
         ]
 
@@ -228,7 +329,145 @@ class AIPlayer:
             raise ValueError("行動タイプには move か place を指定してください。", move["type"])
             
     @staticmethod
-    def find_best_move(board: LightBoard, maximizing_team: str, depth: int, alpha: float = float('-inf'), beta: float = float('inf')) -> tuple[dict, int]:
+    def search(board: LightBoard, team: str, depth: int, context: SearchContext | None = None) -> tuple[dict, int]:
+        """
+        Search the position, deepening iteratively when the context has a deadline,
+        a stop condition or a progress callback.
+
+        The first iteration always completes, so a move is returned even if the
+        deadline has already passed. An aborted iteration is discarded and the
+        result of the last completed one is used.
+
+        Args:
+            board (LightBoard): The current board state
+            team (str): The team to move
+            depth (int): The maximum search depth
+            context (SearchContext | None): Deadline, stop condition and node counter
+
+        Returns:
+            tuple[dict, int]: The best move and its evaluation score
+        """
+        if context is not None:
+            context.root_ply = len(board.history)
+
+        if context is None or not context.is_iterative:
+            best_move, best_score = AIPlayer.find_best_move(board, team, depth, context=context)
+            if context is not None:
+                context.completed_depth = depth
+                context.completed_pv = AIPlayer.extend_pv_from_tt(board, team, context.principal_variation, depth, context.tt)
+                if context.stats is not None:
+                    context.stats.iterations.append({"depth": depth, "nodes": context.nodes, "timeMs": int(context.elapsed * 1000)})
+            return best_move, best_score
+
+        best_move, best_score = None, None
+        for current_depth in range(1, depth + 1):
+            history_length = len(board.history)
+            iteration_nodes, iteration_started_at = context.nodes, context.elapsed
+            try:
+                move, score = AIPlayer.find_best_move(board, team, current_depth, context=context)
+            except SearchTimeout:
+                # 探索途中の手を盤面から巻き戻す
+                while len(board.history) > history_length:
+                    board.undo_action()
+                break
+
+            best_move, best_score = move, score
+            context.completed_depth = current_depth
+            context.completed_pv = AIPlayer.extend_pv_from_tt(board, team, context.principal_variation, current_depth, context.tt)
+            context.armed = True
+
+            if context.stats is not None:
+                context.stats.iterations.append({
+                    "depth": current_depth,
+                    "nodes": context.nodes - iteration_nodes,
+                    "timeMs": int((context.elapsed - iteration_started_at) * 1000),
+                })
+
+            if context.on_iteration is not None:
+                context.on_iteration({
+                    "depth": current_depth,
+                    "score": score,
+                    "pv": context.completed_pv,
+                    "nodes": context.nodes,
+                    "nps": context.nps,
+                    "timeMs": int(context.elapsed * 1000),
+                })
+
+        return best_move, best_score
+
+    @staticmethod
+    def extend_pv_from_tt(board: LightBoard, team: str, pv: list[dict], depth: int, tt) -> list[dict]:
+        """
+        Complete a principal variation cut short by transposition table hits
+        by following the best moves stored in the table.
+        """
+        pv = list(pv)
+        played = 0
+        current_team = team
+        try:
+            for move in pv:
+                AIPlayer.perform_move(move, board, current_team)
+                played += 1
+                current_team = AIPlayer.NEGATIVE_TEAM if current_team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+
+            while len(pv) < depth:
+                entry = tt.probe(board.key)
+                if entry is None or entry[3] is None or entry[3] not in AIPlayer.get_possible_moves(board, current_team, 0):
+                    break
+                pv.append(entry[3])
+                AIPlayer.perform_move(entry[3], board, current_team)
+                played += 1
+                current_team = AIPlayer.NEGATIVE_TEAM if current_team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+        finally:
+            for _ in range(played):
+                board.undo_action()
+
+        return pv
+
+    @staticmethod
+    def evaluate_children(board: LightBoard, team: str, moves: list[dict], context: SearchContext | None) -> list[float]:
+        """
+        Static scores of the positions reached by each move.
+
+        Scores found in the evaluation cache are reused and the rest are
+        computed in one batch by the `BatchEvaluator`. The evaluation noise of
+        the context is added last.
+        """
+        evaluator = get_evaluator(board.board_size)
+        if context is None or (context.eval_cache is None and not context.eval_noise):
+            return evaluator.evaluate_children(board, team, moves)
+
+        eval_cache = context.eval_cache
+        keys = [
+            board.move_key(team, move["from"], move["to"], move["promote"]) if move["type"] == "move"
+            else board.place_key(move["team"], move["name"], move["position"])
+            for move in moves
+        ]
+        if eval_cache is None:
+            scores = evaluator.evaluate_children(board, team, moves)
+        else:
+            scores = [eval_cache.probe(key) for key in keys]
+            missing = [index for index, score in enumerate(scores) if score is None]
+            if missing:
+                for index, score in zip(missing, evaluator.evaluate_children(board, team, [moves[index] for index in missing])):
+                    scores[index] = score
+                    eval_cache.store(keys[index], score)
+
+        if context.eval_noise:
+            scores = [score + context.noise(key) for score, key in zip(scores, keys)]
+        return scores
+
+    @staticmethod
+    def visit_leaf(score: float, context: SearchContext | None, ply: int) -> float:
+        """Count a leaf scored by the batch evaluator as if `find_best_move` had been called on it."""
+        if context is not None:
+            context.on_node()
+            if context.stats is not None and ply > context.stats.max_ply:
+                context.stats.max_ply = ply
+        return score
+
+    @staticmethod
+    def find_best_move(board: LightBoard, maximizing_team: str, depth: int, alpha: float = float('-inf'), beta: float = float('inf'), context: SearchContext | None = None) -> tuple[dict, int]:
         """
         Find the best move using the minimax algorithm with alpha-beta pruning.
 
@@ -238,52 +477,145 @@ class AIPlayer:
             depth (int): The depth of the minimax search
             alpha (float): The best score that the maximizing player can guarantee
             beta (float): The best score that the minimizing player can guarantee
+            context (SearchContext | None): Shared search state (node counter, deadline, transposition table)
 
         Returns:
             tuple[dict, int]: The best move and its evaluation score
         """
+        tt = None
+        stats = None
+        is_root = False
+        ply = 0
+        if context is not None:
+            context.on_node()
+            ply = len(board.history) - context.root_ply
+            context.clear_pv(ply)
+            tt = context.tt
+            stats = context.stats
+            is_root = ply == 0
+            if stats is not None and ply > stats.max_ply:
+                stats.max_ply = ply
+
+            # 終盤データベースに載っている局面は探索せずに値を返す
+            if context.tablebases is not None and not is_root:
+                tablebase_score = context.tablebases.score(board, maximizing_team)
+                if tablebase_score is not None:
+                    if stats is not None:
+                        stats.tablebase_hits += 1
+                    return None, tablebase_score
+
         if depth == 0:
-            return None, AIPlayer.calculate_current_score(board)
+            if context is None:
+                return None, AIPlayer.calculate_current_score(board)
+            score = context.eval_cache.probe(board.key) if context.eval_cache is not None else None
+            if score is None:
+                score = AIPlayer.calculate_current_score(board)
+                if context.eval_cache is not None:
+                    context.eval_cache.store(board.key, score)
+            if context.eval_noise:
+                score += context.noise(board.key)
+            return None, score
+
+        # 置換表の参照 (ルートでは手が必要なので打ち切らない)
+        tt_move = None
+        if tt is not None:
+            entry = tt.probe(board.key)
+            if stats is not None:
+                stats.tt_probes += 1
+                stats.tt_hits += entry is not None
+            if entry is not None:
+                entry_depth, entry_score, entry_flag, tt_move = entry
+                if not is_root and entry_depth >= depth:
+                    if entry_flag == EXACT:
+                        if stats is not None:
+                            stats.tt_cutoffs += 1
+                        return tt_move, entry_score
+                    if entry_flag == LOWER_BOUND:
+                        alpha = max(alpha, entry_score)
+                    elif entry_flag == UPPER_BOUND:
+                        beta = min(beta, entry_score)
+                    if beta <= alpha:
+                        if stats is not None:
+                            stats.tt_cutoffs += 1
+                        return tt_move, entry_score
+        alpha_orig, beta_orig = alpha, beta
+
+        possible_moves = AIPlayer.get_possible_moves(board, maximizing_team, depth)
+        if is_root and context.excluded_root_moves:
+            possible_moves = [move for move in possible_moves if move not in context.excluded_root_moves]
+        if tt_move is not None and tt_move in possible_moves:
+            # 置換表の最善手を最初に読む
+            possible_moves.remove(tt_move)
+            possible_moves.insert(0, tt_move)
+
+        # 最後の1手は子局面をまとめて評価する (終盤データベースを引く場合は1局面ずつ)
+        leaf_scores = None
+        if depth == 1 and (context is None or context.tablebases is None):
+            leaf_scores = AIPlayer.evaluate_children(board, maximizing_team, possible_moves, context)
 
         best_move = None
         if maximizing_team == AIPlayer.POSITIVE_TEAM:
             best_score = float('-inf')
-            possible_moves = AIPlayer.get_possible_moves(board, maximizing_team, depth)
 
-            for move in possible_moves:
-                # Perform the move with optional promotion
-                AIPlayer.perform_move(move, board, maximizing_team)
+            for index, move in enumerate(possible_moves):
+                if leaf_scores is not None:
+                    score = AIPlayer.visit_leaf(leaf_scores[index], context, ply + 1)
+                else:
+                    # Perform the move with optional promotion
+                    AIPlayer.perform_move(move, board, maximizing_team)
 
-                _, score = AIPlayer.find_best_move(board, AIPlayer.NEGATIVE_TEAM, depth - 1, alpha, beta)
-                board.undo_action()
+                    _, score = AIPlayer.find_best_move(board, AIPlayer.NEGATIVE_TEAM, depth - 1, alpha, beta, context)
+                    board.undo_action()
 
                 # Update the best move and score
                 if score > best_score:
                     best_score, best_move = score, move
+                    if context is not None:
+                        context.update_pv(ply, move)
                 alpha = max(alpha, best_score)
 
                 # Alpha-beta pruning
                 if beta <= alpha:
+                    if stats is not None:
+                        stats.cutoffs += 1
+                        stats.first_move_cutoffs += index == 0
                     break
 
         else:
             best_score = float('inf')
-            possible_moves = AIPlayer.get_possible_moves(board, maximizing_team, depth)
 
-            for move in possible_moves:
-                # Perform the move with optional promotion
-                AIPlayer.perform_move(move, board, maximizing_team)
+            for index, move in enumerate(possible_moves):
+                if leaf_scores is not None:
+                    score = AIPlayer.visit_leaf(leaf_scores[index], context, ply + 1)
+                else:
+                    # Perform the move with optional promotion
+                    AIPlayer.perform_move(move, board, maximizing_team)
 
-                _, score = AIPlayer.find_best_move(board, AIPlayer.POSITIVE_TEAM, depth - 1, alpha, beta)
-                board.undo_action()
+                    _, score = AIPlayer.find_best_move(board, AIPlayer.POSITIVE_TEAM, depth - 1, alpha, beta, context)
+                    board.undo_action()
 
                 # Update the best move and score
                 if score < best_score:
                     best_score, best_move = score, move
+                    if context is not None:
+                        context.update_pv(ply, move)
                 beta = min(beta, best_score)
 
                 # Alpha-beta pruning
                 if beta <= alpha:
+                    if stats is not None:
+                        stats.cutoffs += 1
+                        stats.first_move_cutoffs += index == 0
                     break
 
+        # 除外手があるルートの結果は局面の正しい値ではないので保存しない
+        if tt is not None and not (is_root and context.excluded_root_moves):
+            if best_score <= alpha_orig:
+                flag = UPPER_BOUND
+            elif best_score >= beta_orig:
+                flag = LOWER_BOUND
+            else:
+                flag = EXACT
+            tt.store(board.key, depth, best_score, flag, best_move)
+
         return best_move, best_score
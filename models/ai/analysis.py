@@ -0,0 +1,64 @@
+import json
+import time
+from models.ai.ai_player import AIPlayer
+from models.ai.light import LightBoard, LightPlayer
+from models.ai.result_cache import engine_settings_key
+from models.ai.search_context import MAX_SEARCH_SECONDS, SearchContext
+from models.game.game import Game
+
+# 同じ局面の解析結果は1日保持する
+ANALYSIS_TTL_IN_SECONDS = 24 * 60 * 60
+# 1回の解析で返す候補手の上限 (候補ごとに探索し直すため)
+MAX_ANALYSIS_CANDIDATES = 10
+
+
+def analysis_key(position_key: int, depth: int, k: int) -> str:
+    # 評価関数を調整し直したら古い解析結果は使わない
+    return f"analysis:{engine_settings_key()}:{position_key:016x}:{depth}:{k}"
+
+
+def analyze_game(game: Game, depth: int, k: int, redis_client=None, timeout: float = MAX_SEARCH_SECONDS) -> dict:
+    """
+    Return the top `k` candidate moves for the current position of `game`.
+
+    The whole analysis stops after `timeout` seconds; candidates that did not
+    reach `depth` report the depth they did reach. Only complete results are
+    cached in Redis (by engine settings, position key, depth and `k`), so repeated requests on
+    the same position do not search again.
+
+    Args:
+        game (Game): The game to analyze (not modified)
+        depth (int): Search depth of each candidate
+        k (int): Number of candidates
+        redis_client: Redis client used as the result cache, or None to always search
+        timeout (float): Seconds the analysis may take
+
+    Returns:
+        dict: `{"positionKey", "depth", "candidates", "cached"}`
+    """
+    deadline = time.monotonic() + timeout
+    board = LightBoard(game, LightPlayer(game.white), LightPlayer(game.black))
+    key = analysis_key(board.key, depth, k)
+
+    if redis_client is not None:
+        cached = redis_client.get(key)
+        if cached:
+            return {**json.loads(cached), "cached": True}
+
+    candidates = [
+        {
+            "action": AIPlayer.describe_action(game, candidate["move"]),
+            "score": candidate["score"],
+            "pv": candidate["pv"],
+            "depth": candidate["depth"],
+        }
+        for candidate in AIPlayer.analyze(board, game.current_player.team, depth, k, SearchContext(deadline=deadline))
+    ]
+    result = {"positionKey": f"{board.key:016x}", "depth": depth, "candidates": candidates}
+
+    # 時間切れで打ち切った結果は保存しない
+    complete = time.monotonic() < deadline and all(candidate["depth"] == depth for candidate in candidates)
+    if redis_client is not None and complete:
+        redis_client.set(key, json.dumps(result), ex=ANALYSIS_TTL_IN_SECONDS)
+
+    return {**result, "cached": False}
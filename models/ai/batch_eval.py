@@ -0,0 +1,167 @@
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from models.ai.evaluation_params import PIECE_VALUES, PROM_PIECE_VALUES, POSITION_SCORES_SETTING
+from models.ai.light import LightBoard
+
+# AIPlayer.calculate_current_score と同じ位置評価の係数
+POSITION_RATE = 0.3
+TEAMS = ("white", "black")
+PIECE_NAMES = list(PIECE_VALUES)
+
+
+def piece_type(name: str, team: str, is_promoted: bool) -> int:
+    """Index of a piece type in the piece-square table; 0 is an empty square."""
+    return 1 + (PIECE_NAMES.index(name) * 2 + TEAMS.index(team)) * 2 + int(is_promoted)
+
+
+def hand_index(name: str, team: str) -> int:
+    return TEAMS.index(team) * len(PIECE_NAMES) + PIECE_NAMES.index(name)
+
+
+class BatchEvaluator:
+    """
+    Evaluates many positions of one board size in a single NumPy pass.
+
+    A position is a row of piece types per square (`piece_type`, square
+    index y * size + x) plus a row of hand counts (`hand_index`). The score
+    equals `AIPlayer.calculate_current_score` up to float rounding.
+    """
+    def __init__(self, board_size: int):
+        self.board_size = board_size
+        self.columns = np.arange(board_size * board_size)
+
+        # 駒の種類 × マスごとに、駒の価値と位置評価を足した値を持つ
+        self.table = np.zeros((1 + len(PIECE_NAMES) * 4, board_size * board_size))
+        center = (board_size - 1) / 2
+        xs = self.columns % board_size
+        ys = self.columns // board_size
+        for name in PIECE_NAMES:
+            setting = POSITION_SCORES_SETTING[name]
+            row_scores = (center - ys) * setting["row"]
+            col_scores = np.abs((center - xs) * setting["col"])
+            for team, sign in (("white", 1), ("black", -1)):
+                position_scores = (row_scores - sign * col_scores) * POSITION_RATE
+                for is_promoted in (False, True):
+                    value = PROM_PIECE_VALUES.get(name, PIECE_VALUES[name]) if is_promoted else PIECE_VALUES[name]
+                    self.table[piece_type(name, team, is_promoted)] = sign * value + position_scores
+
+        self.hand_values = np.array([
+            sign * PIECE_VALUES[name] for sign in (1, -1) for name in PIECE_NAMES
+        ], dtype=float)
+
+    def encode(self, board: LightBoard) -> tuple[np.ndarray, np.ndarray]:
+        squares = np.zeros(self.board_size * self.board_size, dtype=np.intp)
+        for (x, y), piece in board.pieces.items():
+            squares[y * self.board_size + x] = piece_type(piece.name, piece.team, piece.is_promoted)
+        hands = np.zeros(len(self.hand_values))
+        for team in TEAMS:
+            for name, pieces in board.get_player(team).captured_pieces.items():
+                hands[hand_index(name, team)] = len(pieces)
+        return squares, hands
+
+    def encode_children(self, board: LightBoard, team: str, moves: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Encode the positions reached by each move without playing them on the board.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Piece types (moves x squares) and hand counts (moves x hand slots)
+        """
+        squares, hands = self.encode(board)
+        boards = np.repeat(squares[None, :], len(moves), axis=0)
+        hand_rows = np.repeat(hands[None, :], len(moves), axis=0)
+
+        size = self.board_size
+        from_rows, from_squares = [], []
+        to_squares, to_types = [], []
+        hand_rows_changed, hand_slots, hand_deltas = [], [], []
+        for row, move in enumerate(moves):
+            if move["type"] == "move":
+                (fx, fy), (tx, ty) = move["from"], move["to"]
+                piece = board.pieces[move["from"]]
+                from_rows.append(row)
+                from_squares.append(fy * size + fx)
+                to_squares.append(ty * size + tx)
+                to_types.append(piece_type(piece.name, piece.team, piece.is_promoted or move["promote"]))
+                enemy = board.pieces.get(move["to"])
+                if enemy:
+                    hand_rows_changed.append(row)
+                    hand_slots.append(hand_index(enemy.name, team))
+                    hand_deltas.append(1)
+            else:
+                x, y = move["position"]
+                to_squares.append(y * size + x)
+                to_types.append(piece_type(move["name"], move["team"], False))
+                hand_rows_changed.append(row)
+                hand_slots.append(hand_index(move["name"], move["team"]))
+                hand_deltas.append(-1)
+
+        boards[from_rows, from_squares] = 0
+        boards[np.arange(len(moves)), to_squares] = to_types
+        hand_rows[hand_rows_changed, hand_slots] += hand_deltas
+        return boards, hand_rows
+
+    def evaluate(self, boards: np.ndarray, hands: np.ndarray) -> np.ndarray:
+        return self.table[boards, self.columns].sum(axis=1) + hands @ self.hand_values
+
+    def evaluate_children(self, board: LightBoard, team: str, moves: list[dict]) -> list[float]:
+        """Scores of the positions reached by each move, positive for white."""
+        if not moves:
+            return []
+        return self.evaluate(*self.encode_children(board, team, moves)).tolist()
+
+
+_evaluators: dict[int, BatchEvaluator] = {}
+
+
+def get_evaluator(board_size: int) -> BatchEvaluator:
+    evaluator = _evaluators.get(board_size)
+    if evaluator is None:
+        evaluator = _evaluators[board_size] = BatchEvaluator(board_size)
+    return evaluator
+
+
+def main():
+    from models.ai.ai_player import AIPlayer
+    from models.ai.bench import bench_positions
+
+    parser = argparse.ArgumentParser(description="Compare batched and scalar leaf evaluation on the bench positions.")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    scalar_time = batch_time = 0.0
+    leaves = 0
+    max_error = 0.0
+    for name, board, team in bench_positions():
+        with contextlib.redirect_stdout(io.StringIO()):
+            moves = AIPlayer.get_possible_moves(board, team, 0)
+        evaluator = get_evaluator(board.board_size)
+
+        started_at = time.perf_counter()
+        for _ in range(args.repeat):
+            scalar_scores = []
+            for move in moves:
+                AIPlayer.perform_move(move, board, team)
+                scalar_scores.append(AIPlayer.calculate_current_score(board))
+                board.undo_action()
+        scalar_time += time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        for _ in range(args.repeat):
+            batch_scores = evaluator.evaluate_children(board, team, moves)
+        batch_time += time.perf_counter() - started_at
+
+        error = max((abs(a - b) for a, b in zip(scalar_scores, batch_scores)), default=0.0)
+        max_error = max(max_error, error)
+        leaves += len(moves) * args.repeat
+        print(f"{name}: {len(moves)} children, max difference {error:.2e}")
+
+    print(f"Scalar : {leaves / scalar_time:.0f} leaves/s")
+    print(f"Batched: {leaves / batch_time:.0f} leaves/s ({scalar_time / batch_time:.1f}x)")
+    print(f"Max difference: {max_error:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import contextlib
+import io
+import json
+from models.ai.ai_player import AIPlayer
+from models.ai.eval_cache import EvalCache
+from models.ai.light import LightBoard, LightPlayer
+from models.ai.search_context import SearchContext
+from models.game.board import Board
+from models.game.board_initializer import BoardInitializer
+from models.game.game import Game
+from models.game.player import Player
+
+# 各盤種の中盤局面。初期配置からの手順で表す
+# 移動は (from, to) または (from, to, promote)、打ちは (駒名, position)
+MIDDLEGAMES = [
+    ("shogi", "shogi", [
+        ((2, 6), (2, 5)), ((6, 2), (6, 3)), ((7, 7), (8, 7)), ((1, 1), (4, 1)),
+        ((1, 7), (7, 1)), ((6, 0), (7, 1)), ((2, 8), (3, 7)), ("ShogiBishop", (1, 7)),
+        ("ShogiBishop", (8, 4)), ((7, 2), (7, 3)), ((8, 4), (7, 3)), ((4, 0), (3, 1)),
+        ((0, 8), (0, 7)), ((1, 7), (0, 8), True), ((1, 8), (2, 6)), ((0, 8), (0, 7)),
+    ]),
+    ("shogi", "wideChess", [
+        ((5, 7), (5, 6)), ((3, 1), (3, 3)), ((5, 8), (5, 7)), ((0, 1), (0, 2)),
+        ((7, 8), (6, 6)), ((0, 2), (0, 3)), ((5, 7), (1, 3)), ((2, 0), (7, 5)),
+        ((6, 6), (5, 4)), ((7, 5), (6, 4)), ((1, 3), (1, 1)), ((6, 4), (3, 7), True),
+        ((1, 8), (3, 7)), ("ChessPawn", (5, 7)), ((6, 8), (5, 7)), ((7, 0), (6, 2)),
+    ]),
+    ("shogi", "replaceShogi", [
+        ((7, 7), (2, 7)), ((1, 1), (3, 1)), ((6, 6), (6, 5)), ((8, 0), (8, 1)),
+        ((7, 8), (6, 6)), ((0, 2), (0, 4)), ((6, 6), (5, 4)), ((4, 2), (4, 4)),
+        ((1, 8), (3, 7)), ((6, 2), (6, 4)), ((3, 7), (4, 5)), ((8, 2), (8, 4)),
+        ((4, 5), (6, 4)), ((1, 2), (1, 4)), ((6, 4), (7, 2), True), ((6, 0), (8, 2)),
+    ]),
+    ("chess", "chess", [
+        ((1, 6), (1, 4)), ((7, 1), (7, 2)), ((6, 6), (6, 4)), ((0, 1), (0, 2)),
+        ((6, 7), (5, 5)), ((6, 0), (5, 2)), ((5, 5), (4, 3)), ((3, 1), (3, 3)),
+        ((6, 4), (6, 3)), ((7, 2), (6, 3)), ((1, 7), (2, 5)), ((7, 0), (7, 4)),
+        ((0, 6), (0, 4)), ((7, 4), (1, 4)), ((0, 4), (0, 3)), ((3, 3), (3, 4)),
+    ]),
+    ("chess", "narrowShogi", [
+        ((5, 7), (5, 6)), ((5, 2), (5, 3)), ((6, 7), (7, 6)), ((4, 0), (5, 1)),
+        ((3, 5), (3, 4)), ((6, 1), (3, 4)), ((2, 7), (3, 6)), ((2, 0), (3, 1)),
+        ((3, 6), (3, 5)), ((3, 4), (2, 3)), ((3, 5), (4, 4)), ((6, 0), (6, 1)),
+        ((4, 4), (5, 3)), ((4, 2), (4, 3)), ((0, 5), (0, 4)), ((6, 2), (6, 3)),
+    ]),
+    ("chess", "replaceChess", [
+        ((3, 6), (3, 5)), ((4, 1), (4, 2)), ((1, 6), (1, 5)), ((6, 0), (5, 2)),
+        ((1, 5), (1, 4)), ((5, 0), (1, 4)), ((2, 6), (2, 5)), ((1, 0), (2, 2)),
+        ((2, 7), (6, 3)), ((1, 4), (2, 5)), ((1, 7), (2, 5)), ((2, 2), (3, 4)),
+        ((3, 5), (3, 4)), ((2, 1), (2, 2)), ((6, 7), (5, 5)), ((3, 1), (3, 2)),
+    ]),
+]
+
+
+def create_board(board_type: str, black_board: str, white_board: str, black_placeable: bool = True, white_placeable: bool = True) -> tuple[LightBoard, str]:
+    game = Game(
+        black=Player("black", "black", []),
+        white=Player("white", "white", []),
+        board=Board(board_type, black_board, white_board, black_placeable, white_placeable),
+    )
+    return LightBoard(game, LightPlayer(game.white), LightPlayer(game.black)), game.current_player.team
+
+
+def compact_move(move: dict) -> tuple:
+    """Convert a search move into the compact notation of `MIDDLEGAMES`."""
+    if move["type"] == "place":
+        return (move["name"], move["position"])
+    return (move["from"], move["to"], True) if move["promote"] else (move["from"], move["to"])
+
+
+def play_moves(board: LightBoard, team: str, moves: list[tuple]) -> str:
+    """Play a move list in the compact notation of `MIDDLEGAMES` and return the team to move."""
+    for move in moves:
+        if isinstance(move[0], str):
+            board.place(team, move[0], move[1])
+        else:
+            board.move(team, move[0], move[1], promote=len(move) > 2 and move[2])
+        team = AIPlayer.NEGATIVE_TEAM if team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+    return team
+
+
+def bench_positions() -> list[tuple[str, LightBoard, str]]:
+    """The fixed suite: every initial layout pair followed by the curated middlegames."""
+    positions = []
+    for board_type, black_board, white_board in BoardInitializer.layout_pairs():
+        board, team = create_board(board_type, black_board, white_board)
+        positions.append((f"{board_type} {black_board} vs {white_board}", board, team))
+    for board_type, layout, moves in MIDDLEGAMES:
+        board, team = create_board(board_type, layout, layout)
+        team = play_moves(board, team, moves)
+        positions.append((f"{board_type} {layout} middlegame", board, team))
+    return positions
+
+
+def bench(depth: int = 3, eval_cache_size: int = 0) -> dict:
+    """
+    Search every bench position to a fixed depth with a fresh transposition table.
+
+    The total node count only changes when the search or move generation
+    changes, so it doubles as a functional signature of the engine.
+
+    Args:
+        depth (int): Search depth
+        eval_cache_size (int): Slots of a fresh evaluation cache per position (0 disables it)
+    """
+    results = []
+    for name, board, team in bench_positions():
+        context = SearchContext(eval_cache=EvalCache(eval_cache_size) if eval_cache_size else None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            move, score = AIPlayer.search(board, team, depth, context)
+        results.append({
+            "position": name,
+            "nodes": context.nodes,
+            "evalCacheHits": context.eval_cache.hits if eval_cache_size else 0,
+            "evalCacheMisses": context.eval_cache.misses if eval_cache_size else 0,
+            "timeMs": context.elapsed * 1000,
+            "score": score,
+            "move": move,
+        })
+
+    nodes = sum(result["nodes"] for result in results)
+    elapsed = sum(result["timeMs"] for result in results) / 1000
+    hits = sum(result["evalCacheHits"] for result in results)
+    probes = hits + sum(result["evalCacheMisses"] for result in results)
+    return {
+        "depth": depth,
+        "positions": results,
+        "nodes": nodes,
+        "evalCacheHitRate": hits / probes if probes else 0.0,
+        "timeMs": int(elapsed * 1000),
+        "nps": int(nodes / elapsed) if elapsed > 0 else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search a fixed suite of positions and print nodes, time and NPS.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--eval-cache", type=int, default=0, metavar="SIZE", help="Search with an evaluation cache of this many slots")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    args = parser.parse_args()
+
+    result = bench(args.depth, args.eval_cache)
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    for position in result["positions"]:
+        print(f"{position['position']}: {position['nodes']} nodes, {position['timeMs']:.0f} ms")
+    print(f"Total time (ms) : {result['timeMs']}")
+    print(f"Nodes searched  : {result['nodes']}")
+    print(f"Nodes/second    : {result['nps']}")
+    if args.eval_cache:
+        print(f"Eval cache hits : {result['evalCacheHitRate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import time
+from models.ai.search_context import SearchContext
+
+# 強さの段階。盤種によらず同じノード数・時間で打ち切るので、1手あたりの負荷が揃う
+#   depth: 最大探索深さ (反復深化の上限)
+#   nodes: 1手あたりのノード数の上限
+#   time: 1手あたりの秒数の上限
+#   noise: 静的評価に足す乱数の振れ幅 (歩1枚 ≒ 1)
+#   book / tablebase: 定跡・終盤データベースの手を指すか (弱い段階が序盤・終盤だけ強くならないように)
+DIFFICULTY_LEVELS: dict[str, dict] = {
+    "beginner": {"depth": 2, "nodes": 500, "time": 0.3, "noise": 4.0, "book": False, "tablebase": False},
+    "easy": {"depth": 3, "nodes": 3000, "time": 0.5, "noise": 2.0, "book": False, "tablebase": False},
+    "normal": {"depth": 4, "nodes": 15000, "time": 1.0, "noise": 0.8, "book": False, "tablebase": False},
+    "hard": {"depth": 6, "nodes": 60000, "time": 2.0, "noise": 0.2, "book": True, "tablebase": True},
+    "expert": {"depth": 10, "nodes": 200000, "time": 4.0, "noise": 0.0, "book": True, "tablebase": True},
+}
+
+# depth だけで指定された探索でも、定跡・終盤データベースは強い段階と同じ深さ以上でだけ使う
+BOOK_MIN_DEPTH = min(profile["depth"] for profile in DIFFICULTY_LEVELS.values() if profile["book"] or profile["tablebase"])
+
+
+def get_difficulty(level: str) -> dict:
+    """Return the profile of a difficulty level, raising ValueError for unknown levels."""
+    profile = DIFFICULTY_LEVELS.get(level)
+    if profile is None:
+        raise ValueError(f"Unknown difficulty: {level}. Expected one of {', '.join(DIFFICULTY_LEVELS)}.")
+    return profile
+
+
+def create_context(level: str, deadline: float | None = None, **kwargs) -> SearchContext:
+    """
+    Build a search context limited by the node and time budget of a difficulty level,
+    with the opening book and the tablebases enabled only if the level uses them.
+
+    Args:
+        level (str): Key of `DIFFICULTY_LEVELS`
+        deadline (float | None): Earlier `time.monotonic()` deadline to respect (e.g. a job deadline)
+        **kwargs: Other `SearchContext` arguments (stop condition, progress callback, stats)
+
+    Returns:
+        SearchContext: The context to pass to `AIPlayer.take_action` with `profile["depth"]`
+    """
+    profile = get_difficulty(level)
+    level_deadline = time.monotonic() + profile["time"]
+    return SearchContext(
+        deadline=min(level_deadline, deadline) if deadline is not None else level_deadline,
+        max_nodes=profile["nodes"],
+        eval_noise=profile["noise"],
+        use_book=profile["book"],
+        use_tablebase=profile["tablebase"],
+        **kwargs,
+    )
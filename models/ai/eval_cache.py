@@ -0,0 +1,46 @@
+import os
+
+EVAL_CACHE_SIZE = int(os.getenv("AI_EVAL_CACHE_SIZE", 1 << 16))
+
+
+class EvalCache:
+    """
+    Static evaluation scores keyed by the Zobrist key of the position.
+
+    Direct-mapped: each key has a single slot and a new score simply
+    replaces whatever was stored there. Unlike the transposition table the
+    score does not depend on depth or bounds, so a hit can be used as is.
+
+    Args:
+        size (int): Number of slots
+    """
+    def __init__(self, size: int = EVAL_CACHE_SIZE):
+        self.size = size
+        self.keys: list[int | None] = [None] * size
+        self.scores: list[float] = [0.0] * size
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key: int) -> float | None:
+        index = key % self.size
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[index]
+        self.misses += 1
+        return None
+
+    def store(self, key: int, score: float):
+        index = key % self.size
+        self.keys[index] = key
+        self.scores[index] = score
+
+    @property
+    def hit_rate(self) -> float:
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.scores = [0.0] * self.size
+        self.hits = 0
+        self.misses = 0
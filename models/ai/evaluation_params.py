@@ -0,0 +1,49 @@
+import copy
+import json
+import os
+from models.piece import pieces_info
+
+# 調整済みの評価パラメータ。ファイルが無ければ pieces_info の手調整値を使う
+EVALUATION_PARAMS_PATH = os.getenv("EVALUATION_PARAMS_PATH", "params/evaluation.json")
+
+
+def default_params() -> dict:
+    return {
+        "version": 0,
+        "piece_values": dict(pieces_info.PIECE_VALUES),
+        "prom_piece_values": dict(pieces_info.PROM_PIECE_VALUES),
+        "position_scores": copy.deepcopy(pieces_info.POSITION_SCORES_SETTING),
+    }
+
+
+def load_params(path: str = EVALUATION_PARAMS_PATH) -> dict:
+    """
+    Load evaluation parameters written by `models.ai.tuning`.
+
+    Values missing from the file (e.g. pieces added later) keep their defaults.
+    """
+    params = default_params()
+    if not os.path.exists(path):
+        return params
+
+    with open(path, encoding="utf-8") as f:
+        loaded = json.load(f)
+    params["version"] = loaded.get("version", 0)
+    params["piece_values"].update(loaded.get("piece_values", {}))
+    params["prom_piece_values"].update(loaded.get("prom_piece_values", {}))
+    for name, setting in loaded.get("position_scores", {}).items():
+        params["position_scores"].setdefault(name, {}).update(setting)
+    return params
+
+
+def write_params(params: dict, path: str = EVALUATION_PARAMS_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(params, f, ensure_ascii=False, indent=2)
+
+
+PARAMS = load_params()
+EVALUATION_VERSION = PARAMS["version"]
+PIECE_VALUES = PARAMS["piece_values"]
+PROM_PIECE_VALUES = PARAMS["prom_piece_values"]
+POSITION_SCORES_SETTING = PARAMS["position_scores"]
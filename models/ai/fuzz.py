@@ -0,0 +1,315 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from models.ai.ai_player import AIPlayer
+from models.ai.light import LightBoard, LightPlayer
+from models.ai.perft import game_actions
+from models.game import zobrist
+from models.game.board import Board
+from models.game.board_initializer import BoardInitializer
+from models.game.game import Game
+from models.game.player import Player
+
+KINGS = {"ShogiKing", "ChessKing"}
+
+
+class IllegalReplay(Exception):
+    """Raised when a replayed move is not available on both paths."""
+
+
+def create_positions(spec: tuple) -> tuple[Game, LightBoard]:
+    board_type, black_board, white_board, black_placeable, white_placeable = spec
+    game = Game(
+        black=Player("black", "black", []),
+        white=Player("white", "white", []),
+        board=Board(board_type, black_board, white_board, black_placeable, white_placeable),
+    )
+    return game, LightBoard(game, LightPlayer(game.white), LightPlayer(game.black))
+
+
+def light_action_keys(board: LightBoard, team: str) -> dict[tuple, dict]:
+    """
+    Pseudo-legal actions of the search path, keyed like `board_action_keys`.
+
+    The check evasion filter of `get_possible_moves` is left out because the
+    server does not restrict moves that leave the king in check. A promoting
+    move of an already promoted piece is the same action as the plain move.
+    """
+    possible_moves, _, _ = AIPlayer.get_move_data(board, team)
+    actions = {}
+    for move in [*possible_moves, *AIPlayer.get_legal_places(board, team)]:
+        if move["type"] == "place":
+            actions[("place", move["name"], move["position"])] = move
+        elif not (move["promote"] and board.pieces[move["from"]].is_promoted):
+            actions[("move", move["from"], move["to"], move["promote"])] = move
+    return actions
+
+
+def board_action_keys(game: Game) -> dict[tuple, tuple]:
+    """Actions the server accepts, as `perform_action` arguments keyed by ("move", from, to, promote) / ("place", name, position)."""
+    pieces = game.board.pieces
+    positions = {piece.piece_id: position for position, piece in pieces.items()}
+    actions = {}
+    for action in game_actions(game):
+        piece_id, promote, action_type, x, y = action
+        if action_type == "place":
+            actions[("place", game.current_player.get_captured_piece_by_id(piece_id).name, (x, y))] = action
+        else:
+            actions[("move", positions[piece_id], (x, y), promote)] = action
+    return actions
+
+
+def action_name(key: tuple, board: LightBoard) -> str:
+    if key[0] == "place":
+        return key[1]
+    piece = board.pieces.get(key[1])
+    return piece.name if piece else "?"
+
+
+def compare_actions(light_actions: dict, board_actions: dict, board: LightBoard) -> list[dict]:
+    """Actions offered by only one path, grouped by kind and piece type."""
+    groups = {}
+    for side, keys in (("light", set(light_actions) - set(board_actions)), ("board", set(board_actions) - set(light_actions))):
+        for key in sorted(keys, key=str):
+            kind = "place" if key[0] == "place" else "promotion" if key[3] else "move"
+            group = groups.setdefault((f"{kind}_only_{side}", action_name(key, board)), [])
+            group.append(str(key))
+    return [{"kind": kind, "piece": piece, "actions": actions} for (kind, piece), actions in groups.items()]
+
+
+def compare_states(game: Game, board: LightBoard, team: str) -> dict | None:
+    """Compare pieces, hands and the incremental Zobrist keys of both paths after they applied the same action."""
+    game_pieces = {
+        position: (piece.name, piece.team, piece.is_promoted, piece.is_first_move and piece.name in zobrist.FIRST_MOVE_SENSITIVE_PIECES)
+        for position, piece in game.board.pieces.items()
+    }
+    light_pieces = {
+        position: (piece.name, piece.team, piece.is_promoted, piece.is_first_move and piece.name in zobrist.FIRST_MOVE_SENSITIVE_PIECES)
+        for position, piece in board.pieces.items()
+    }
+    if game_pieces != light_pieces:
+        position = next(
+            position for position in sorted({*game_pieces, *light_pieces})
+            if game_pieces.get(position) != light_pieces.get(position)
+        )
+        piece = game_pieces.get(position) or light_pieces.get(position)
+        return {"kind": "board_state", "piece": piece[0], "position": str(position), "board": str(game_pieces.get(position)), "light": str(light_pieces.get(position))}
+
+    for player in (game.black, game.white):
+        game_hand = {}
+        for piece in player.captured_pieces:
+            game_hand[piece.name] = game_hand.get(piece.name, 0) + 1
+        light_hand = {name: count for name, count in board.hand_counts(player.team).items() if count}
+        if game_hand != light_hand:
+            name = next(name for name in sorted({*game_hand, *light_hand}) if game_hand.get(name) != light_hand.get(name))
+            return {"kind": "hand_state", "piece": name, "team": player.team, "board": game_hand, "light": light_hand}
+
+    expected_key = zobrist.compute_key(
+        board.pieces,
+        {side: board.hand_counts(side) for side in ("white", "black")},
+        team,
+        board.board_size,
+        [name for name, placeable in board.placeable_state.items() if placeable],
+        board.get_last_move(),
+    )
+    if board.key != expected_key:
+        return {"kind": "zobrist_key", "piece": "-", "light": f"{board.key:016x}", "expected": f"{expected_key:016x}"}
+    if game.key != expected_key:
+        return {"kind": "game_key", "piece": "-", "board": f"{game.key:016x}", "expected": f"{expected_key:016x}"}
+    return None
+
+
+def to_compact(key: tuple) -> tuple:
+    """Action key in the compact move notation of `models.ai.bench.MIDDLEGAMES`."""
+    if key[0] == "place":
+        return (key[1], key[2])
+    return (key[1], key[2], True) if key[3] else (key[1], key[2])
+
+
+def from_compact(move: tuple) -> tuple:
+    if isinstance(move[0], str):
+        return ("place", move[0], move[1])
+    return ("move", move[0], move[1], len(move) > 2 and move[2])
+
+
+def run_game(spec: tuple, choose, max_plies: int, target: tuple[str, str] | None = None) -> tuple[list[tuple], list[dict]]:
+    """
+    Play one game on both paths, checking action sets before and states after every ply.
+
+    Actions offered by only one path are recorded and the game goes on with
+    the common ones; a state mismatch ends the game. Every mismatch carries
+    the moves that lead to it.
+
+    Args:
+        spec (tuple): (board_type, black_board, white_board, black_placeable, white_placeable)
+        choose (callable): Called with the ply and the sorted common action keys, returns the key to play or None to stop
+        max_plies (int): Maximum plies to play
+        target (tuple[str, str] | None): Stop at the first mismatch with this signature
+
+    Returns:
+        tuple[list[tuple], list[dict]]: Moves played in compact notation and the first mismatch of each signature
+    """
+    game, board = create_positions(spec)
+    moves = []
+    mismatches = {}
+
+    def record(found: list[dict]) -> bool:
+        for mismatch in found:
+            mismatches.setdefault(signature(mismatch), mismatch | {"moves": list(moves)})
+        return target is not None and target in mismatches
+
+    # 詰み判定のログで出力が埋まらないようにする
+    with contextlib.redirect_stdout(io.StringIO()):
+        for ply in range(max_plies):
+            team = game.current_player.team
+            if game.is_game_over() or any(not any(piece.team == side and piece.name in KINGS for piece in board.pieces.values()) for side in ("white", "black")):
+                break
+
+            light_actions = light_action_keys(board, team)
+            board_actions = board_action_keys(game)
+            if record(compare_actions(light_actions, board_actions, board)):
+                break
+
+            key = choose(ply, sorted(set(light_actions) & set(board_actions), key=str))
+            if key is None:
+                break
+            AIPlayer.perform_move(light_actions[key], board, team)
+            game.perform_action(*board_actions[key])
+            moves.append(to_compact(key))
+
+            mismatch = compare_states(game, board, game.current_player.team)
+            if mismatch:
+                record([mismatch])
+                break
+
+    return moves, list(mismatches.values())
+
+
+def fuzz_game(task: tuple) -> dict:
+    spec, seed, max_plies = task
+    rng = random.Random(seed)
+    moves, mismatches = run_game(spec, lambda ply, keys: rng.choice(keys) if keys else None, max_plies)
+    return {"spec": spec, "seed": seed, "plies": len(moves), "mismatches": mismatches}
+
+
+def signature(mismatch: dict) -> tuple[str, str]:
+    return mismatch["kind"], mismatch["piece"]
+
+
+def reproduces(spec: tuple, moves: list[tuple], target: tuple[str, str]) -> dict | None:
+    def choose(ply, keys):
+        if ply >= len(moves):
+            return None
+        key = from_compact(moves[ply])
+        if key not in keys:
+            raise IllegalReplay(str(moves[ply]))
+        return key
+
+    try:
+        _, mismatches = run_game(spec, choose, len(moves) + 1, target)
+    except IllegalReplay:
+        return None
+    return next((mismatch for mismatch in mismatches if signature(mismatch) == target), None)
+
+
+def shrink(spec: tuple, mismatch: dict) -> dict:
+    """
+    Shrink a failing game to a short move list that still shows the same kind of mismatch.
+
+    Chunks of moves are removed greedily, halving the chunk size whenever no
+    chunk can be removed, as long as the remaining moves stay playable on both paths.
+    """
+    target = signature(mismatch)
+    best, moves = mismatch, mismatch["moves"]
+    chunk = max(len(moves) // 2, 1)
+    while moves:
+        removed = False
+        start = 0
+        while start < len(moves):
+            candidate = moves[:start] + moves[start + chunk:]
+            result = reproduces(spec, candidate, target)
+            if result is not None:
+                moves, best, removed = result["moves"], result, True
+            else:
+                start += chunk
+        if not removed:
+            if chunk == 1:
+                break
+            chunk //= 2
+    return best
+
+
+def create_tasks(games: int, max_plies: int, seed: int) -> list[tuple]:
+    specs = [
+        (board_type, black_board, white_board, black_placeable, white_placeable)
+        for board_type, black_board, white_board in BoardInitializer.layout_pairs()
+        for black_placeable in (True, False)
+        for white_placeable in (True, False)
+    ]
+    rng = random.Random(seed)
+    return [(rng.choice(specs), seed + index, max_plies) for index in range(games)]
+
+
+def shrink_failure(failure: dict) -> dict:
+    return failure | {"mismatch": shrink(failure["spec"], failure["mismatch"])}
+
+
+def run_fuzz(games: int, max_plies: int = 200, seed: int = 0, processes: int | None = None, shrink_failures: bool = True) -> dict:
+    """Play random games on a process pool and shrink one reproducer per distinct mismatch."""
+    started_at = time.monotonic()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = list(executor.map(fuzz_game, create_tasks(games, max_plies, seed), chunksize=8))
+        plies = sum(result["plies"] for result in results)
+        elapsed = time.monotonic() - started_at
+
+        failures = {}
+        for result in results:
+            for mismatch in result["mismatches"]:
+                failure = failures.setdefault(signature(mismatch), {
+                    "kind": mismatch["kind"],
+                    "piece": mismatch["piece"],
+                    "count": 0,
+                    "spec": result["spec"],
+                    "seed": result["seed"],
+                    "mismatch": mismatch,
+                })
+                failure["count"] += 1
+        reproducers = list(executor.map(shrink_failure, failures.values())) if shrink_failures else list(failures.values())
+
+    return {
+        "games": len(results),
+        "plies": plies,
+        "pliesPerSecond": int(plies / elapsed) if elapsed > 0 else 0,
+        "failures": reproducers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play random games on both the Board / ActionManager and the LightBoard paths and report disagreements.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--no-shrink", action="store_true", help="Report the first failing game of each mismatch as is")
+    args = parser.parse_args()
+
+    report = run_fuzz(args.games, args.max_plies, args.seed, args.processes, not args.no_shrink)
+    print(f"{report['games']} games, {report['plies']} plies ({report['pliesPerSecond']} plies/s)")
+    for failure in report["failures"]:
+        mismatch = failure["mismatch"]
+        details = {key: value for key, value in mismatch.items() if key not in ("kind", "piece", "moves")}
+        print(f"\n{failure['kind']} ({failure['piece']}): {failure['count']} games, first with seed {failure['seed']}")
+        print(f"  layout: {failure['spec']}")
+        print(f"  moves: {mismatch['moves']}")
+        print(f"  details: {details}")
+
+    if report["failures"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
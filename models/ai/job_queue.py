@@ -0,0 +1,280 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from models.ai.ai_player import AIPlayer
+from models.ai.difficulty import create_context, get_difficulty
+from models.ai.result_cache import get_result_cache
+from models.ai.search_context import SearchContext, SearchStats, validate_search_limits
+from models.game_store import StaleGameError, load_game, save_game
+
+AI_JOB_QUEUE_KEY = "ai_jobs:queue"
+AI_JOB_WAIT_SAMPLES_KEY = "ai_jobs:wait_ms"
+AI_JOB_RUN_SAMPLES_KEY = "ai_jobs:run_ms"
+
+# ジョブの結果はポーリングされるまでの間だけ保持する (1時間)
+JOB_TTL_IN_SECONDS = 60 * 60
+# 待ち時間・実行時間のサンプルは直近のものだけを保持する
+METRIC_SAMPLE_LIMIT = 1000
+# 1ジョブあたりの締め切り (キュー投入からの秒数)
+DEFAULT_JOB_TIMEOUT = float(os.getenv("AI_JOB_TIMEOUT", 10))
+
+logger = logging.getLogger(__name__)
+
+
+def job_key(job_id) -> str:
+    return f"ai_job:{job_id}"
+
+
+def create_job(user_id, step: int, depth: int, timeout: float | None = None, collect_stats: bool = False, difficulty: str | None = None) -> dict:
+    """
+    Build a new AI job record.
+
+    Args:
+        user_id (str): Owner of the stored game
+        step (int): Game step the job was created for; the job is dropped if the game moved on
+        depth (int): Maximum search depth (0 plays a random move)
+        timeout (float | None): Seconds from enqueueing until the search must return
+        collect_stats (bool): Collect search counters and return them as `aiStats`
+        difficulty (str | None): Difficulty level whose budget replaces `depth`
+
+    Returns:
+        dict: The job record
+
+    Raises:
+        ValueError: If `depth` or `timeout` exceed the limits of `validate_search_limits`
+    """
+    validate_search_limits(depth if difficulty is None else None, timeout, min_depth=0)
+    enqueued_at = time.time()
+    return {
+        "jobId": uuid.uuid4().hex,
+        "userId": user_id,
+        "step": step,
+        "depth": depth,
+        "status": "queued",
+        "enqueuedAt": enqueued_at,
+        "deadline": enqueued_at + (timeout if timeout is not None else DEFAULT_JOB_TIMEOUT),
+        "collectStats": collect_stats,
+        "difficulty": difficulty,
+        "startedAt": None,
+        "finishedAt": None,
+        "aiAction": None,
+        "error": None,
+    }
+
+
+def summarize_samples(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0, "avg": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "avg": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def run_ai_job(job_queue, job: dict, redis_client) -> dict:
+    """
+    Run one AI job: load the game, search within the job deadline, apply the move and store the result.
+
+    Args:
+        job_queue (RedisAIJobQueue | LocalAIJobQueue): Queue used to store the job status and metrics
+        job (dict): The job record created by `create_job`
+        redis_client: Redis client holding the games
+
+    Returns:
+        dict: The updated job record
+    """
+    started_at = time.time()
+    job.update(status="running", startedAt=started_at)
+    job_queue.update(job)
+    job_queue.record_wait(started_at - job["enqueuedAt"])
+
+    try:
+        game = load_game(redis_client, job["userId"])
+        if game is None:
+            job.update(status="failed", error="Game not initialized.")
+        elif game.step != job["step"]:
+            # ジョブ作成後にゲームが進んでいる場合は手を指さない
+            job.update(status="stale", error="Game state changed before the AI job ran.")
+        else:
+            remaining = max(job["deadline"] - time.time(), 0)
+            stats = SearchStats() if job.get("collectStats") else None
+            depth = job["depth"]
+            if job.get("difficulty"):
+                depth = get_difficulty(job["difficulty"])["depth"]
+                context = create_context(job["difficulty"], time.monotonic() + remaining, stats=stats)
+            else:
+                context = SearchContext(deadline=time.monotonic() + remaining, stats=stats)
+            ai_action = AIPlayer.take_action(game, depth, context, get_result_cache())
+            if context.stats is not None:
+                job["aiStats"] = context.stats.to_dict(context)
+                logger.info(f"AI search stats: {json.dumps({'userId': job['userId'], 'jobId': job['jobId'], **job['aiStats']})}")
+
+            current = load_game(redis_client, job["userId"])
+            if current is None or current.step != job["step"]:
+                job.update(status="stale", error="Game state changed while the AI was searching.")
+            else:
+                save_game(redis_client, job["userId"], game)
+                job.update(status="done", aiAction=ai_action, searchDepth=context.completed_depth, nodes=context.nodes)
+    except StaleGameError as e:
+        # 探索中に別のリクエストが保存した、またはゲームが作り直された
+        job.update(status="stale", error=str(e))
+    except Exception as e:
+        job.update(status="failed", error=str(e))
+
+    finished_at = time.time()
+    job["finishedAt"] = finished_at
+    job_queue.update(job)
+    job_queue.record_run(finished_at - started_at)
+    return job
+
+
+class RedisAIJobQueue:
+    """AI jobs queued on a Redis list and consumed by `worker.py` processes."""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def enqueue(self, job: dict):
+        self.update(job)
+        self.redis_client.lpush(AI_JOB_QUEUE_KEY, job["jobId"])
+
+    def pop(self, timeout: int = 5) -> dict | None:
+        item = self.redis_client.brpop(AI_JOB_QUEUE_KEY, timeout=timeout)
+        if not item:
+            return None
+        _, job_id = item
+        return self.get(job_id)
+
+    def get(self, job_id) -> dict | None:
+        job_json = self.redis_client.get(job_key(job_id))
+        return json.loads(job_json) if job_json else None
+
+    def update(self, job: dict):
+        self.redis_client.set(job_key(job["jobId"]), json.dumps(job), ex=JOB_TTL_IN_SECONDS)
+
+    def depth(self) -> int:
+        return self.redis_client.llen(AI_JOB_QUEUE_KEY)
+
+    def record_wait(self, seconds: float):
+        self.__record_sample(AI_JOB_WAIT_SAMPLES_KEY, seconds)
+
+    def record_run(self, seconds: float):
+        self.__record_sample(AI_JOB_RUN_SAMPLES_KEY, seconds)
+
+    def metrics(self) -> dict:
+        wait = [float(ms) for ms in self.redis_client.lrange(AI_JOB_WAIT_SAMPLES_KEY, 0, -1)]
+        run = [float(ms) for ms in self.redis_client.lrange(AI_JOB_RUN_SAMPLES_KEY, 0, -1)]
+        return {
+            "queueDepth": self.depth(),
+            "waitMs": summarize_samples(wait),
+            "runMs": summarize_samples(run),
+        }
+
+    def __record_sample(self, key, seconds: float):
+        pipe = self.redis_client.pipeline()
+        pipe.lpush(key, round(seconds * 1000, 3))
+        pipe.ltrim(key, 0, METRIC_SAMPLE_LIMIT - 1)
+        pipe.execute()
+
+
+class LocalAIJobQueue:
+    """
+    In-process stand-in for `RedisAIJobQueue`.
+
+    Jobs are kept in memory and run by a small pool of threads inside the web
+    process. Games are still loaded from and saved to Redis. Like the Redis
+    keys, a job is forgotten JOB_TTL_IN_SECONDS after its last update.
+    """
+
+    def __init__(self, redis_client_factory, workers: int = 1):
+        self.redis_client_factory = redis_client_factory
+        self.__queue = queue.Queue()
+        # 最後に更新した順に並べ、期限 (time.monotonic()) と一緒に保持する
+        self.__jobs: dict[str, tuple[float, dict]] = {}
+        self.__wait_samples: list[float] = []
+        self.__run_samples: list[float] = []
+        self.__lock = threading.Lock()
+
+        for _ in range(workers):
+            threading.Thread(target=self.__work_loop, daemon=True).start()
+
+    def enqueue(self, job: dict):
+        self.update(job)
+        self.__queue.put(job["jobId"])
+
+    def get(self, job_id) -> dict | None:
+        with self.__lock:
+            self.__evict_expired()
+            entry = self.__jobs.get(job_id)
+            return dict(entry[1]) if entry else None
+
+    def update(self, job: dict):
+        with self.__lock:
+            self.__jobs.pop(job["jobId"], None)
+            self.__jobs[job["jobId"]] = (time.monotonic() + JOB_TTL_IN_SECONDS, dict(job))
+            self.__evict_expired()
+
+    def __evict_expired(self):
+        now = time.monotonic()
+        while self.__jobs:
+            job_id, (expires_at, _) = next(iter(self.__jobs.items()))
+            if expires_at > now:
+                break
+            del self.__jobs[job_id]
+
+    def depth(self) -> int:
+        return self.__queue.qsize()
+
+    def record_wait(self, seconds: float):
+        self.__record_sample(self.__wait_samples, seconds)
+
+    def record_run(self, seconds: float):
+        self.__record_sample(self.__run_samples, seconds)
+
+    def metrics(self) -> dict:
+        with self.__lock:
+            wait, run = list(self.__wait_samples), list(self.__run_samples)
+        return {
+            "queueDepth": self.depth(),
+            "waitMs": summarize_samples(wait),
+            "runMs": summarize_samples(run),
+        }
+
+    def __record_sample(self, samples: list, seconds: float):
+        with self.__lock:
+            samples.append(round(seconds * 1000, 3))
+            del samples[:-METRIC_SAMPLE_LIMIT]
+
+    def __work_loop(self):
+        redis_client = self.redis_client_factory()
+        while True:
+            job = self.get(self.__queue.get())
+            if job:
+                run_ai_job(self, job, redis_client)
+
+
+_job_queue = None
+
+
+def get_job_queue():
+    """
+    Return the process-wide job queue.
+
+    `AI_QUEUE_BACKEND=local` selects the in-process stand-in, anything else the Redis list.
+    """
+    global _job_queue
+    if _job_queue is None:
+        from models.redis_client import get_redis_client
+        if os.getenv("AI_QUEUE_BACKEND", "redis").lower() == "local":
+            _job_queue = LocalAIJobQueue(get_redis_client, int(os.getenv("AI_LOCAL_WORKERS", 1)))
+        else:
+            _job_queue = RedisAIJobQueue(get_redis_client())
+    return _job_queue
@@ -1,14 +1,16 @@
+from models.game import zobrist
 from models.game.game import Game
 from models.game.player import Player
 from models.piece.piece import Piece
-from models.piece.pieces_info import PIECE_VALUES, PROM_PIECE_VALUES
+from models.piece.shogi_pieces import ShogiPawn
+from models.ai.evaluation_params import PIECE_VALUES, PROM_PIECE_VALUES
 from models.type import LastMove
 
 class LightPlayer:
-    def __init__(self, player: Player):
+    def __init__(self, player: Player | None = None):
         # キャプチャ済み駒を、駒の種類ごとに駒インスタンスのリストで管理する
         captured_pieces = {}
-        for piece in player.captured_pieces:
+        for piece in (player.captured_pieces if player is not None else []):
             # もともとの駒は piece_id を保持しているものとする
             light_piece = LightPiece(piece.piece_id, piece.name, piece.team, piece.is_promoted, piece.is_first_move, piece.is_rearranged)
             if piece.name in captured_pieces:
@@ -81,15 +83,96 @@ class LightBoard:
             piece.name: not piece.is_banned_place for piece in [*game.board.pieces.values(), *game.black.captured_pieces, *game.white.captured_pieces]
         }
         self.board_size = game.board.size
+        # 二歩の判定用に、チームごとに列ごとの成っていない歩の数を持ち、指すたびに更新する
+        self.pawn_columns = ShogiPawn.count_pawn_columns(self.pieces, self.board_size)
+        # 打てるマスを集合演算で求めるための空きマスの集合
+        self.empty_squares = Piece.get_empty_squares(self.board_size, self.pieces)
         self.white_player = white_player
         self.black_player = black_player
         self.history = []  # 履歴は後の undo_action のために保持
 
+        # 局面の Zobrist キー (手番を含む)。undo_action のために直前のキーを積んでおく
+        self.key = zobrist.compute_key(
+            self.pieces,
+            {team: self.hand_counts(team) for team in ("white", "black")},
+            game.current_player.team,
+            self.board_size,
+            [name for name, placeable in self.placeable_state.items() if placeable],
+            game.last_move,
+        )
+        self.key_history = []
+        # 現局面のキーに含まれるアンパッサンの権利。undo_action のために直前の値を積んでおく
+        self.en_passant_key = zobrist.en_passant_key(self.pieces, game.last_move)
+        self.en_passant_history = []
+
+    @classmethod
+    def from_pieces(cls, pieces: dict[tuple[int, int], "LightPiece"], board_size: int, side_to_move: str, white_player: LightPlayer | None = None, black_player: LightPlayer | None = None, placeable_state: dict[str, bool] | None = None):
+        """
+        Build a board directly from light pieces, without a `Game`.
+
+        Used by offline tools that enumerate positions (e.g. tablebase generation).
+        Pieces whose type has no entry in `placeable_state` cannot be dropped.
+        """
+        board = cls.__new__(cls)
+        board.pieces = pieces
+        board.board_size = board_size
+        board.pawn_columns = ShogiPawn.count_pawn_columns(pieces, board_size)
+        board.empty_squares = Piece.get_empty_squares(board_size, pieces)
+        board.white_player = white_player or LightPlayer()
+        board.black_player = black_player or LightPlayer()
+        board.placeable_state = {name: False for name in PIECE_VALUES} | (placeable_state or {})
+        board.immobile_rows = {}
+        board.history = []
+        board.key = zobrist.compute_key(
+            board.pieces,
+            {team: board.hand_counts(team) for team in ("white", "black")},
+            side_to_move,
+            board_size,
+            [name for name, placeable in board.placeable_state.items() if placeable],
+        )
+        board.key_history = []
+        board.en_passant_key = 0
+        board.en_passant_history = []
+        return board
+
+    def shift_pawn_column(self, piece: LightPiece, x, count):
+        if ShogiPawn.blocks_column(piece.name, piece.is_promoted):
+            self.pawn_columns[piece.team][x] += count
+
+    def hand_counts(self, team) -> dict[str, int]:
+        return {name: len(pieces) for name, pieces in self.get_player(team).captured_pieces.items()}
+
     def get_player(self, team):
         if team not in ["white", "black"]:
             raise ValueError("Invalid team. Expected 'white' or 'black'")
         return self.white_player if team == "white" else self.black_player
 
+    def move_key(self, team, from_pos, to_pos, promote=False) -> int:
+        """Zobrist key of the position after `move`, computed without playing it."""
+        piece = self.pieces[from_pos]
+        enemy = self.pieces.get(to_pos)
+
+        key = self.key ^ zobrist.BLACK_TO_MOVE_KEY ^ self.en_passant_key
+        # 移動先の左右のマスはこの手で変わらないので、指す前の盤で求められる
+        key ^= zobrist.en_passant_move_key(self.pieces, team, from_pos, to_pos)
+        key ^= zobrist.piece_key(piece.name, piece.team, piece.is_promoted, piece.is_first_move, from_pos)
+        if enemy:
+            count = len(self.get_player(team).captured_pieces.get(enemy.name, ()))
+            key ^= zobrist.piece_key(enemy.name, enemy.team, enemy.is_promoted, enemy.is_first_move, to_pos)
+            key ^= zobrist.hand_key(enemy.name, team, count) ^ zobrist.hand_key(enemy.name, team, count + 1)
+        return key ^ zobrist.piece_key(piece.name, piece.team, piece.is_promoted or promote, False, to_pos)
+
+    def place_key(self, team, name, position) -> int:
+        """Zobrist key of the position after `place`, computed without playing it."""
+        count = len(self.get_player(team).captured_pieces.get(name, ()))
+        return (
+            self.key
+            ^ zobrist.BLACK_TO_MOVE_KEY
+            ^ self.en_passant_key
+            ^ zobrist.hand_key(name, team, count) ^ zobrist.hand_key(name, team, count - 1)
+            ^ zobrist.piece_key(name, team, False, False, position)
+        )
+
     def move(self, team, from_pos, to_pos, promote=False):
         if team not in ["white", "black"]:
             raise ValueError("Invalid team. Expected 'white' or 'black'")
@@ -100,11 +183,14 @@ class LightBoard:
 
         piece = self.pieces[from_pos]
         enemy = self.pieces.get(to_pos)
+        key = self.move_key(team, from_pos, to_pos, promote)
+        en_passant_key = zobrist.en_passant_move_key(self.pieces, team, from_pos, to_pos)
 
         # 捕獲処理：敵の駒が存在する場合、その駒インスタンスをキャプチャ済みリストに追加する
         if enemy:
-            player = self.get_player(team)
-            player.add_captured_piece(enemy)
+            self.shift_pawn_column(enemy, to_pos[0], -1)
+            self.get_player(team).add_captured_piece(enemy)
+        self.shift_pawn_column(piece, from_pos[0], -1)
 
         # 移動前の状態を保存
         was_first_move = piece.is_first_move
@@ -112,11 +198,19 @@ class LightBoard:
 
         # 駒を移動
         self.pieces[to_pos] = self.pieces.pop(from_pos)
+        self.empty_squares.add(from_pos)
+        self.empty_squares.discard(to_pos)
 
         # 昇格処理
         was_promoted = piece.is_promoted
         if promote and not piece.is_promoted:
             piece.promote()
+        self.shift_pawn_column(piece, to_pos[0], 1)
+
+        self.key_history.append(self.key)
+        self.key = key
+        self.en_passant_history.append(self.en_passant_key)
+        self.en_passant_key = en_passant_key
 
         # 履歴に記録（captured_piece は存在すれば LightPiece インスタンス）
         self.history.append(("move", team, from_pos, to_pos, enemy, was_promoted, was_first_move))
@@ -132,18 +226,27 @@ class LightBoard:
             raise ValueError("Invalid position. Expected a tuple of (x, y)")
 
         player = self.get_player(team)
+        key = self.place_key(team, name, position)
         # キャプチャ済みの駒から、piece_id が最も小さいものを取り出す
         
         captured_piece = player.remove_captured_piece(name)
+        # 取り消し時に持ち駒へ戻すため、配置前の属性を保存する
+        was_state = (captured_piece.team, captured_piece.is_promoted, captured_piece.is_first_move, captured_piece.is_rearranged)
         # 取得した駒は、配置するために属性を更新する（例えば所属チームや初手フラグなど）
         captured_piece.team = team
-        captured_piece.is_promoted = False
+        captured_piece.demote()
         captured_piece.is_first_move = False
         captured_piece.is_rearranged = True
 
         self.pieces[position] = captured_piece
+        self.empty_squares.discard(position)
+        self.shift_pawn_column(captured_piece, position[0], 1)
+        self.key_history.append(self.key)
+        self.key = key
+        self.en_passant_history.append(self.en_passant_key)
+        self.en_passant_key = 0
         # 履歴には、配置した駒そのものを記録しておく
-        self.history.append(("place", team, captured_piece, position))
+        self.history.append(("place", team, captured_piece, position, was_state))
 
     def undo_action(self):
         if not self.history:
@@ -151,16 +254,23 @@ class LightBoard:
 
         last_action = self.history.pop()
         action_type = last_action[0]
+        self.key = self.key_history.pop()
+        self.en_passant_key = self.en_passant_history.pop()
 
         if action_type == "move":
             _, team, from_pos, to_pos, captured_piece, was_promoted, was_first_move = last_action
             piece = self.pieces[to_pos]
+            self.shift_pawn_column(piece, to_pos[0], -1)
 
             # 移動を取り消し
             self.pieces[from_pos] = self.pieces.pop(to_pos)
+            self.empty_squares.discard(from_pos)
+            if not captured_piece:
+                self.empty_squares.add(to_pos)
             if captured_piece:
                 # 捕獲されていた駒を盤上に戻す
                 self.pieces[to_pos] = captured_piece
+                self.shift_pawn_column(captured_piece, to_pos[0], 1)
                 player = self.get_player(team)
                 # キャプチャ済みリストから該当の駒（piece_id で照合）を削除する
                 if captured_piece.name in player.captured_pieces:
@@ -176,11 +286,19 @@ class LightBoard:
 
             # 初手フラグの復元
             piece.is_first_move = was_first_move
+            self.shift_pawn_column(piece, from_pos[0], 1)
 
         elif action_type == "place":
-            _, team, placed_piece, position = last_action
-            # 盤上から配置した駒を取り除く
+            _, team, placed_piece, position, (was_team, was_promoted, was_first_move, was_rearranged) = last_action
+            # 盤上から配置した駒を取り除き、配置前の属性に戻す
             del self.pieces[position]
+            self.empty_squares.add(position)
+            self.shift_pawn_column(placed_piece, position[0], -1)
+            placed_piece.team = was_team
+            if was_promoted:
+                placed_piece.promote()
+            placed_piece.is_first_move = was_first_move
+            placed_piece.is_rearranged = was_rearranged
             player = self.get_player(team)
             # 配置取り消しの場合、配置された駒をキャプチャ済みリストに戻す
             player.add_captured_piece(placed_piece)
@@ -207,7 +325,7 @@ class LightBoard:
                 "to_pos": to_pos
             }
         elif last_action[0] == "place":
-            _, team, placed_piece, position = last_action
+            _, team, placed_piece, position, _ = last_action
             last_action_piece = self.pieces.get(position)
 
             return {
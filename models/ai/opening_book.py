@@ -0,0 +1,177 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+from models.ai.ai_player import AIPlayer
+from models.ai.light import LightBoard, LightPlayer
+from models.ai.search_context import SearchContext
+from models.ai.transposition_table import TranspositionTable
+from models.game.board import Board
+from models.game.board_initializer import BoardInitializer
+from models.game.game import Game
+from models.game.player import Player
+from models.piece.pieces_info import PIECE_CLASSES
+
+BOOK_MAGIC = b"CSHBOOK\0"
+BOOK_VERSION = 1
+# magic, version, record size, record count
+HEADER = struct.Struct("<8sIIQ")
+# key, kind, piece name, from x, from y, to x, to y, promote, depth, score, weight
+RECORD = struct.Struct("<QBBBBBBBBfI")
+
+MOVE_KIND, PLACE_KIND = 0, 1
+NO_SQUARE = 0xFF
+PIECE_NAMES = list(PIECE_CLASSES)
+DEFAULT_BOOK_PATH = os.getenv("OPENING_BOOK_PATH", os.path.join("books", "opening.bin"))
+
+
+def encode_record(key: int, move: dict, score: float, depth: int, weight: int = 1) -> bytes:
+    if move["type"] == "move":
+        return RECORD.pack(
+            key, MOVE_KIND, PIECE_NAMES.index(move["name"]),
+            *move["from"], *move["to"], int(move["promote"]), depth, score, weight
+        )
+    return RECORD.pack(
+        key, PLACE_KIND, PIECE_NAMES.index(move["name"]),
+        NO_SQUARE, NO_SQUARE, *move["position"], 0, depth, score, weight
+    )
+
+
+def decode_move(fields: tuple, team: str) -> dict:
+    _, kind, name_index, from_x, from_y, to_x, to_y, promote, _, _, _ = fields
+    if kind == MOVE_KIND:
+        return {"type": "move", "name": PIECE_NAMES[name_index], "from": (from_x, from_y), "to": (to_x, to_y), "promote": bool(promote)}
+    return {"type": "place", "team": team, "name": PIECE_NAMES[name_index], "position": (to_x, to_y)}
+
+
+class OpeningBook:
+    """
+    Read-only opening book: fixed-size records sorted by position key.
+
+    The file is memory-mapped and searched in place, so opening it costs
+    nothing beyond reading the header regardless of the book size.
+
+    Args:
+        path (str): Path of a file written by `write_book`
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.__file = open(path, "rb")
+        self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size, count = HEADER.unpack_from(self.__mmap, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"Unsupported opening book file: {path}")
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.__mmap.close()
+        self.__file.close()
+
+    def lookup(self, key: int) -> tuple | None:
+        """Binary search the records for `key` and return the raw record fields."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            (record_key,) = struct.unpack_from("<Q", self.__mmap, offset)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return RECORD.unpack_from(self.__mmap, offset)
+        return None
+
+    def get_move(self, board: LightBoard, team: str) -> dict | None:
+        """Return the book move for this position if there is one and it is legal here."""
+        fields = self.lookup(board.key)
+        if fields is None:
+            return None
+        move = decode_move(fields, team)
+        if move not in AIPlayer.get_possible_moves(board, team, 0):
+            return None
+        return move
+
+
+def write_book(path: str, records: dict[int, bytes]):
+    """Write records (already encoded, keyed by position key) sorted by key."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, RECORD.size, len(records)))
+        for key in sorted(records):
+            file.write(records[key])
+
+
+def collect_book_positions(board: LightBoard, team: str, plies: int, depth: int, tt: TranspositionTable, records: dict[int, bytes]):
+    """Deep-search this position and every position within `plies` further moves."""
+    if board.key not in records:
+        move, score = AIPlayer.search(board, team, depth, SearchContext(tt=tt))
+        if move:
+            records[board.key] = encode_record(board.key, move, score, depth)
+
+    if plies <= 0:
+        return
+
+    next_team = AIPlayer.NEGATIVE_TEAM if team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+    for move in AIPlayer.get_possible_moves(board, team, 0):
+        AIPlayer.perform_move(move, board, team)
+        collect_book_positions(board, next_team, plies - 1, depth, tt, records)
+        board.undo_action()
+
+
+def build_book(path: str, plies: int, depth: int, placeable_options: list[tuple[bool, bool]]):
+    """Search the opening tree of every layout pair and write the book to `path`."""
+    records: dict[int, bytes] = {}
+    for board_type, black_board, white_board in BoardInitializer.layout_pairs():
+        for black_placeable, white_placeable in placeable_options:
+            started_at = time.monotonic()
+            before = len(records)
+            game = Game(
+                black=Player("black", "black", []),
+                white=Player("white", "white", []),
+                board=Board(board_type, black_board, white_board, black_placeable, white_placeable),
+            )
+            board = LightBoard(game, LightPlayer(game.white), LightPlayer(game.black))
+            collect_book_positions(board, game.current_player.team, plies, depth, TranspositionTable(), records)
+            print(
+                f"{board_type} {black_board} vs {white_board} "
+                f"(placeable: {black_placeable}/{white_placeable}): "
+                f"{len(records) - before} positions in {time.monotonic() - started_at:.1f}s"
+            )
+
+    write_book(path, records)
+    print(f"Wrote {len(records)} positions to {path}")
+
+
+_opening_book = None
+
+
+def get_opening_book() -> OpeningBook | None:
+    """Return the process-wide opening book, or None when no book file exists."""
+    global _opening_book
+    if _opening_book is None and os.path.exists(DEFAULT_BOOK_PATH):
+        _opening_book = OpeningBook(DEFAULT_BOOK_PATH)
+    return _opening_book
+
+
+def main():
+    from models.ai.prewarm import PLACEABLE_OPTIONS
+
+    parser = argparse.ArgumentParser(description="Build the opening book from deep searches of every layout pair.")
+    parser.add_argument("--plies", type=int, default=2, help="Opening plies to expand from every initial layout")
+    parser.add_argument("--depth", type=int, default=4, help="Search depth of every book position")
+    parser.add_argument("--placeable", choices=PLACEABLE_OPTIONS, default="both")
+    parser.add_argument("--out", default=DEFAULT_BOOK_PATH)
+    args = parser.parse_args()
+
+    build_book(args.out, args.plies, args.depth, PLACEABLE_OPTIONS[args.placeable])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import argparse
+import contextlib
+import io
+import json
+import time
+from models.ai.ai_player import AIPlayer
+from models.ai.bench import MIDDLEGAMES, create_board, play_moves
+from models.ai.light import LightBoard
+from models.game.board import Board
+from models.game.board_initializer import BoardInitializer
+from models.game.game import Game
+from models.game.player import Player
+from models.piece.piece import Piece
+
+REFERENCE_DEPTH = 3
+
+# 各局面で REFERENCE_DEPTH 手まで数えた葉ノード数の基準値。
+# light は AIPlayer.get_possible_moves (王手回避を含む)、
+# board は Piece.get_legal_moves / can_place と ActionManager によるもの
+PERFT_REFERENCE: dict[str, dict[str, int]] = {
+    "light": {
+        "shogi shogi vs shogi": 25470,
+        "shogi shogi vs wideChess": 18802,
+        "shogi shogi vs replaceShogi": 36757,
+        "shogi wideChess vs shogi": 20420,
+        "shogi wideChess vs wideChess": 15040,
+        "shogi wideChess vs replaceShogi": 29495,
+        "shogi replaceShogi vs shogi": 29714,
+        "shogi replaceShogi vs wideChess": 21930,
+        "shogi replaceShogi vs replaceShogi": 42277,
+        "chess chess vs chess": 8978,
+        "chess chess vs narrowShogi": 13856,
+        "chess chess vs replaceChess": 3576,
+        "chess narrowShogi vs chess": 12121,
+        "chess narrowShogi vs narrowShogi": 18657,
+        "chess narrowShogi vs replaceChess": 4829,
+        "chess replaceChess vs chess": 5388,
+        "chess replaceChess vs narrowShogi": 8314,
+        "chess replaceChess vs replaceChess": 2148,
+        "shogi shogi middlegame": 104232,
+        "shogi wideChess middlegame": 722412,
+        "shogi replaceShogi middlegame": 290048,
+        "chess chess middlegame": 90274,
+        "chess narrowShogi middlegame": 41772,
+        "chess replaceChess middlegame": 223199,
+    },
+    "board": {
+        "shogi shogi vs shogi": 25470,
+        "shogi shogi vs wideChess": 18686,
+        "shogi shogi vs replaceShogi": 36697,
+        "shogi wideChess vs shogi": 20420,
+        "shogi wideChess vs wideChess": 14948,
+        "shogi wideChess vs replaceShogi": 29403,
+        "shogi replaceShogi vs shogi": 29714,
+        "shogi replaceShogi vs wideChess": 21798,
+        "shogi replaceShogi vs replaceShogi": 42208,
+        "chess chess vs chess": 8902,
+        "chess chess vs narrowShogi": 13837,
+        "chess chess vs replaceChess": 3538,
+        "chess narrowShogi vs chess": 12017,
+        "chess narrowShogi vs narrowShogi": 18631,
+        "chess narrowShogi vs replaceChess": 4777,
+        "chess replaceChess vs chess": 5340,
+        "chess replaceChess vs narrowShogi": 8302,
+        "chess replaceChess vs replaceChess": 2124,
+        "shogi shogi middlegame": 100818,
+        "shogi wideChess middlegame": 600826,
+        "shogi replaceShogi middlegame": 243716,
+        "chess chess middlegame": 63177,
+        "chess narrowShogi middlegame": 39162,
+        "chess replaceChess middlegame": 214124,
+    },
+}
+
+
+def perft_positions() -> list[tuple[str, str, str, str, list[tuple]]]:
+    """Every initial layout pair and the bench middlegames as (name, board_type, black_board, white_board, moves)."""
+    positions = [
+        (f"{board_type} {black_board} vs {white_board}", board_type, black_board, white_board, [])
+        for board_type, black_board, white_board in BoardInitializer.layout_pairs()
+    ]
+    positions.extend(
+        (f"{board_type} {layout} middlegame", board_type, layout, layout, moves)
+        for board_type, layout, moves in MIDDLEGAMES
+    )
+    return positions
+
+
+# ---- LightBoard (AI search) path ----
+
+def light_perft(board: LightBoard, team: str, depth: int) -> int:
+    if depth == 0:
+        return 1
+    moves = AIPlayer.get_possible_moves(board, team, 0)
+    if depth == 1:
+        return len(moves)
+
+    next_team = AIPlayer.NEGATIVE_TEAM if team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+    nodes = 0
+    for move in moves:
+        AIPlayer.perform_move(move, board, team)
+        nodes += light_perft(board, next_team, depth - 1)
+        board.undo_action()
+    return nodes
+
+
+def light_divide(board: LightBoard, team: str, depth: int) -> dict[str, int]:
+    next_team = AIPlayer.NEGATIVE_TEAM if team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+    counts = {}
+    for move in AIPlayer.get_possible_moves(board, team, 0):
+        AIPlayer.perform_move(move, board, team)
+        counts[format_light_move(move)] = light_perft(board, next_team, depth - 1)
+        board.undo_action()
+    return counts
+
+
+def format_light_move(move: dict) -> str:
+    if move["type"] == "place":
+        return f"{move['name']}*{move['position']}"
+    return f"{move['name']} {move['from']}-{move['to']}{'+' if move['promote'] else ''}"
+
+
+# ---- Board / ActionManager (game server) path ----
+
+def create_game(board_type: str, black_board: str, white_board: str, moves: list[tuple]) -> Game:
+    game = Game(
+        black=Player("black", "black", []),
+        white=Player("white", "white", []),
+        board=Board(board_type, black_board, white_board, True, True),
+    )
+    for move in moves:
+        if isinstance(move[0], str):
+            piece = game.current_player.get_captured_piece_by_name(move[0])
+            game.perform_action(piece.piece_id, False, "place", *move[1])
+        else:
+            piece = game.board.get_piece(move[0])
+            game.perform_action(piece.piece_id, len(move) > 2 and move[2], "move", *move[1])
+    return game
+
+
+def game_actions(game: Game) -> list[tuple]:
+    """
+    Every action the server accepts for the player to move, as `perform_action` arguments.
+
+    A promoting variant is only listed when the promotion would actually happen.
+    """
+    player = game.current_player
+    pieces = game.board.pieces
+    actions = []
+    for position, piece in pieces.items():
+        if piece.team != player.team:
+            continue
+        moves, _ = piece.get_legal_moves(position, pieces, game.last_move)
+        for to_position in moves:
+            actions.append((piece.piece_id, False, "move", *to_position))
+            if not piece.is_promoted and not piece.is_banned_promote and Piece.can_promote_static(piece.team, position[1], to_position[1], piece.board_size, piece.promote_line):
+                actions.append((piece.piece_id, True, "move", *to_position))
+
+    # 同じ種類の持ち駒はどれを打っても同じ局面になるので1枚だけ数える
+    hand = {piece.name: piece for piece in reversed(player.captured_pieces)}
+    for piece in hand.values():
+        for x, y in piece.get_legal_places(pieces, game.board.pawn_columns, game.board.empty_squares):
+            actions.append((piece.piece_id, False, "place", x, y))
+    return actions
+
+
+def board_perft(game: Game, depth: int) -> int:
+    if depth == 0:
+        return 1
+    actions = game_actions(game)
+    if depth == 1:
+        return len(actions)
+
+    # 局面を丸ごと複製せず、指した手を Game.undo で戻す
+    nodes = 0
+    for action in actions:
+        game.perform_action(*action)
+        nodes += board_perft(game, depth - 1)
+        game.undo()
+    return nodes
+
+
+def board_divide(game: Game, depth: int) -> dict[str, int]:
+    counts = {}
+    for action in game_actions(game):
+        name = format_board_action(game, action)
+        game.perform_action(*action)
+        counts[name] = board_perft(game, depth - 1)
+        game.undo()
+    return counts
+
+
+def format_board_action(game: Game, action: tuple) -> str:
+    piece_id, promote, action_type, x, y = action
+    if action_type == "place":
+        return f"{game.current_player.get_captured_piece_by_id(piece_id).name}*{(x, y)}"
+    position = game.board.get_position_by_id(piece_id)
+    return f"{game.board.get_piece(position).name} {position}-{(x, y)}{'+' if promote else ''}"
+
+
+# ---- Runner ----
+
+def run_perft(path: str, depth: int, positions=None) -> dict:
+    """Count leaf nodes for every position and compare them with `PERFT_REFERENCE` at the reference depth."""
+    results = []
+    # 詰み判定のログで出力が埋まらないようにする
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, board_type, black_board, white_board, moves in positions or perft_positions():
+            started_at = time.monotonic()
+            if path == "light":
+                board, team = create_board(board_type, black_board, white_board)
+                team = play_moves(board, team, moves)
+                nodes = light_perft(board, team, depth)
+            else:
+                nodes = board_perft(create_game(board_type, black_board, white_board, moves), depth)
+            elapsed = time.monotonic() - started_at
+
+            expected = PERFT_REFERENCE[path].get(name) if depth == REFERENCE_DEPTH else None
+            results.append({
+                "position": name,
+                "nodes": nodes,
+                "expected": expected,
+                "ok": expected is None or expected == nodes,
+                "timeMs": elapsed * 1000,
+            })
+
+    nodes = sum(result["nodes"] for result in results)
+    elapsed = sum(result["timeMs"] for result in results) / 1000
+    return {
+        "path": path,
+        "depth": depth,
+        "positions": results,
+        "nodes": nodes,
+        "timeMs": int(elapsed * 1000),
+        "leafNodesPerSecond": int(nodes / elapsed) if elapsed > 0 else 0,
+        "ok": all(result["ok"] for result in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move generation leaf nodes (perft) for every board variant.")
+    parser.add_argument("--path", choices=["light", "board"], default="light", help="LightBoard search path or Board / ActionManager game path")
+    parser.add_argument("--depth", type=int, default=REFERENCE_DEPTH)
+    parser.add_argument("--divide", metavar="POSITION", help="Print the leaf count below each root move of one position")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    args = parser.parse_args()
+    depth = args.depth
+
+    if args.divide:
+        position = next((position for position in perft_positions() if position[0] == args.divide), None)
+        if position is None:
+            parser.error(f"Unknown position: {args.divide}")
+        _, board_type, black_board, white_board, moves = position
+        with contextlib.redirect_stdout(io.StringIO()):
+            if args.path == "light":
+                board, team = create_board(board_type, black_board, white_board)
+                counts = light_divide(board, play_moves(board, team, moves), depth)
+            else:
+                counts = board_divide(create_game(board_type, black_board, white_board, moves), depth)
+        for move, count in sorted(counts.items()):
+            print(f"{move}: {count}")
+        print(f"Moves: {len(counts)}, nodes: {sum(counts.values())}")
+        return
+
+    result = run_perft(args.path, depth)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for position in result["positions"]:
+            status = "" if position["expected"] is None else (" ok" if position["ok"] else f" MISMATCH (expected {position['expected']})")
+            print(f"{position['position']}: {position['nodes']}{status}")
+        print(f"Nodes: {result['nodes']}, time: {result['timeMs']} ms, leaf nodes/s: {result['leafNodesPerSecond']}")
+
+    if not result["ok"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
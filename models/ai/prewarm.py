@@ -0,0 +1,79 @@
+import argparse
+import itertools
+import time
+from models.ai.ai_player import AIPlayer
+from models.ai.light import LightBoard, LightPlayer
+from models.ai.result_cache import AIResultCache
+from models.ai.search_context import SearchContext
+from models.game.board import Board
+from models.game.board_initializer import BoardInitializer
+from models.game.game import Game
+from models.game.player import Player
+
+PLACEABLE_OPTIONS = {
+    "both": list(itertools.product((True, False), repeat=2)),
+    "true": [(True, True)],
+    "false": [(False, False)],
+}
+
+
+def prewarm_position(board: LightBoard, team: str, plies: int, depth: int, cache: AIResultCache) -> int:
+    """
+    Search this position and every position within `plies` further moves, storing the results.
+
+    Returns:
+        int: Number of positions searched (positions already cached are skipped)
+    """
+    searched = 0
+    if cache.get(board.key, team, depth) is None:
+        move, score = AIPlayer.search(board, team, depth, SearchContext())
+        if move:
+            cache.put(board.key, team, depth, move, score)
+        searched += 1
+
+    if plies <= 0:
+        return searched
+
+    next_team = AIPlayer.NEGATIVE_TEAM if team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+    for move in AIPlayer.get_possible_moves(board, team, 0):
+        AIPlayer.perform_move(move, board, team)
+        searched += prewarm_position(board, next_team, plies - 1, depth, cache)
+        board.undo_action()
+
+    return searched
+
+
+def prewarm(cache: AIResultCache, plies: int, depth: int, placeable_options: list[tuple[bool, bool]]):
+    """Fill the result cache with the first `plies` moves of every layout pair."""
+    for board_type, black_board, white_board in BoardInitializer.layout_pairs():
+        for black_placeable, white_placeable in placeable_options:
+            started_at = time.monotonic()
+            game = Game(
+                black=Player("black", "black", []),
+                white=Player("white", "white", []),
+                board=Board(board_type, black_board, white_board, black_placeable, white_placeable),
+            )
+            board = LightBoard(game, LightPlayer(game.white), LightPlayer(game.black))
+            searched = prewarm_position(board, game.current_player.team, plies, depth, cache)
+            print(
+                f"{board_type} {black_board} vs {white_board} "
+                f"(placeable: {black_placeable}/{white_placeable}): "
+                f"{searched} positions in {time.monotonic() - started_at:.1f}s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the shared AI result cache with opening positions.")
+    parser.add_argument("--plies", type=int, default=1, help="Opening plies to expand from every initial layout")
+    parser.add_argument("--depth", type=int, default=3, help="Search depth stored for every position")
+    parser.add_argument("--placeable", choices=PLACEABLE_OPTIONS, default="both")
+    args = parser.parse_args()
+
+    from models.redis_client import get_redis_client
+    cache = AIResultCache(get_redis_client())
+    prewarm(cache, args.plies, args.depth, PLACEABLE_OPTIONS[args.placeable])
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
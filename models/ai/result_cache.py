@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from models.ai.evaluation_params import EVALUATION_VERSION, PIECE_VALUES, PROM_PIECE_VALUES, POSITION_SCORES_SETTING
+
+# 探索や評価関数の挙動を変えたら上げる (古いキャッシュを無効化するため)
+ENGINE_VERSION = 1
+
+RESULT_CACHE_STATS_KEY = "ai_result_cache:stats"
+# Redis 側は TTL 付きで保存し、メモリ上限時の追い出しはサーバーの
+# maxmemory-policy (volatile-lru / allkeys-lru) に任せる
+RESULT_TTL_IN_SECONDS = int(os.getenv("AI_RESULT_CACHE_TTL", 7 * 24 * 60 * 60))
+FRONT_CACHE_SIZE = int(os.getenv("AI_RESULT_FRONT_CACHE_SIZE", 4096))
+# 全プロセス分のヒット数は、この回数の参照ごと (と stats の呼び出し時) にまとめて Redis に足す
+STATS_FLUSH_INTERVAL = int(os.getenv("AI_RESULT_STATS_FLUSH_INTERVAL", 100))
+
+
+def engine_settings_key() -> str:
+    """Short digest of everything that changes the engine's choice for a given position and depth."""
+    from models.ai.ai_player import AIPlayer
+
+    settings = {
+        "version": ENGINE_VERSION,
+        "evaluation_version": EVALUATION_VERSION,
+        "promote_line": AIPlayer.PROMOTE_LINE,
+        "piece_values": PIECE_VALUES,
+        "prom_piece_values": PROM_PIECE_VALUES,
+        "position_scores": POSITION_SCORES_SETTING,
+    }
+    return hashlib.blake2b(json.dumps(settings, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+def decode_move(data: dict) -> dict:
+    """Restore the tuple positions of a move that went through JSON."""
+    move = dict(data)
+    for field in ("from", "to", "position"):
+        if move.get(field) is not None:
+            move[field] = tuple(move[field])
+    return move
+
+
+class AIResultCache:
+    """
+    Chosen move and score per (position key, side to move, depth, engine settings).
+
+    Lookups go to an in-process LRU front cache first and then to Redis, which
+    is shared by every web process and worker. The shared hit counters are
+    added to Redis in batches, so a front cache hit never waits on Redis.
+
+    Args:
+        redis_client: Redis client for the shared cache, or None for the front cache only
+        front_size (int): Entries kept in the in-process cache
+        ttl (int): Seconds a result stays in Redis
+    """
+    def __init__(self, redis_client=None, front_size: int = FRONT_CACHE_SIZE, ttl: int = RESULT_TTL_IN_SECONDS, flush_interval: int = STATS_FLUSH_INTERVAL):
+        self.redis_client = redis_client
+        self.front_size = front_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.settings_key = engine_settings_key()
+        self.__front: OrderedDict[str, dict] = OrderedDict()
+        # ジョブのワーカースレッドとリクエストのスレッドが同じインスタンスを使う
+        self.__front_lock = threading.Lock()
+
+        self.front_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        # まだ Redis に足していないヒット数
+        self.__unflushed: dict[str, int] = {}
+        self.__unflushed_lookups = 0
+        self.__stats_lock = threading.Lock()
+
+    def cache_key(self, position_key: int, team: str, depth: int) -> str:
+        return f"ai_result:{self.settings_key}:{position_key:016x}:{team}:d{depth}"
+
+    def get(self, position_key: int, team: str, depth: int) -> dict | None:
+        """Return `{"move", "score", "depth"}` or None."""
+        key = self.cache_key(position_key, team, depth)
+
+        with self.__front_lock:
+            result = self.__front.get(key)
+            if result is not None:
+                self.__front.move_to_end(key)
+        if result is not None:
+            self.__count("front_hits")
+            return result
+
+        if self.redis_client is not None:
+            cached = self.redis_client.get(key)
+            if cached:
+                result = json.loads(cached)
+                result["move"] = decode_move(result["move"])
+                self.__remember(key, result)
+                self.__count("redis_hits")
+                return result
+
+        self.__count("misses")
+        return None
+
+    def put(self, position_key: int, team: str, depth: int, move: dict, score: float):
+        key = self.cache_key(position_key, team, depth)
+        result = {"move": move, "score": score, "depth": depth}
+        self.__remember(key, result)
+        if self.redis_client is not None:
+            self.redis_client.set(key, json.dumps(result), ex=self.ttl)
+
+    def stats(self) -> dict:
+        """Hit counters of this process and, when Redis is available, of all processes."""
+        local = self.__summarize(self.front_hits, self.redis_hits, self.misses)
+        if self.redis_client is None:
+            return {"local": local}
+
+        self.flush_stats()
+        shared = self.redis_client.hgetall(RESULT_CACHE_STATS_KEY) or {}
+        return {
+            "local": local,
+            "shared": self.__summarize(
+                int(shared.get("front_hits", 0)), int(shared.get("redis_hits", 0)), int(shared.get("misses", 0))
+            ),
+        }
+
+    def __remember(self, key: str, result: dict):
+        with self.__front_lock:
+            self.__front[key] = result
+            self.__front.move_to_end(key)
+            while len(self.__front) > self.front_size:
+                self.__front.popitem(last=False)
+
+    def flush_stats(self):
+        """Add the hit counts not yet shared to the Redis counters in one pipeline."""
+        with self.__stats_lock:
+            unflushed, self.__unflushed = self.__unflushed, {}
+            self.__unflushed_lookups = 0
+        if self.redis_client is None or not unflushed:
+            return
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for field, count in unflushed.items():
+            pipe.hincrby(RESULT_CACHE_STATS_KEY, field, count)
+        pipe.execute()
+
+    def __count(self, field: str):
+        with self.__stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+            if self.redis_client is None:
+                return
+            self.__unflushed[field] = self.__unflushed.get(field, 0) + 1
+            self.__unflushed_lookups += 1
+            should_flush = self.__unflushed_lookups >= self.flush_interval
+        if should_flush:
+            self.flush_stats()
+
+    @staticmethod
+    def __summarize(front_hits: int, redis_hits: int, misses: int) -> dict:
+        lookups = front_hits + redis_hits + misses
+        return {
+            "frontHits": front_hits,
+            "redisHits": redis_hits,
+            "misses": misses,
+            "hitRatio": (front_hits + redis_hits) / lookups if lookups else None,
+        }
+
+
+_result_cache = None
+
+
+def get_result_cache() -> AIResultCache:
+    """Return the process-wide result cache backed by the configured Redis."""
+    global _result_cache
+    if _result_cache is None:
+        from models.redis_client import get_redis_client
+        _result_cache = AIResultCache(get_redis_client())
+    return _result_cache
@@ -0,0 +1,162 @@
+import os
+import random
+import time
+from models.ai.eval_cache import EvalCache
+from models.ai.transposition_table import TranspositionTable
+
+# クライアントが指定できる探索の上限。1つのリクエストがワーカーを占有し続けないようにする
+MAX_SEARCH_DEPTH = int(os.getenv("AI_MAX_DEPTH", 10))
+MAX_SEARCH_SECONDS = float(os.getenv("AI_MAX_TIMEOUT", 30))
+
+
+def validate_search_limits(depth=None, timeout=None, min_depth: int = 1):
+    """
+    Raise ValueError unless the given `depth` and `timeout` (seconds) are within the server-side limits.
+
+    `min_depth=0` also accepts depth 0, for which `AIPlayer.take_action` plays a random move.
+    """
+    if depth is not None and (type(depth) is not int or not min_depth <= depth <= MAX_SEARCH_DEPTH):
+        raise ValueError(f"'depth' must be an integer between {min_depth} and {MAX_SEARCH_DEPTH}.")
+    if timeout is not None and (type(timeout) not in (int, float) or not 0 < timeout <= MAX_SEARCH_SECONDS):
+        raise ValueError(f"The AI timeout must be greater than 0 and at most {MAX_SEARCH_SECONDS:g} seconds.")
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the deadline has passed or a stop was requested."""
+
+
+class SearchStats:
+    """
+    Counters collected during one search when enabled on the `SearchContext`.
+
+    `source` tells where the move came from: "book", "tablebase", "cache" or "search".
+    """
+    def __init__(self):
+        self.source = None
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.tablebase_hits = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.max_ply = 0
+        self.iterations: list[dict] = []
+
+    def to_dict(self, context: "SearchContext") -> dict:
+        return {
+            "source": self.source,
+            "nodes": context.nodes,
+            "nps": context.nps,
+            "timeMs": int(context.elapsed * 1000),
+            "depth": context.completed_depth,
+            "maxPly": self.max_ply,
+            "ttProbes": self.tt_probes,
+            "ttHits": self.tt_hits,
+            "ttHitRate": self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            "ttCutoffs": self.tt_cutoffs,
+            "tablebaseHits": self.tablebase_hits,
+            "evalCacheHits": context.eval_cache.hits if context.eval_cache is not None else 0,
+            "evalCacheMisses": context.eval_cache.misses if context.eval_cache is not None else 0,
+            "cutoffs": self.cutoffs,
+            "firstMoveCutoffs": self.first_move_cutoffs,
+            "firstMoveCutoffRate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            "iterations": self.iterations,
+        }
+
+
+class SearchContext:
+    """
+    Per-search state shared by every node of one `AIPlayer` search.
+
+    Args:
+        deadline (float | None): `time.monotonic()` value after which the search is aborted
+        should_stop (callable | None): Returns True when the search must stop early
+        on_iteration (callable | None): Called with a progress dict after each completed iteration
+        tt (TranspositionTable | None): Table to share between searches; a new one is created when omitted
+        tablebases (Tablebases | None): Endgame tables probed inside the search
+        eval_cache (EvalCache | None): Static evaluations reused across nodes (and searches); nothing is cached when omitted
+        max_nodes (int | None): Node budget after which the search is aborted
+        stats (SearchStats | None): Counters to fill in; nothing is collected when omitted
+        eval_noise (float): Amplitude of the random offset added to every static evaluation (0 disables it)
+        use_book (bool): Let `AIPlayer.take_action` play opening book moves (at depth `BOOK_MIN_DEPTH` or more)
+        use_tablebase (bool): Let `AIPlayer.take_action` load the tablebases when `tablebases` is omitted (at depth `BOOK_MIN_DEPTH` or more)
+        check_interval (int): Number of nodes between deadline / stop checks
+    """
+    def __init__(self, deadline: float | None = None, should_stop=None, on_iteration=None, tt: TranspositionTable | None = None, tablebases=None, eval_cache: EvalCache | None = None, max_nodes: int | None = None, stats: SearchStats | None = None, eval_noise: float = 0.0, use_book: bool = True, use_tablebase: bool = True, check_interval: int = 1024):
+        self.deadline = deadline
+        self.should_stop = should_stop
+        self.on_iteration = on_iteration
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.tablebases = tablebases
+        self.eval_cache = eval_cache
+        self.max_nodes = max_nodes
+        self.stats = stats
+        self.eval_noise = eval_noise
+        self.use_book = use_book
+        self.use_tablebase = use_tablebase
+        # 同じ局面には探索中ずっと同じ乱数を足す (置換表の値と矛盾しないように)
+        self.noise_seed = random.getrandbits(64)
+        self.check_interval = check_interval
+
+        # マルチPV探索で、既に見つけたルートの手を除外する
+        self.excluded_root_moves: list[dict] = []
+
+        self.nodes = 0
+        self.completed_depth = 0
+        self.started_at = time.monotonic()
+
+        # 読み筋 (principal variation) を ply ごとに保持する三角テーブル
+        self.root_ply = 0
+        self.pv: list[list[dict]] = []
+        self.completed_pv: list[dict] = []
+
+        # 最初の反復が終わるまでは時間切れにしない（必ず1手は返すため）
+        self.armed = False
+
+    def noise(self, key: int) -> float:
+        """Random offset in [-eval_noise, eval_noise], fixed per position key for this search."""
+        mixed = ((key ^ self.noise_seed) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        return self.eval_noise * ((mixed >> 11) / (1 << 53) * 2 - 1)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def nps(self) -> int:
+        elapsed = self.elapsed
+        return int(self.nodes / elapsed) if elapsed > 0 else 0
+
+    @property
+    def is_iterative(self) -> bool:
+        return self.deadline is not None or self.max_nodes is not None or self.should_stop is not None or self.on_iteration is not None
+
+    def clear_pv(self, ply: int):
+        while len(self.pv) <= ply + 1:
+            self.pv.append([])
+        self.pv[ply] = []
+        self.pv[ply + 1] = []
+
+    def update_pv(self, ply: int, move: dict):
+        self.pv[ply] = [move, *self.pv[ply + 1]]
+
+    @property
+    def principal_variation(self) -> list[dict]:
+        return list(self.pv[0]) if self.pv else []
+
+    def on_node(self):
+        self.nodes += 1
+        if not self.armed:
+            return
+        if self.nodes % self.check_interval == 0:
+            self.check()
+        elif self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout("Search node budget exceeded")
+
+    def check(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise SearchTimeout("Search deadline exceeded")
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout("Search node budget exceeded")
+        if self.should_stop is not None and self.should_stop():
+            raise SearchTimeout("Search stopped")
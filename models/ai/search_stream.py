@@ -0,0 +1,22 @@
+import json
+
+# 「すぐ指す」要求は探索が終わるまでの短い間だけ保持する
+STOP_TTL_IN_SECONDS = 60
+
+
+def stop_key(search_id) -> str:
+    return f"ai_stop:{search_id}"
+
+
+def request_stop(redis_client, search_id):
+    """Ask a running streamed search to stop and play its current best move."""
+    redis_client.set(stop_key(search_id), "1", ex=STOP_TTL_IN_SECONDS)
+
+
+def is_stop_requested(redis_client, search_id) -> bool:
+    return bool(redis_client.exists(stop_key(search_id)))
+
+
+def format_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
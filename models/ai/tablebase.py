@@ -0,0 +1,480 @@
+import argparse
+import contextlib
+import io
+import itertools
+import mmap
+import os
+import struct
+import time
+from array import array
+from models.ai.ai_player import AIPlayer
+from models.ai.light import LightBoard, LightPiece
+from models.piece.pieces_info import PIECE_CLASSES
+
+TABLEBASE_MAGIC = b"CSHTB\0\0\0"
+TABLEBASE_VERSION = 1
+# magic, version, board size, piece count
+HEADER = struct.Struct("<8sIBB")
+# piece name index, team (0: white, 1: black), promotable
+PIECE_DESCRIPTOR = struct.Struct("<BBB")
+
+DEFAULT_TABLEBASE_DIR = os.getenv("TABLEBASE_PATH", "tablebases")
+TABLEBASE_BOARD_SIZE = 8
+TEAMS = ("white", "black")
+PIECE_NAMES = list(PIECE_CLASSES)
+KINGS = {"ChessKing"}
+# 成ると動きが変わる駒だけ、成り状態を局面に含める
+PROMOTABLE_PIECES = {"ChessPawn", "ChessLance"}
+# 評価値のスケールで、駒得よりは大きく王の価値よりは小さい値
+TABLEBASE_WIN_SCORE = 90000
+
+# 値の符号化 (int8): 0 = 引き分け / 不正な局面, n > 0 = n 手 (ply) で勝ち, n < 0 = (-n - 1) 手で負け
+
+
+def encode_win(dtm: int) -> int:
+    return dtm
+
+
+def encode_loss(dtm: int) -> int:
+    return -dtm - 1
+
+
+def decode_value(value: int) -> tuple[str, int]:
+    """Return ("win" | "loss" | "draw", distance to mate in plies)."""
+    if value > 0:
+        return "win", value
+    if value < 0:
+        return "loss", -value - 1
+    return "draw", 0
+
+
+def material_signature(material: list[tuple[str, str]]) -> str:
+    """Canonical name of a material set, e.g. `wChessKing_wChessRook_bChessKing`."""
+    return "_".join(f"{team[0]}{name}" for team, name in sorted(material))
+
+
+def parse_signature(signature: str) -> list[tuple[str, str]]:
+    teams = {"w": "white", "b": "black"}
+    return sorted((teams[part[0]], part[1:]) for part in signature.split("_"))
+
+
+def tablebase_path(directory: str, material: list[tuple[str, str]], board_size: int) -> str:
+    return os.path.join(directory, f"{material_signature(material)}_{board_size}.tb")
+
+
+class TablebaseLayout:
+    """
+    Index layout of one material set.
+
+    A position index is `side` followed by one component per piece (in
+    canonical material order): its square, times two for promotable pieces
+    so the promotion state is part of the index.
+    """
+    def __init__(self, material: list[tuple[str, str]], board_size: int):
+        self.material = sorted(material)
+        self.board_size = board_size
+        self.squares = board_size * board_size
+        self.promotable = [name in PROMOTABLE_PIECES for _, name in self.material]
+        self.component_sizes = [self.squares * (2 if promotable else 1) for promotable in self.promotable]
+        self.size = 2
+        for component_size in self.component_sizes:
+            self.size *= component_size
+
+    def index(self, side: int, components: list[int]) -> int:
+        index = side
+        for component, component_size in zip(components, self.component_sizes):
+            index = index * component_size + component
+        return index
+
+    def component(self, piece_index: int, position: tuple[int, int], is_promoted: bool) -> int:
+        square = position[1] * self.board_size + position[0]
+        return square * 2 + int(is_promoted) if self.promotable[piece_index] else square
+
+    def unpack_component(self, piece_index: int, component: int) -> tuple[tuple[int, int], bool]:
+        if self.promotable[piece_index]:
+            square, is_promoted = divmod(component, 2)
+        else:
+            square, is_promoted = component, 0
+        return (square % self.board_size, square // self.board_size), bool(is_promoted)
+
+    def positions(self):
+        """Yield `(side, components)` for every index whose pieces are on distinct squares."""
+        for side in (0, 1):
+            for components in itertools.product(*(range(size) for size in self.component_sizes)):
+                squares = {
+                    component // 2 if promotable else component
+                    for component, promotable in zip(components, self.promotable)
+                }
+                if len(squares) == len(components):
+                    yield side, list(components)
+
+
+class TablebaseGenerator:
+    """
+    Retrograde generator of win / draw / loss + distance-to-mate tables.
+
+    Moves come from `AIPlayer.get_possible_moves`, so the tables follow the
+    same rules as the search: a side with no legal moves loses, capturing the
+    king wins, and no piece has castling or double-step rights. Captures lead
+    into the table of the smaller material set, which is generated first.
+
+    Args:
+        board_size (int): Size of the board
+        directory (str): Where tables are written and looked up
+    """
+    def __init__(self, board_size: int = TABLEBASE_BOARD_SIZE, directory: str = DEFAULT_TABLEBASE_DIR, log=print):
+        self.board_size = board_size
+        self.directory = directory
+        self.log = log
+        self.__tables: dict[str, array] = {}
+
+    def generate(self, material: list[tuple[str, str]]) -> array:
+        """Generate (or load) the table of `material` and every smaller material set reachable by captures."""
+        material = sorted(material)
+        signature = material_signature(material)
+        if signature in self.__tables:
+            return self.__tables[signature]
+
+        path = tablebase_path(self.directory, material, self.board_size)
+        if os.path.exists(path):
+            self.__tables[signature] = load_values(path)
+            return self.__tables[signature]
+
+        for team in TEAMS:
+            if (team, "ChessKing") not in material:
+                raise ValueError(f"Material {signature} must contain a ChessKing for each team")
+
+        # 取られうる駒 (王以外) を除いた駒割りを先に作る
+        for index, (_, name) in enumerate(material):
+            if name not in KINGS:
+                self.generate(material[:index] + material[index + 1:])
+
+        started_at = time.monotonic()
+        values = self.__solve(TablebaseLayout(material, self.board_size))
+        write_tablebase(path, material, self.board_size, values)
+        self.__tables[signature] = values
+        self.log(f"{signature}: {len(values)} positions in {time.monotonic() - started_at:.1f}s -> {path}")
+        return values
+
+    def __solve(self, layout: TablebaseLayout) -> array:
+        size = layout.size
+        pieces = [LightPiece(str(i), name, team, False, False, False) for i, (team, name) in enumerate(layout.material)]
+
+        # 後退解析のための後続局面 (CSR 形式) と、駒取りで確定する情報
+        successors = array("I")
+        remaining = array("H", bytes(2 * size))
+        best_win = [0] * size        # 駒取りで到達できる最短の勝ち (0 = なし)
+        worst_loss = array("H", bytes(2 * size))
+        has_draw = bytearray(size)
+        valid = bytearray(size)
+
+        successor_offsets = array("Q", [0]) * (size + 1)
+        offset = 0
+        for side, components in layout.positions():
+            index = layout.index(side, components)
+            valid[index] = 1
+            team = TEAMS[side]
+
+            board_pieces = {}
+            for piece_index, component in enumerate(components):
+                position, is_promoted = layout.unpack_component(piece_index, component)
+                piece = pieces[piece_index]
+                piece.is_promoted = is_promoted
+                board_pieces[position] = piece
+            board = LightBoard.from_pieces(board_pieces, layout.board_size, team)
+
+            targets = set()
+            with contextlib.redirect_stdout(io.StringIO()):
+                # get_possible_moves は詰みのたびに出力するので抑止する
+                moves = AIPlayer.get_possible_moves(board, team, 0)
+            for move in moves:
+                captured = board_pieces.get(move["to"])
+                if captured is not None and captured.team != team:
+                    self.__record_capture(layout, index, side, components, pieces, move, captured, best_win, worst_loss, has_draw)
+                    continue
+                targets.add(self.__successor_index(layout, side, components, move))
+
+            for target in targets:
+                successors.append(target)
+            remaining[index] = len(targets)
+            offset += len(targets)
+            successor_offsets[index + 1] = offset
+
+        # 位置ごとに offsets を単調にする (無効な局面は後続なし)
+        for index in range(size):
+            if successor_offsets[index + 1] < successor_offsets[index]:
+                successor_offsets[index + 1] = successor_offsets[index]
+
+        predecessor_offsets, predecessors = self.__invert(size, successor_offsets, successors)
+        return self.__propagate(size, valid, remaining, best_win, worst_loss, has_draw, predecessor_offsets, predecessors)
+
+    def __successor_index(self, layout: TablebaseLayout, side: int, components: list[int], move: dict) -> int:
+        next_components = list(components)
+        for piece_index, component in enumerate(components):
+            position, is_promoted = layout.unpack_component(piece_index, component)
+            if position == move["from"]:
+                next_components[piece_index] = layout.component(piece_index, move["to"], is_promoted or move["promote"])
+                break
+        return layout.index(1 - side, next_components)
+
+    def __record_capture(self, layout, index, side, components, pieces, move, captured, best_win, worst_loss, has_draw):
+        if captured.name in KINGS:
+            best_win[index] = 1
+            return
+
+        captured_index = next(i for i, piece in enumerate(pieces) if piece is captured)
+        moved_components = []
+        for piece_index, component in enumerate(components):
+            position, is_promoted = layout.unpack_component(piece_index, component)
+            if piece_index == captured_index:
+                continue
+            if position == move["from"]:
+                position, is_promoted = move["to"], is_promoted or move["promote"]
+            moved_components.append((piece_index, position, is_promoted))
+
+        sub_material = layout.material[:captured_index] + layout.material[captured_index + 1:]
+        sub_layout = TablebaseLayout(sub_material, layout.board_size)
+        sub_components = [
+            sub_layout.component(sub_index, position, is_promoted)
+            for sub_index, (_, position, is_promoted) in enumerate(moved_components)
+        ]
+        result, dtm = decode_value(self.generate(sub_material)[sub_layout.index(1 - side, sub_components)])
+
+        if result == "loss":
+            if not best_win[index] or dtm + 1 < best_win[index]:
+                best_win[index] = dtm + 1
+        elif result == "win":
+            worst_loss[index] = max(worst_loss[index], dtm + 1)
+        else:
+            has_draw[index] = 1
+
+    @staticmethod
+    def __invert(size: int, successor_offsets: array, successors: array) -> tuple[array, array]:
+        counts = array("Q", [0]) * (size + 1)
+        for target in successors:
+            counts[target + 1] += 1
+        for index in range(size):
+            counts[index + 1] += counts[index]
+
+        predecessors = array("I", [0]) * len(successors)
+        fill = array("Q", counts[:-1])
+        for source in range(size):
+            for position in range(successor_offsets[source], successor_offsets[source + 1]):
+                target = successors[position]
+                predecessors[fill[target]] = source
+                fill[target] += 1
+        return counts, predecessors
+
+    @staticmethod
+    def __propagate(size, valid, remaining, best_win, worst_loss, has_draw, predecessor_offsets, predecessors) -> array:
+        values = array("b", bytes(size))
+        resolved = bytearray(size)
+        buckets: dict[int, list[tuple[int, bool]]] = {}
+
+        def push(dtm: int, index: int, is_win: bool):
+            buckets.setdefault(dtm, []).append((index, is_win))
+
+        for index in range(size):
+            if not valid[index]:
+                continue
+            if best_win[index]:
+                push(best_win[index], index, True)
+            elif remaining[index] == 0 and not has_draw[index]:
+                push(worst_loss[index], index, False)
+
+        dtm = 0
+        while buckets:
+            for index, is_win in buckets.pop(dtm, []):
+                if resolved[index]:
+                    continue
+                if dtm > 126:
+                    raise ValueError("Distance to mate does not fit the tablebase value format")
+                resolved[index] = 1
+                values[index] = encode_win(dtm) if is_win else encode_loss(dtm)
+
+                for position in range(predecessor_offsets[index], predecessor_offsets[index + 1]):
+                    predecessor = predecessors[position]
+                    if resolved[predecessor]:
+                        continue
+                    if not is_win:
+                        push(dtm + 1, predecessor, True)
+                        continue
+                    remaining[predecessor] -= 1
+                    worst_loss[predecessor] = max(worst_loss[predecessor], dtm + 1)
+                    if remaining[predecessor] == 0 and not has_draw[predecessor] and not best_win[predecessor]:
+                        push(worst_loss[predecessor], predecessor, False)
+            dtm += 1
+
+        return values
+
+
+def write_tablebase(path: str, material: list[tuple[str, str]], board_size: int, values: array):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(TABLEBASE_MAGIC, TABLEBASE_VERSION, board_size, len(material)))
+        for team, name in material:
+            file.write(PIECE_DESCRIPTOR.pack(PIECE_NAMES.index(name), TEAMS.index(team), int(name in PROMOTABLE_PIECES)))
+        file.write(values.tobytes())
+
+
+def load_values(path: str) -> array:
+    with open(path, "rb") as file:
+        data = file.read()
+    _, _, _, piece_count = HEADER.unpack_from(data, 0)
+    values = array("b")
+    values.frombytes(data[HEADER.size + piece_count * PIECE_DESCRIPTOR.size:])
+    return values
+
+
+class MappedTablebase:
+    """One table file, memory-mapped and read in place."""
+
+    def __init__(self, path: str):
+        self.__file = open(path, "rb")
+        self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, board_size, piece_count = HEADER.unpack_from(self.__mmap, 0)
+        if magic != TABLEBASE_MAGIC or version != TABLEBASE_VERSION:
+            raise ValueError(f"Unsupported tablebase file: {path}")
+
+        material = []
+        for i in range(piece_count):
+            name_index, team_index, _ = PIECE_DESCRIPTOR.unpack_from(self.__mmap, HEADER.size + i * PIECE_DESCRIPTOR.size)
+            material.append((TEAMS[team_index], PIECE_NAMES[name_index]))
+        self.layout = TablebaseLayout(material, board_size)
+        self.data_offset = HEADER.size + piece_count * PIECE_DESCRIPTOR.size
+
+    def value(self, index: int) -> int:
+        value = self.__mmap[self.data_offset + index]
+        return value - 256 if value > 127 else value
+
+
+class Tablebases:
+    """
+    Probe interface for the search.
+
+    Tables are looked up by material signature in `directory` and mapped
+    the first time they are needed. Only positions the tables describe are
+    probed: chess pieces only, the expected board size, no droppable pieces
+    in hand, no castling / double-step rights and no en passant.
+
+    Args:
+        directory (str): Directory holding `.tb` files
+        board_size (int): Board size the tables were generated for
+    """
+    def __init__(self, directory: str = DEFAULT_TABLEBASE_DIR, board_size: int = TABLEBASE_BOARD_SIZE):
+        self.directory = directory
+        self.board_size = board_size
+        self.__tables: dict[str, MappedTablebase | None] = {}
+
+        self.max_pieces = 0
+        if os.path.isdir(directory):
+            for file_name in os.listdir(directory):
+                if file_name.endswith(f"_{board_size}.tb"):
+                    self.max_pieces = max(self.max_pieces, file_name.count("_"))
+
+    def probe(self, board: LightBoard, team: str) -> tuple[str, int] | None:
+        """Return ("win" | "loss" | "draw", distance to mate) for the side to move, or None."""
+        if len(board.pieces) > self.max_pieces or board.board_size != self.board_size:
+            return None
+
+        entries = []
+        for position, piece in board.pieces.items():
+            if not piece.name.startswith("Chess") or piece.is_first_move or piece.is_rearranged:
+                return None
+            entries.append((piece.team, piece.name, position, piece.is_promoted))
+
+        for player in (board.white_player, board.black_player):
+            if any(pieces and board.placeable_state.get(name) for name, pieces in player.captured_pieces.items()):
+                return None
+
+        last_move = board.get_last_move()
+        if last_move and last_move["piece_name"] == "ChessPawn" and last_move["from_pos"] and abs(last_move["from_pos"][1] - last_move["to_pos"][1]) == 2:
+            return None
+
+        entries.sort()
+        table = self.__table([(team, name) for team, name, _, _ in entries])
+        if table is None:
+            return None
+
+        components = [
+            table.layout.component(piece_index, position, is_promoted)
+            for piece_index, (_, _, position, is_promoted) in enumerate(entries)
+        ]
+        return decode_value(table.value(table.layout.index(TEAMS.index(team), components)))
+
+    def score(self, board: LightBoard, team: str) -> float | None:
+        """Probe result as a search score from the POSITIVE_TEAM point of view."""
+        result = self.probe(board, team)
+        if result is None:
+            return None
+        outcome, dtm = result
+        if outcome == "draw":
+            return 0
+        score = TABLEBASE_WIN_SCORE - dtm if outcome == "win" else -(TABLEBASE_WIN_SCORE - dtm)
+        return score if team == AIPlayer.POSITIVE_TEAM else -score
+
+    def best_move(self, board: LightBoard, team: str) -> dict | None:
+        """Pick the move that wins fastest, draws, or loses slowest according to the tables."""
+        if self.probe(board, team) is None:
+            return None
+
+        next_team = AIPlayer.NEGATIVE_TEAM if team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+        best, best_rank = None, None
+        for move in AIPlayer.get_possible_moves(board, team, 0):
+            captured = board.pieces.get(move["to"]) if move["type"] == "move" else None
+            if captured is not None and captured.name in KINGS and captured.team != team:
+                return move
+
+            AIPlayer.perform_move(move, board, team)
+            result = self.probe(board, next_team)
+            board.undo_action()
+            if result is None:
+                return None
+
+            outcome, dtm = result
+            # 相手から見た結果なので、相手の負けが最良
+            rank = (0, dtm) if outcome == "loss" else (1, 0) if outcome == "draw" else (2, -dtm)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = move, rank
+        return best
+
+    def __table(self, material: list[tuple[str, str]]) -> MappedTablebase | None:
+        signature = material_signature(material)
+        if signature not in self.__tables:
+            path = tablebase_path(self.directory, material, self.board_size)
+            self.__tables[signature] = MappedTablebase(path) if os.path.exists(path) else None
+        return self.__tables[signature]
+
+
+_tablebases = None
+_tablebases_loaded = False
+
+
+def get_tablebases() -> Tablebases | None:
+    """Return the process-wide tablebases, or None when no table files are installed."""
+    global _tablebases, _tablebases_loaded
+    if not _tablebases_loaded:
+        tablebases = Tablebases()
+        _tablebases = tablebases if tablebases.max_pieces > 0 else None
+        _tablebases_loaded = True
+    return _tablebases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases for chess-piece material sets.")
+    parser.add_argument(
+        "materials", nargs="+",
+        help="Material signatures, e.g. wChessKing_wChessRook_bChessKing or wChessKing_wChessWisp_bChessKing"
+    )
+    parser.add_argument("--board-size", type=int, default=TABLEBASE_BOARD_SIZE)
+    parser.add_argument("--out", default=DEFAULT_TABLEBASE_DIR)
+    args = parser.parse_args()
+
+    generator = TablebaseGenerator(args.board_size, args.out)
+    for signature in args.materials:
+        generator.generate(parse_signature(signature))
+
+
+if __name__ == "__main__":
+    main()
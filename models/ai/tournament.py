@@ -0,0 +1,261 @@
+import argparse
+import contextlib
+import io
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from models.ai.ai_player import AIPlayer
+from models.ai.bench import compact_move
+from models.ai.difficulty import create_context, get_difficulty
+from models.ai.light import LightBoard, LightPlayer
+from models.ai.prewarm import PLACEABLE_OPTIONS
+from models.ai.search_context import SearchContext
+from models.game.board import Board
+from models.game.board_initializer import BoardInitializer
+from models.game.game import Game
+from models.game.player import Player
+
+KINGS = {"ShogiKing", "ChessKing"}
+
+
+def parse_engine(spec: str) -> dict:
+    """
+    Parse an engine spec such as `d3:depth=3`, `fast:depth=6,time=0.2,nodes=20000` or `easy:level=easy`.
+
+    `depth` is the maximum search depth, `time` the seconds per move and
+    `nodes` the node budget per move. A time or node budget makes the search
+    iterative; the first iteration is always completed. `level` plays with the
+    budgets and evaluation noise of a difficulty level instead.
+    """
+    name, _, options = spec.partition(":")
+    engine = {"name": name, "depth": 3, "time": None, "nodes": None, "level": None}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        if key == "depth":
+            engine["depth"] = int(value)
+        elif key == "time":
+            engine["time"] = float(value)
+        elif key == "nodes":
+            engine["nodes"] = int(value)
+        elif key == "level":
+            engine["depth"] = get_difficulty(value)["depth"]
+            engine["level"] = value
+        else:
+            raise ValueError(f"Unknown engine option: {key}")
+    return engine
+
+
+def opponent(team: str) -> str:
+    return AIPlayer.NEGATIVE_TEAM if team == AIPlayer.POSITIVE_TEAM else AIPlayer.POSITIVE_TEAM
+
+
+def has_king(board: LightBoard, team: str) -> bool:
+    return any(piece.team == team and piece.name in KINGS for piece in board.pieces.values())
+
+
+def choose_move(board: LightBoard, team: str, engine: dict, stats: dict) -> dict | None:
+    deadline = time.monotonic() + engine["time"] if engine["time"] is not None else None
+    if engine["level"] is not None:
+        context = create_context(engine["level"], deadline)
+    else:
+        context = SearchContext(deadline=deadline, max_nodes=engine["nodes"])
+    move, _ = AIPlayer.search(board, team, engine["depth"], context)
+
+    stats["moves"] += 1
+    stats["nodes"] += context.nodes
+    stats["time"] += context.elapsed
+    stats["depth"] += context.completed_depth
+    return move
+
+
+def play_game(task: dict) -> dict:
+    """
+    Play one game between two engines and return its result.
+
+    The first `random_plies` moves are random (seeded per game) so that games
+    between deterministic engines do not repeat. A side with no moves or
+    without its king loses; repetition or reaching `max_plies` is a draw.
+    """
+    engines = {"white": task["white"], "black": task["black"]}
+    black_placeable, white_placeable = task["placeable"]
+    game = Game(
+        black=Player("black", "black", []),
+        white=Player("white", "white", []),
+        board=Board(task["board_type"], task["black_board"], task["white_board"], black_placeable, white_placeable),
+    )
+    board = LightBoard(game, LightPlayer(game.white), LightPlayer(game.black))
+    team = game.current_player.team
+    rng = random.Random(task["seed"])
+    stats = {side: {"moves": 0, "nodes": 0, "time": 0.0, "depth": 0} for side in engines}
+    played = []
+
+    winner, reason = None, "max_plies"
+    # 詰み判定のログで出力が埋まらないようにする
+    with contextlib.redirect_stdout(io.StringIO()):
+        for ply in range(task["max_plies"]):
+            if not has_king(board, team):
+                winner, reason = opponent(team), "king_captured"
+                break
+            moves = AIPlayer.get_possible_moves(board, team, 0)
+            if not moves:
+                winner, reason = opponent(team), "no_moves"
+                break
+            if board.key_history.count(board.key) + 1 >= Game.REPEAT_LIMIT:
+                reason = "repetition"
+                break
+
+            if ply < task["random_plies"]:
+                move = rng.choice(moves)
+            else:
+                move = choose_move(board, team, engines[team], stats[team]) or rng.choice(moves)
+            AIPlayer.perform_move(move, board, team)
+            played.append(compact_move(move))
+            team = opponent(team)
+        else:
+            ply = task["max_plies"]
+
+    return {
+        "white": engines["white"]["name"],
+        "black": engines["black"]["name"],
+        "winner": winner,
+        "reason": reason,
+        "plies": ply,
+        "layout": f"{task['board_type']} {task['black_board']} vs {task['white_board']}",
+        "moves": played,
+        "stats": {engines[side]["name"]: stats[side] for side in engines},
+    }
+
+
+def create_tasks(engines: list[dict], placeable_options: list[tuple[bool, bool]], max_plies: int, random_plies: int, rounds: int, seed: int) -> list[dict]:
+    """Every pair of engines plays every layout pair once with each color, `rounds` times."""
+    tasks = []
+    for first, second in itertools.combinations(engines, 2):
+        for _ in range(rounds):
+            for board_type, black_board, white_board in BoardInitializer.layout_pairs():
+                for placeable in placeable_options:
+                    # 同じ開始局面を色を入れ替えて2局指す
+                    game_seed = seed + len(tasks)
+                    for white, black in ((first, second), (second, first)):
+                        tasks.append({
+                            "white": white,
+                            "black": black,
+                            "board_type": board_type,
+                            "black_board": black_board,
+                            "white_board": white_board,
+                            "placeable": placeable,
+                            "max_plies": max_plies,
+                            "random_plies": random_plies,
+                            "seed": game_seed,
+                        })
+    return tasks
+
+
+def score_interval(points: list[float]) -> tuple[float, float]:
+    """Mean score and the half width of its 95% confidence interval."""
+    n = len(points)
+    mean = sum(points) / n
+    variance = sum((point - mean) ** 2 for point in points) / (n - 1) if n > 1 else 0.0
+    return mean, 1.96 * math.sqrt(variance / n)
+
+
+def elo_difference(score: float) -> float:
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / score - 1)
+
+
+def summarize(results: list[dict], engines: list[dict]) -> dict:
+    """Aggregate game results into head-to-head scores and per-engine speed figures."""
+    head_to_head = {}
+    for first, second in itertools.combinations([engine["name"] for engine in engines], 2):
+        games = [result for result in results if {result["white"], result["black"]} == {first, second}]
+        if not games:
+            continue
+        points = []
+        for result in games:
+            if result["winner"] is None:
+                points.append(0.5)
+            else:
+                points.append(1.0 if result[result["winner"]] == first else 0.0)
+        score, margin = score_interval(points)
+        head_to_head[f"{first} vs {second}"] = {
+            "games": len(games),
+            "wins": points.count(1.0),
+            "draws": points.count(0.5),
+            "losses": points.count(0.0),
+            "score": score,
+            "margin": margin,
+            "elo": elo_difference(score),
+            "avgPlies": sum(result["plies"] for result in games) / len(games),
+        }
+
+    speed = {}
+    for engine in engines:
+        totals = {"moves": 0, "nodes": 0, "time": 0.0, "depth": 0}
+        for result in results:
+            for key, value in result["stats"].get(engine["name"], {}).items():
+                totals[key] += value
+        moves = totals["moves"] or 1
+        speed[engine["name"]] = {
+            "moves": totals["moves"],
+            "avgNps": int(totals["nodes"] / totals["time"]) if totals["time"] > 0 else 0,
+            "avgTimePerMoveMs": totals["time"] / moves * 1000,
+            "avgNodesPerMove": totals["nodes"] / moves,
+            "avgDepth": totals["depth"] / moves,
+        }
+
+    return {"headToHead": head_to_head, "engines": speed}
+
+
+def run_tournament(engines: list[dict], placeable_options: list[tuple[bool, bool]], max_plies: int = 200, random_plies: int = 2, rounds: int = 1, seed: int = 0, processes: int | None = None) -> dict:
+    tasks = create_tasks(engines, placeable_options, max_plies, random_plies, rounds, seed)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = list(executor.map(play_game, tasks))
+    return summarize(results, engines)
+
+
+def print_report(report: dict):
+    for pairing, result in report["headToHead"].items():
+        print(
+            f"{pairing}: +{result['wins']} ={result['draws']} -{result['losses']} "
+            f"score {result['score'] * 100:.1f}% ± {result['margin'] * 100:.1f}% "
+            f"(elo {result['elo']:+.0f}, {result['games']} games, {result['avgPlies']:.0f} plies avg)"
+        )
+    for name, result in report["engines"].items():
+        print(
+            f"{name}: {result['avgNps']} nps, {result['avgTimePerMoveMs']:.1f} ms/move, "
+            f"{result['avgNodesPerMove']:.0f} nodes/move, depth {result['avgDepth']:.2f} ({result['moves']} moves)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play AI configurations against each other on every initial layout.")
+    parser.add_argument(
+        "engines", nargs="+", type=parse_engine,
+        help="Engine specs, e.g. d2:depth=2 d3:depth=3 t:depth=8,time=0.2 n:depth=8,nodes=20000",
+    )
+    parser.add_argument("--placeable", choices=PLACEABLE_OPTIONS, default="true")
+    parser.add_argument("--max-plies", type=int, default=200, help="Plies after which the game is a draw")
+    parser.add_argument("--random-plies", type=int, default=2, help="Random opening plies to vary the games")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    names = [engine["name"] for engine in args.engines]
+    if len(names) < 2 or len(set(names)) != len(names):
+        parser.error("At least two engines with distinct names are required")
+
+    started_at = time.monotonic()
+    report = run_tournament(
+        args.engines, PLACEABLE_OPTIONS[args.placeable], args.max_plies,
+        args.random_plies, args.rounds, args.seed, args.processes,
+    )
+    print_report(report)
+    print(f"finished in {time.monotonic() - started_at:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class TranspositionTable:
+    """
+    Search results keyed by the Zobrist key of the position.
+
+    Each entry is `(depth, score, flag, best_move)`. Scores are stored from
+    the POSITIVE_TEAM point of view like everywhere else in the search, and
+    `flag` tells whether the score is exact or only a lower / upper bound.
+
+    Args:
+        max_entries (int): Entries kept before the oldest ones are evicted
+    """
+    def __init__(self, max_entries: int = 1 << 18):
+        self.max_entries = max_entries
+        self.entries: dict[int, tuple[int, float, int, dict | None]] = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def probe(self, key: int) -> tuple[int, float, int, dict | None] | None:
+        return self.entries.get(key)
+
+    def store(self, key: int, depth: int, score: float, flag: int, best_move: dict | None):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > depth:
+            # より深い探索結果は残す
+            return
+        if entry is None and len(self.entries) >= self.max_entries:
+            # 挿入順が最も古いエントリを捨てる
+            del self.entries[next(iter(self.entries))]
+        self.entries[key] = (depth, score, flag, best_move)
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,286 @@
+"""
+Offline tuning of the evaluation parameters (Texel method).
+
+    python -m models.ai.tuning selfplay --games 2000 --out games.jsonl
+    python -m models.ai.tuning extract games.jsonl --out positions.npz
+    python -m models.ai.tuning fit positions.npz
+
+The evaluation of `AIPlayer.calculate_current_score` is linear in the piece
+values and position score settings, so every position is turned into a
+feature vector whose dot product with the parameter vector is the
+evaluation. The parameters are then fitted by logistic regression of the
+game outcome on the scaled evaluation. Requires NumPy.
+"""
+import argparse
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from models.ai import evaluation_params
+from models.ai.bench import create_board
+from models.ai.light import LightBoard
+from models.ai.tournament import has_king, opponent, parse_engine, play_game
+from models.game.board_initializer import BoardInitializer
+
+# 各駒の位置評価に掛かる係数 (AIPlayer.calculate_current_score と同じ)
+POSITION_RATE = 0.3
+KINGS = {"ShogiKing", "ChessKing"}
+OUTCOMES = {"white": 1.0, "black": 0.0, None: 0.5}
+
+
+def feature_names(params: dict) -> list[tuple[str, str]]:
+    """
+    Parameters being fitted, as (group, piece name).
+
+    King values are left out: they only mark a lost game and cancel out
+    while both kings are on the board.
+    """
+    names = [name for name in params["piece_values"] if name not in KINGS]
+    return [
+        *(("piece_values", name) for name in names),
+        *(("prom_piece_values", name) for name in names if name in params["prom_piece_values"]),
+        *(("row", name) for name in params["position_scores"]),
+        *(("col", name) for name in params["position_scores"]),
+    ]
+
+
+def params_to_vector(params: dict, features: list[tuple[str, str]]) -> np.ndarray:
+    vector = np.empty(len(features))
+    for index, (group, name) in enumerate(features):
+        vector[index] = params["position_scores"][name][group] if group in ("row", "col") else params[group][name]
+    return vector
+
+
+def vector_to_params(vector: np.ndarray, params: dict, features: list[tuple[str, str]]) -> dict:
+    params = json.loads(json.dumps(params))
+    for value, (group, name) in zip(vector.tolist(), features):
+        if group in ("row", "col"):
+            params["position_scores"][name][group] = round(value, 3)
+        else:
+            params[group][name] = round(value, 2)
+    return params
+
+
+def extract_features(board: LightBoard, index: dict[tuple[str, str], int]) -> np.ndarray:
+    """Feature vector whose dot product with the parameter vector is the evaluation (kings excluded)."""
+    x = np.zeros(len(index))
+    center = (board.board_size - 1) / 2
+    for (px, py), piece in board.pieces.items():
+        sign = 1.0 if piece.team == "white" else -1.0
+        if piece.name not in KINGS:
+            group = "prom_piece_values" if piece.is_promoted else "piece_values"
+            x[index[(group, piece.name)]] += sign
+        # 位置評価は手番に関わらず足し込まれ、列の中央寄りは白だけ加点される
+        x[index[("row", piece.name)]] += (center - py) * POSITION_RATE
+        x[index[("col", piece.name)]] += abs(center - px) * (-1.0 if piece.team == "white" else 1.0) * POSITION_RATE
+
+    for team, sign in (("white", 1.0), ("black", -1.0)):
+        for name, pieces in board.get_player(team).captured_pieces.items():
+            x[index[("piece_values", name)]] += sign * len(pieces)
+    return x
+
+
+# ---- Self-play ----
+
+def selfplay(engine: dict, games: int, max_plies: int, random_plies: int, seed: int, processes: int | None) -> list[dict]:
+    rng = random.Random(seed)
+    layouts = BoardInitializer.layout_pairs()
+    tasks = []
+    for index in range(games):
+        board_type, black_board, white_board = rng.choice(layouts)
+        tasks.append({
+            "white": engine,
+            "black": engine,
+            "board_type": board_type,
+            "black_board": black_board,
+            "white_board": white_board,
+            "placeable": (rng.random() < 0.5, rng.random() < 0.5),
+            "max_plies": max_plies,
+            "random_plies": random_plies,
+            "seed": seed + index,
+        })
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(play_game, tasks, chunksize=4)
+        return [
+            {
+                "board_type": task["board_type"],
+                "black_board": task["black_board"],
+                "white_board": task["white_board"],
+                "placeable": task["placeable"],
+                "moves": result["moves"],
+                "winner": result["winner"],
+            }
+            for task, result in zip(tasks, results)
+        ]
+
+
+def read_games(path: str) -> list[dict]:
+    """Read games stored one JSON object per line, with moves in the compact notation of `models.ai.bench`."""
+    games = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            game = json.loads(line)
+            game["moves"] = [
+                (move[0], tuple(move[1])) if isinstance(move[0], str) else (tuple(move[0]), tuple(move[1]), *move[2:])
+                for move in game["moves"]
+            ]
+            games.append(game)
+    return games
+
+
+# ---- Feature extraction ----
+
+def extract_positions(games: list[dict], features: list[tuple[str, str]], skip_plies: int = 8) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Replay every game and collect one feature row per position after `skip_plies`.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Features (positions x parameters) and outcomes (1 white win, 0.5 draw, 0 black win)
+    """
+    index = {feature: position for position, feature in enumerate(features)}
+    rows, outcomes = [], []
+    for game in games:
+        black_placeable, white_placeable = game["placeable"]
+        board, team = create_board(game["board_type"], game["black_board"], game["white_board"], black_placeable, white_placeable)
+        outcome = OUTCOMES[game["winner"]]
+        for ply, move in enumerate(game["moves"]):
+            if ply >= skip_plies and has_king(board, "white") and has_king(board, "black"):
+                rows.append(extract_features(board, index))
+                outcomes.append(outcome)
+            if isinstance(move[0], str):
+                board.place(team, move[0], move[1])
+            else:
+                board.move(team, move[0], move[1], promote=len(move) > 2 and move[2])
+            team = opponent(team)
+
+    if not rows:
+        return np.zeros((0, len(features))), np.zeros(0)
+    return np.vstack(rows), np.array(outcomes)
+
+
+# ---- Fitting ----
+
+def sigmoid(values: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(values, -500, 500)))
+
+
+def log_loss(scores: np.ndarray, outcomes: np.ndarray, scale: float) -> float:
+    p = np.clip(sigmoid(scale * scores), 1e-12, 1 - 1e-12)
+    return float(-np.mean(outcomes * np.log(p) + (1 - outcomes) * np.log(1 - p)))
+
+
+def fit_scale(scores: np.ndarray, outcomes: np.ndarray) -> float:
+    """Scale mapping evaluation to win probability that fits the current parameters best."""
+    candidates = np.logspace(-3, 1, 200)
+    losses = [log_loss(scores, outcomes, scale) for scale in candidates]
+    return float(candidates[int(np.argmin(losses))])
+
+
+def fit(x: np.ndarray, outcomes: np.ndarray, initial: np.ndarray, features: list[tuple[str, str]], scale: float, epochs: int = 3000, learning_rate: float = 0.05, l2: float = 1e-3) -> np.ndarray:
+    """
+    Logistic regression of the outcome on `scale * x @ w` with Adam updates.
+
+    Parameters without any non-zero feature are kept, and an L2 penalty pulls
+    the others towards their initial values so that rare pieces do not drift.
+    Column weights are kept non-negative: the evaluation takes the absolute
+    value of the column term, so it is only linear in them while they are.
+    """
+    active = np.any(x != 0, axis=0)
+    non_negative = np.array([group == "col" for group, _ in features])
+    weights = initial.copy()
+    first_moment = np.zeros_like(weights)
+    second_moment = np.zeros_like(weights)
+    beta1, beta2 = 0.9, 0.999
+
+    for step in range(1, epochs + 1):
+        p = sigmoid(scale * (x @ weights))
+        gradient = scale * (x.T @ (p - outcomes)) / len(outcomes) + l2 * (weights - initial)
+        gradient[~active] = 0.0
+
+        first_moment = beta1 * first_moment + (1 - beta1) * gradient
+        second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+        corrected_first = first_moment / (1 - beta1 ** step)
+        corrected_second = second_moment / (1 - beta2 ** step)
+        weights -= learning_rate * corrected_first / (np.sqrt(corrected_second) + 1e-8)
+        weights[non_negative] = np.maximum(weights[non_negative], 0.0)
+
+    return weights
+
+
+def tune(x: np.ndarray, outcomes: np.ndarray, params: dict, features: list[tuple[str, str]], epochs: int) -> tuple[dict, dict]:
+    initial = params_to_vector(params, features)
+    scale = fit_scale(x @ initial, outcomes)
+    weights = fit(x, outcomes, initial, features, scale, epochs)
+
+    tuned = vector_to_params(weights, params, features)
+    tuned["version"] = params["version"] + 1
+    report = {
+        "positions": len(outcomes),
+        "scale": scale,
+        "lossBefore": log_loss(x @ initial, outcomes, scale),
+        "lossAfter": log_loss(x @ weights, outcomes, scale),
+    }
+    return tuned, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the evaluation parameters from game outcomes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    selfplay_parser = commands.add_parser("selfplay", help="Play self-play games and store them as JSON lines")
+    selfplay_parser.add_argument("--engine", type=parse_engine, default=parse_engine("self:depth=2"))
+    selfplay_parser.add_argument("--games", type=int, default=1000)
+    selfplay_parser.add_argument("--max-plies", type=int, default=200)
+    selfplay_parser.add_argument("--random-plies", type=int, default=4)
+    selfplay_parser.add_argument("--seed", type=int, default=0)
+    selfplay_parser.add_argument("--processes", type=int, default=os.cpu_count())
+    selfplay_parser.add_argument("--out", default="games.jsonl")
+
+    extract_parser = commands.add_parser("extract", help="Turn stored games into feature arrays")
+    extract_parser.add_argument("games", nargs="+", help="JSON lines files written by selfplay (or archived games in the same format)")
+    extract_parser.add_argument("--skip-plies", type=int, default=8, help="Opening plies left out of the training data")
+    extract_parser.add_argument("--out", default="positions.npz")
+
+    fit_parser = commands.add_parser("fit", help="Fit the parameters and write a new parameter file version")
+    fit_parser.add_argument("positions", help="Feature arrays written by extract")
+    fit_parser.add_argument("--epochs", type=int, default=3000)
+    fit_parser.add_argument("--out", default=evaluation_params.EVALUATION_PARAMS_PATH)
+    args = parser.parse_args()
+
+    if args.command == "selfplay":
+        games = selfplay(args.engine, args.games, args.max_plies, args.random_plies, args.seed, args.processes)
+        with open(args.out, "w", encoding="utf-8") as f:
+            for game in games:
+                f.write(json.dumps(game) + "\n")
+        print(f"{len(games)} games written to {args.out}")
+
+    elif args.command == "extract":
+        params = evaluation_params.load_params()
+        features = feature_names(params)
+        games = [game for path in args.games for game in read_games(path)]
+        x, outcomes = extract_positions(games, features, args.skip_plies)
+        np.savez_compressed(args.out, x=x, outcomes=outcomes, features=np.array(["/".join(feature) for feature in features]))
+        print(f"{len(outcomes)} positions from {len(games)} games written to {args.out}")
+
+    elif args.command == "fit":
+        data = np.load(args.positions)
+        params = evaluation_params.load_params()
+        features = feature_names(params)
+        if [tuple(feature.split("/")) for feature in data["features"]] != features:
+            raise SystemExit("The feature layout changed since extraction; run extract again")
+
+        tuned, report = tune(data["x"], data["outcomes"], params, features, args.epochs)
+        evaluation_params.write_params(tuned, args.out)
+        print(
+            f"{report['positions']} positions, scale {report['scale']:.4f}, "
+            f"loss {report['lossBefore']:.5f} -> {report['lossAfter']:.5f}, "
+            f"version {tuned['version']} written to {args.out}"
+        )
+
+
+if __name__ == "__main__":
+    main()
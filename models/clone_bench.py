@@ -0,0 +1,58 @@
+import argparse
+import contextlib
+import copy
+import io
+import json
+import time
+from models.ai.bench import MIDDLEGAMES
+from models.ai.perft import create_game, game_actions
+
+CLONES = {
+    "deepcopy": copy.deepcopy,
+    "copy": lambda game: game.copy(),
+}
+
+
+def time_clones(clone, games: list, actions: list, repeat: int) -> dict[str, float]:
+    """Best time of `repeat` passes to clone every game, and to clone it and play one action on the clone."""
+    best = {"clone": float("inf"), "cloneAction": float("inf")}
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for game in games:
+            clone(game)
+        cloned_at = time.perf_counter()
+        for game, action in zip(games, actions):
+            clone(game).perform_action(*action)
+        acted_at = time.perf_counter()
+
+        best["clone"] = min(best["clone"], cloned_at - started_at)
+        best["cloneAction"] = min(best["cloneAction"], acted_at - cloned_at)
+    return {name: seconds / len(games) * 1e6 for name, seconds in best.items()}
+
+
+def run_clone_bench(repeat: int = 20) -> dict:
+    """Compare `copy.deepcopy` with the copy-on-write `Game.copy` on the bench middlegames."""
+    # 詰み判定のログで出力が埋まらないようにする
+    with contextlib.redirect_stdout(io.StringIO()):
+        games = [create_game(board_type, layout, layout, moves) for board_type, layout, moves in MIDDLEGAMES]
+        actions = [game_actions(game)[0] for game in games]
+        return {name: time_clones(clone, games, actions, repeat) for name, clone in CLONES.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time cloning a game with copy.deepcopy and with the copy-on-write Game.copy.")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the positions; the fastest pass is reported")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    args = parser.parse_args()
+
+    result = run_clone_bench(args.repeat)
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    for name, timings in result.items():
+        print(f"{name:<8}: clone {timings['clone']:8.1f} us, clone + action {timings['cloneAction']:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
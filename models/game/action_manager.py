@@ -1,4 +1,4 @@
-import copy
+from models.game import zobrist
 from models.piece.chess_pieces import ChessKing, ChessRook, ChessPawn
 from models.piece.piece import Piece
 from models.game.board import Board
@@ -8,12 +8,22 @@ from models.type import Pieces, PiecePosition, LastMove
 class ActionManager:
 
     @staticmethod
-    def action(player: Player, board: Board, target_piece_id, promote, action_type, x, y, last_move: LastMove):
+    def action(player: Player, board: Board, target_piece_id, promote, action_type, x, y, last_move: LastMove, key: int = 0) -> tuple[LastMove, int, list[list]]:
+        """
+        Perform a move or a drop for `player`.
+
+        Args:
+            key (int): Zobrist key of the position before the action
+
+        Returns:
+            tuple[LastMove, int, list[list]]: The last move record, the Zobrist key after the action
+            and the delta that reverts it (see `create_delta`)
+        """
         piece = ActionManager.get_target_piece(player, board, target_piece_id, action_type)
         if not piece:
             raise ValueError(f"No pieces found. action type: {action_type}")
 
-        from_position = Board.get_piece_position_by_id(piece.piece_id, board.pieces)
+        from_position = board.get_position_by_id(piece.piece_id)
         is_placed = bool(from_position)
 
         to_position = (x, y)
@@ -21,10 +31,24 @@ class ActionManager:
         # Validate action and piece state
         ActionManager.validate_piece_for_action(is_placed, piece, player, action_type)
 
+        # 変化しうるマスと持ち駒、直前の手によるアンパッサンの権利だけキーから外し、処理後の状態で入れ直す
+        squares, hand_names = ActionManager.get_touched_state(player, board, piece, action_type, from_position, to_position, last_move)
+        key ^= ActionManager.state_key(player, board, squares, hand_names, last_move)
+
+        # 取り消し用に、変化しうる駒の処理前の位置と状態を控えておく
+        before = ActionManager.get_piece_states(board, piece, squares)
+
+        # 複製した盤と共有している駒は、書き換える前に自分用に複製する
+        if action_type == "move":
+            piece = board.get_writable_piece(from_position)
+        else:
+            piece = player.get_writable_captured_piece(piece.piece_id)
+
         if action_type == "move":
             ActionManager.move_piece(player, board, piece, from_position, to_position, last_move)
             if promote:
                 piece.to_promote_with_verification(from_position[1], to_position[1])
+                board.on_promote_piece(to_position)
         elif action_type == "place":
             ActionManager.place_piece(player, board, piece, to_position)
         
@@ -38,7 +62,156 @@ class ActionManager:
             "to_pos": to_position,
         }
 
-        return last_move
+        key ^= ActionManager.state_key(player, board, squares, hand_names, last_move) ^ zobrist.BLACK_TO_MOVE_KEY
+        return last_move, key, ActionManager.create_delta(player, board, before)
+
+    @staticmethod
+    def get_piece_states(board: Board, piece: Piece, squares: set) -> list[tuple]:
+        """`(piece_id, position, state)` of the acting piece and of every piece on `squares`; position None is the hand."""
+        pieces = {piece.piece_id: piece}
+        for position in squares:
+            square_piece = board.get_piece(position)
+            if square_piece:
+                pieces[square_piece.piece_id] = square_piece
+        return [(piece_id, board.get_position_by_id(piece_id), tracked.get_state()) for piece_id, tracked in pieces.items()]
+
+    @staticmethod
+    def create_delta(player: Player, board: Board, before: list[tuple]) -> list[list]:
+        """
+        Reversible record of an action: `[piece_id, from, to, state_before, state_after]`
+        for every piece it changed. A position of None means `player`'s hand, which
+        covers captures (including en passant) and drops; castling adds the rook.
+        """
+        delta = []
+        for piece_id, from_position, state in before:
+            to_position = board.get_position_by_id(piece_id)
+            piece = board.get_piece(to_position) if to_position else player.get_captured_piece_by_id(piece_id)
+            after = piece.get_state()
+            if from_position != to_position or state != after:
+                delta.append([piece_id, from_position, to_position, state, after])
+        return delta
+
+    @staticmethod
+    def undo(player: Player, board: Board, delta: list[list]):
+        """Revert an action of `player` from its delta."""
+        ActionManager.apply_delta(player, board, [
+            [piece_id, to_position, from_position, after, before]
+            for piece_id, from_position, to_position, before, after in delta
+        ])
+
+    @staticmethod
+    def redo(player: Player, board: Board, delta: list[list]):
+        """Play an action of `player` again from its delta, without validating it."""
+        ActionManager.apply_delta(player, board, delta)
+
+    @staticmethod
+    def apply_delta(player: Player, board: Board, delta: list[list]):
+        # 駒を取る手では移動先に別の駒がいるので、すべて取り除いてから置き直す
+        pieces = []
+        for piece_id, from_position, _, _, _ in delta:
+            if from_position:
+                pieces.append(board.get_writable_piece(from_position))
+                board.on_capture_piece(from_position)
+            else:
+                piece = player.get_writable_captured_piece(piece_id)
+                player.on_place_piece(piece)
+                pieces.append(piece)
+
+        for piece, (_, _, to_position, _, state) in zip(pieces, delta):
+            piece.restore_state(state)
+            if to_position:
+                board.on_place_piece(piece, to_position)
+            else:
+                player.add_captured_piece(piece)
+
+    @staticmethod
+    def pack_delta(delta: list[list]) -> list:
+        """
+        Compact JSON form of a delta: the five fields of every piece flattened into one list,
+        positions packed by `pack_position` and states by `pack_state`.
+        """
+        packed = []
+        for piece_id, from_position, to_position, before, after in delta:
+            packed += [
+                piece_id,
+                ActionManager.pack_position(from_position), ActionManager.pack_position(to_position),
+                ActionManager.pack_state(before), ActionManager.pack_state(after),
+            ]
+        return packed
+
+    @staticmethod
+    def unpack_delta(packed: list) -> list[list]:
+        return [
+            [
+                packed[i],
+                ActionManager.unpack_position(packed[i + 1]), ActionManager.unpack_position(packed[i + 2]),
+                ActionManager.unpack_state(packed[i + 3]), ActionManager.unpack_state(packed[i + 4]),
+            ]
+            for i in range(0, len(packed), 5)
+        ]
+
+    @staticmethod
+    def pack_position(position) -> int:
+        """`x * 16 + y`, or -1 for None (the hand)."""
+        return -1 if position is None else position[0] << 4 | position[1]
+
+    @staticmethod
+    def unpack_position(packed: int):
+        return None if packed < 0 else (packed >> 4, packed & 15)
+
+    @staticmethod
+    def pack_state(state: tuple) -> int:
+        """`Piece.get_state` as bit flags (white, promoted, rearranged) followed by the packed last position + 1."""
+        team, is_promoted, last_position, is_rearranged = state
+        flags = (team == "white") | bool(is_promoted) << 1 | bool(is_rearranged) << 2
+        return flags | (ActionManager.pack_position(last_position) + 1) << 3
+
+    @staticmethod
+    def unpack_state(packed: int) -> tuple:
+        return ("white" if packed & 1 else "black", bool(packed & 2), ActionManager.unpack_position((packed >> 3) - 1), bool(packed & 4))
+
+    @staticmethod
+    def delta_from_dict(delta: list[list]) -> list[list]:
+        """Restore the position tuples of a delta loaded from JSON."""
+        return [
+            [piece_id, tuple(from_position) if from_position else None, tuple(to_position) if to_position else None, before, after]
+            for piece_id, from_position, to_position, before, after in delta
+        ]
+
+    @staticmethod
+    def get_touched_state(player: Player, board: Board, piece: Piece, action_type: str, from_position, to_position, last_move: LastMove) -> tuple[set, set]:
+        """Squares and hand piece names of `player` that the action may change."""
+        if action_type == "place":
+            return {to_position}, {piece.name}
+
+        pieces = board.pieces
+        squares = {from_position, to_position}
+        special_processing_pieces = ActionManager.get_special_processing_pieces(piece, from_position, to_position, pieces, last_move)
+        castling_rook_move = special_processing_pieces["castling_rook"]
+        if castling_rook_move:
+            rook_position = castling_rook_move["position"]
+            squares.update({rook_position, ChessRook.get_after_castling_position(rook_position, from_position)})
+        en_passant_pawn_move = special_processing_pieces["en_passant_pawn"]
+        if en_passant_pawn_move:
+            squares.add(en_passant_pawn_move["position"])
+        squares.discard(None)
+
+        hand_names = {pieces[position].name for position in squares if position in pieces and pieces[position].team != player.team}
+        return squares, hand_names
+
+    @staticmethod
+    def state_key(player: Player, board: Board, squares: set, hand_names: set, last_move: LastMove = None) -> int:
+        """XOR of the Zobrist keys of the given squares, of `player`'s hand counts for the given names and of the en passant right of `last_move`."""
+        pieces = board.pieces
+        key = zobrist.en_passant_key(pieces, last_move)
+        for position in squares:
+            piece = pieces.get(position)
+            if piece:
+                key ^= zobrist.piece_key(piece.name, piece.team, piece.is_promoted, piece.is_first_move, position)
+
+        for name in hand_names:
+            key ^= zobrist.hand_key(name, player.team, player.count_captured_pieces(name))
+        return key
 
     @staticmethod
     def get_target_piece(player: Player, board: Board, target_piece_id: str, action_type: str) -> Piece:
@@ -65,8 +238,8 @@ class ActionManager:
         """Moves a piece on the board."""
         special_processing_pieces = ActionManager.get_special_processing_pieces(piece, from_position, to_position, board.pieces, last_move)
 
-        # コピーして移動処理が終わった後に使う
-        captured_piece: Piece = copy.deepcopy(board.get_piece(to_position))
+        # 取られる駒は持ち駒として書き換えるので、共有していれば複製しておく
+        captured_piece: Piece = board.get_writable_piece(to_position)
 
         piece.on_move_with_verification(from_position, to_position, board.pieces, last_move=last_move)
         board.on_move_piece(piece, from_position, to_position)
@@ -80,12 +253,12 @@ class ActionManager:
     @staticmethod
     def place_piece(player: Player, board: Board, piece: Piece, position: tuple[int, int]):
         """Places a captured piece on the board."""
-        if Board.get_piece_position_by_id(piece.piece_id, board.pieces):
+        if board.get_position_by_id(piece.piece_id):
             raise ValueError("This piece is already in place.")
         
-        if position and piece.can_place(position, board.pieces):
+        if position and piece.can_place(position, board.pieces, board.pawn_columns):
             if not board.get_piece(position):
-                piece.on_place(position, board.pieces)
+                piece.on_place(position, board.pieces, board.pawn_columns)
                 board.on_place_piece(piece, position)
                 player.on_place_piece(piece)
             else:
@@ -128,6 +301,7 @@ class ActionManager:
     def handle_castling(castling_rook, rook_prev_position, king_prev_position, board: Board):
         """Handles castling for the ChessKing piece."""
         if castling_rook and isinstance(castling_rook, ChessRook):
+            castling_rook = board.get_writable_piece(rook_prev_position)
             rook_to_position = castling_rook.get_after_castling_position(rook_prev_position, king_prev_position)
             castling_rook.on_move(rook_to_position)
             board.on_move_piece(castling_rook, rook_prev_position, rook_to_position)
@@ -136,6 +310,7 @@ class ActionManager:
     def handle_en_passant(attack_team: ChessPawn, from_position, en_passant_pawn: ChessPawn, player, board: Board):
         """Handles en passant for the ChessPawn piece."""
         if en_passant_pawn and isinstance(en_passant_pawn, ChessPawn):
+            en_passant_pawn = board.get_writable_piece(from_position)
             board.on_capture_piece(from_position)
             ActionManager.capture_piece(player, en_passant_pawn, attack_team)
 
@@ -1,7 +1,10 @@
-from models.piece.piece import Piece
+from models.piece.piece import Piece, PieceType
 from models.game.board_initializer import BoardInitializer
 from models.piece.pieces_info import PIECE_CLASSES
+from models.piece.shogi_pieces import ShogiPawn
 from models.type import Pieces
+from types import MappingProxyType
+from typing import AbstractSet, Mapping
 import json
 import copy
 
@@ -15,21 +18,35 @@ class Board:
         self.__white_board = white_board
         self.__size = size
         self.__pieces = pieces
+        # piece_id から位置を引くための索引。駒の移動・配置・捕獲のたびに更新する
+        self.__positions = {piece.piece_id: position for position, piece in pieces.items()}
+        # 二歩の判定のため、チームごとに列ごとの成っていない歩の数と、数えている歩の列を持つ
+        self.__pawn_columns = ShogiPawn.count_pawn_columns(pieces, size)
+        self.__column_pawns = {
+            piece.piece_id: (piece.team, position[0])
+            for position, piece in pieces.items() if ShogiPawn.blocks_column(piece.name, piece.is_promoted)
+        }
+        # 持ち駒を打てるマスを求めるための空きマスの集合 (読み取り専用のビューを返せるよう辞書のキーで持つ)
+        self.__empty_squares = dict.fromkeys(Piece.get_empty_squares(size, pieces))
+        # copy で複製した盤と辞書・駒を共有している間は、書き換える前に自分用に複製する
+        self.__shared = False
+        self.__owned: set[str] | None = None  # 複製後に自分用に複製した駒。None はすべて自分のもの
         
         self.__black_placeable = black_placeable
         self.__white_placable = white_placable
 
     def copy(self):
-        copied_pieces = copy.deepcopy(self.pieces)
-        return Board(
-            self.__board_type,
-            self.__black_board,
-            self.__white_board,
-            self.__black_placeable,
-            self.__white_placable,
-            self.__size,
-            copied_pieces
-        )
+        """
+        Clone the board in O(1) by sharing its pieces (copy-on-write).
+
+        The first change on either board copies the position dict, and a piece
+        is copied before it is modified (see `get_writable_piece`).
+        """
+        self.__shared = True
+        self.__owned = set()
+        clone = copy.copy(self)
+        clone.__owned = set()
+        return clone
 
     @property
     def board_type(self):
@@ -48,36 +65,113 @@ class Board:
         return self.__size
     
     @property
-    def pieces(self) -> dict[(int, int), Piece]:
-        return dict(self.__pieces)
+    def pieces(self) -> Mapping[tuple[int, int], Piece]:
+        """Read-only view of the pieces by position; it reflects later moves and is not copied."""
+        return MappingProxyType(self.__pieces)
+
+    @property
+    def pawn_columns(self) -> Mapping[str, list[int]]:
+        """Read-only unpromoted pawn count per column for each team, for `Piece.can_place`."""
+        return MappingProxyType(self.__pawn_columns)
+
+    @property
+    def empty_squares(self) -> AbstractSet[tuple[int, int]]:
+        """Read-only view of the squares without a piece; like `pieces` it reflects later moves."""
+        return MappingProxyType(self.__empty_squares).keys()
+
+    def get_writable_piece(self, position) -> Piece | None:
+        """
+        Returns the piece at `position` for modification, copying it first if it may be shared with a clone.
+        """
+        piece = self.get_piece(position)
+        if piece is None or self.__owned is None or piece.piece_id in self.__owned:
+            return piece
+
+        self.__unshare()
+        piece = copy.copy(piece)
+        self.__pieces[tuple(position)] = piece
+        self.__owned.add(piece.piece_id)
+        return piece
+
+    def __unshare(self):
+        if self.__shared:
+            self.__pieces = dict(self.__pieces)
+            self.__positions = dict(self.__positions)
+            self.__pawn_columns = {team: list(counts) for team, counts in self.__pawn_columns.items()}
+            self.__column_pawns = dict(self.__column_pawns)
+            self.__empty_squares = dict(self.__empty_squares)
+            self.__shared = False
+
+    def __track_pawn(self, piece: Piece, position):
+        if ShogiPawn.blocks_column(piece.name, piece.is_promoted):
+            self.__column_pawns[piece.piece_id] = (piece.team, position[0])
+            self.__pawn_columns[piece.team][position[0]] += 1
+
+    def __untrack_pawn(self, piece_id):
+        # 駒の状態は先に変わっていることがある (移動時の自動成り) ので、記録した列から外す
+        column = self.__column_pawns.pop(piece_id, None)
+        if column:
+            team, x = column
+            self.__pawn_columns[team][x] -= 1
 
     def on_place_piece(self, piece: Piece, position):
         if not self.get_piece(position):  
+            self.__unshare()
             self.__pieces[position] = piece
+            self.__positions[piece.piece_id] = position
+            self.__empty_squares.pop(position, None)
+            self.__track_pawn(piece, position)
 
     def on_move_piece(self, piece: Piece, from_position, to_position):
+        self.__unshare()
         captured_piece: Piece = self.get_piece(to_position)
         if captured_piece:
-            self.on_capture_piece(from_position)
+            self.__positions.pop(captured_piece.piece_id, None)
+            self.__untrack_pawn(captured_piece.piece_id)
 
         self.__pieces.pop(tuple(from_position), None)
         self.__pieces[to_position] = piece
+        self.__positions[piece.piece_id] = to_position
+        self.__empty_squares[tuple(from_position)] = None
+        self.__empty_squares.pop(to_position, None)
+        self.__untrack_pawn(piece.piece_id)
+        self.__track_pawn(piece, to_position)
+
+    def on_promote_piece(self, position):
+        """Update the indexes after the piece at `position` was promoted in place."""
+        piece = self.get_piece(position)
+        if piece:
+            self.__unshare()
+            self.__untrack_pawn(piece.piece_id)
+            self.__track_pawn(piece, position)
     
     def on_capture_piece(self, position):
-        self.__pieces.pop(position, None)
+        self.__unshare()
+        captured_piece = self.__pieces.pop(position, None)
+        if captured_piece:
+            self.__positions.pop(captured_piece.piece_id, None)
+            self.__untrack_pawn(captured_piece.piece_id)
+            self.__empty_squares[position] = None
 
     def get_piece(self, position):
         """
         Returns the piece at the given position (x, y), or None if unoccupied.
         """
         x, y = position
-        return self.pieces.get((x, y))
+        return self.__pieces.get((x, y))
 
     def get_piece_by_id(self, piece_id):
         """
         Finds and returns a piece by its unique ID.
         """
-        return next((piece for piece in self.pieces.values() if piece.piece_id == piece_id), None)
+        position = self.__positions.get(piece_id)
+        return self.__pieces.get(position) if position is not None else None
+
+    def get_position_by_id(self, piece_id):
+        """
+        Returns the position of the piece with the given ID, or None if it is not on the board.
+        """
+        return self.__positions.get(piece_id)
 
     @staticmethod
     def get_piece_position_by_id(piece_id, pieces: Pieces):
@@ -97,41 +191,51 @@ class Board:
         return tuple(int(i) for i in decoded_list)  # 各要素を整数に戻してタプルに変換
 
     @staticmethod
-    def piece_from_dict(data):
-        PieceClass = PIECE_CLASSES[data["class_name"]]
+    def piece_from_dict(data, piece_types: list[list] | None = None):
+        # 共有属性は種類の表から引く。表を持たない古い保存データは駒ごとに持っている
+        piece_type = PieceType(*piece_types[data["type"]]) if "type" in data else PieceType(*(data[field] for field in PieceType._fields))
+        PieceClass = PIECE_CLASSES[piece_type.class_name]
 
         return PieceClass(
             piece_id=data["piece_id"],
             team=data["team"],
-            board_size=data["board_size"],
-            promote_line=data["promote_line"],
-            is_banned_place=data["is_banned_place"],
-            is_banned_promote=data["is_banned_promote"],
+            board_size=piece_type.board_size,
+            promote_line=piece_type.promote_line,
+            is_banned_place=piece_type.is_banned_place,
+            is_banned_promote=piece_type.is_banned_promote,
             is_promoted=data["is_promoted"],
-            immobile_row=data["immobile_row"],
+            immobile_row=piece_type.immobile_row,
             last_position=data["last_position"],
             is_rearranged=data["is_rearranged"]
         )
 
     def to_dict(self):
+        piece_types: dict[PieceType, int] = {}
+        pieces = {
+            Board.encode_tuple(position): piece.to_dict(piece_types.setdefault(piece.piece_type, len(piece_types)))
+            for position, piece in self.__pieces.items()
+        }
         return {
             "board_type": self.__board_type,
             "black_board": self.__black_board,
             "white_board": self.__white_board,
             "size": self.__size,
-            "pieces": {Board.encode_tuple(position): piece.to_dict() for position, piece in self.__pieces.items()},
+            "piece_types": Piece.types_to_dict(piece_types),
+            "pieces": pieces,
         }
 
     @staticmethod
     def from_dict(data):
-        pieces = {Board.decode_tuple(position): Board.piece_from_dict(piece_data) for position, piece_data in data["pieces"].items()}
+        piece_types = data.get("piece_types")
+        pieces = {Board.decode_tuple(position): Board.piece_from_dict(piece_data, piece_types) for position, piece_data in data["pieces"].items()}
         board = Board(
             board_type=data["board_type"],
             black_board=data["black_board"],
             white_board=data["white_board"],
             black_placeable=False,  # ここでは適切な値を設定してください
             white_placable=False,   # 同様に適切な値を設定
+            size=data["size"],
+            pieces=pieces,
         )
-        board.__pieces = pieces
         return board
 
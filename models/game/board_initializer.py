@@ -75,6 +75,21 @@ PROMOTE_LINE = {
 }
 
 class BoardInitializer:
+    @staticmethod
+    def layout_pairs() -> list[tuple[str, str, str]]:
+        """
+        全ての盤の種類と、先手・後手の配置の組み合わせを返す
+
+        Returns:
+            list[tuple[str, str, str]]: (board_type, black_board, white_board)
+        """
+        return [
+            (board_type, black_board, white_board)
+            for board_type, positions in (("shogi", SHOGI_BOARD_POSITIONS), ("chess", CHESS_BOARD_POSITIONS))
+            for black_board in positions
+            for white_board in positions
+        ]
+
     @staticmethod
     def get_id(n: int) -> str:
         """
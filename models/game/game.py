@@ -1,9 +1,15 @@
+import copy
+import os
+from models.game import zobrist
 from models.game.board import Board
 from models.game.player import Player
 from models.send_data_manager import SendDataManager
 from models.game.hash_board import hash_board
 from models.game.action_manager import ActionManager  # Import ActionManager
 
+# 1 にすると、差分更新したキーを毎手作り直したキーと文字列形式で検算する
+HASH_DEBUG = os.getenv("GAME_HASH_DEBUG", "0") == "1"
+
 class Game:
     REPEAT_LIMIT = 4
 
@@ -12,10 +18,49 @@ class Game:
         self.__white = white
         self.__board = board
 
-        self.history = []
-        self.board_count = {}
+        self.history: list[int] = []
+        self.board_count: dict[int, int] = {}
         self.step = 1
         self.last_move = None  # Last move recorded as a dictionary
+        self.result = None  # 終局した場合は {"winner": ..., "reason": ...}
+        # 待った用の差分。{"pieces": ActionManager の差分, "last_move": [前, 後], "key": 後のキー}
+        # 保存するときは pack_delta の形にし、前の last_move は一つ前の差分から求め直す
+        self.deltas: list[dict] = []
+        self.redo_deltas: list[dict] = []
+        # 保存後の操作 (apply_event の形式)。game_store から読み込んだゲームだけが記録する
+        self.events: list[dict] | None = None
+        self.log_generation = 0  # 読み込み時のゲームの世代。作り直すたびに増える
+        self.log_version = 0  # 読み込み時の操作ログの件数
+        self.log_tail_length = 0  # そのうちスナップショット以降の件数
+
+        # 打てる駒の種類はゲーム中に変わらないので、LightBoard と同じく最初に一度だけ求める
+        placeable_state = {
+            piece.name: not piece.is_banned_place
+            for piece in [*board.pieces.values(), *black.captured_pieces, *white.captured_pieces]
+        }
+        self.placeable_names = [name for name, placeable in placeable_state.items() if placeable]
+
+        # 局面の Zobrist キー (盤面・持ち駒・手番)。ActionManager が差分で更新する
+        self.key = self.compute_key()
+        self.debug_hashes: dict[int, str] = {}
+        self.add_history()
+
+    def copy(self):
+        """
+        Clone the game for simulation. Board and players are shared copy-on-write
+        (see `Board.copy`), so only the history lists are copied. The clone is not
+        tied to the game store.
+        """
+        clone = copy.copy(self)
+        clone.__black = self.black.copy()
+        clone.__white = self.white.copy()
+        clone.__board = self.board.copy()
+        clone.history = list(self.history)
+        clone.board_count = dict(self.board_count)
+        clone.deltas = list(self.deltas)
+        clone.redo_deltas = list(self.redo_deltas)
+        clone.events = None
+        return clone
 
     @property
     def black(self):
@@ -33,34 +78,115 @@ class Game:
     def current_player(self):
         return self.white if self.step % 2 == 1 else self.black
 
+    def compute_key(self) -> int:
+        """Zobrist key of the current position computed from scratch (same key as `LightBoard.key`)."""
+        hand_counts = {player.team: player.hand_counts() for player in (self.black, self.white)}
+        return zobrist.compute_key(self.board.pieces, hand_counts, self.current_player.team, self.board.size, self.placeable_names, self.last_move)
+
+    def verify_key(self):
+        """Cross-check the incremental key against a full recomputation and the string form of the position."""
+        expected = self.compute_key()
+        if self.key != expected:
+            raise AssertionError(f"Incremental Zobrist key {self.key:016x} differs from recomputed key {expected:016x}")
+
+        board_hash = hash_board(self.board.pieces, self.board.size, self.black.captured_pieces, self.white.captured_pieces)
+        board_hash = f"{board_hash}/{self.current_player.team}"
+        if self.debug_hashes.setdefault(self.key, board_hash) != board_hash:
+            raise AssertionError(f"Zobrist key collision: {self.key:016x}")
+
     def add_history(self):
-        board_hash = hash_board(
-            self.board.pieces, 
-            self.board.size, 
-            self.black.captured_pieces, 
-            self.white.captured_pieces
-        )
-        self.history.append(board_hash)
-        self.board_count[board_hash] = self.board_count.get(board_hash, 0) + 1
+        if HASH_DEBUG:
+            self.verify_key()
+        self.history.append(self.key)
+        self.board_count[self.key] = self.board_count.get(self.key, 0) + 1
 
     def check_repetition(self):
-        return max(self.board_count.values(), default=0) >= self.REPEAT_LIMIT
+        # 直前に記録した局面だけが回数を増やすので、現局面の回数を見れば足りる
+        return self.board_count.get(self.key, 0) >= self.REPEAT_LIMIT
 
     def next_turn(self):
-        self.add_history()
+        # キーは手番を含むので、手番を進めてから記録する
         self.step += 1
+        self.add_history()
+
+        if self.check_repetition():
+            self.game_set(None, "repetition")
+
+    def undo(self, n: int = 1):
+        """
+        Take back the last `n` actions, each reverted from its recorded delta.
+
+        Raises:
+            ValueError: If fewer than `n` actions are recorded
+        """
+        if n < 1 or n > len(self.deltas):
+            raise ValueError(f"Cannot undo {n} action(s): {len(self.deltas)} recorded.")
+
+        for _ in range(n):
+            delta = self.deltas.pop()
+            self.step -= 1
+            ActionManager.undo(self.current_player, self.board, delta["pieces"])
+
+            removed_key = self.history.pop()
+            self.board_count[removed_key] -= 1
+            if not self.board_count[removed_key]:
+                del self.board_count[removed_key]
+            self.key = self.history[-1]
+            self.last_move = delta["last_move"][0]
+            # 終局後の手は指せないので、取り消した手の前は必ず対局中
+            self.result = None
+            self.redo_deltas.append(delta)
 
-        # if self.check_repetition():
-        #     self.game_set()
-        # else:
-        #     self.step += 1
+            if HASH_DEBUG:
+                self.verify_key()
+        self.record_event({"type": "undo", "count": n})
 
-    def game_set(self):
-        print("The game is a draw due to repetition.")
+    def redo(self, n: int = 1):
+        """
+        Replay `n` actions taken back by `undo`. A new action discards them.
+
+        Raises:
+            ValueError: If fewer than `n` actions can be replayed
+        """
+        if n < 1 or n > len(self.redo_deltas):
+            raise ValueError(f"Cannot redo {n} action(s): {len(self.redo_deltas)} available.")
+
+        for _ in range(n):
+            self.replay_delta(self.redo_deltas.pop())
+        self.record_event({"type": "redo", "count": n})
+
+    def replay_delta(self, delta: dict):
+        """Play the action recorded in `delta` without move generation."""
+        ActionManager.redo(self.current_player, self.board, delta["pieces"])
+        self.key = delta["key"]
+        self.last_move = delta["last_move"][1]
+        self.deltas.append(delta)
+        self.next_turn()
+
+    def record_event(self, event: dict):
+        if self.events is not None:
+            self.events.append(event)
+
+    def apply_event(self, event: dict):
+        """
+        Replay one stored event: `{"type": "action", "delta": ...}` or
+        `{"type": "undo" | "redo", "count": n}` (delta as in `to_dict`).
+        """
+        if event["type"] == "action":
+            self.redo_deltas.clear()
+            self.replay_delta(self.unpack_delta(event["delta"], self.last_move))
+        elif event["type"] == "undo":
+            self.undo(event["count"])
+        elif event["type"] == "redo":
+            self.redo(event["count"])
+        else:
+            raise ValueError(f"Invalid event type. {event['type']}")
+
+    def game_set(self, winner: str | None, reason: str):
+        self.result = {"winner": winner, "reason": reason}
 
     def is_game_over(self):
-        # TODO: Implement the logic to determine if the game is over
-        return False
+        return self.result is not None
 
     def to_dict(self):
         return {
@@ -69,6 +195,12 @@ class Game:
             "board": self.board.to_dict(),
             "step": self.step,
             "last_move": self.last_move,
+            "history": zobrist.pack_keys(self.history),
+            "result": self.result,
+            "deltas": [Game.pack_delta(delta) for delta in self.deltas],
+            "redo_deltas": [Game.pack_delta(delta) for delta in self.redo_deltas],
+            # 最初の差分の前の last_move。ほかの差分の前の last_move は隣の差分の後の last_move
+            "deltas_last_move": self.deltas[0]["last_move"][0] if self.deltas else None,
         }
 
     @staticmethod
@@ -79,7 +211,53 @@ class Game:
         game = Game(black=black, white=white, board=board)
         game.step = data["step"]
         game.last_move = data["last_move"]
+        game.result = data.get("result")
+        game.key = game.compute_key()
+        game.deltas = game.unpack_deltas(data.get("deltas", []), data.get("deltas_last_move"))
+        # やり直す差分は末尾から順に指すので、現局面の last_move から逆順にたどる
+        game.redo_deltas = game.unpack_deltas(data.get("redo_deltas", [])[::-1], game.last_move)[::-1]
+
+        # 履歴を持たない保存データでは現局面から数え直す
+        game.history = zobrist.unpack_keys(data["history"]) if data.get("history") else [game.key]
+        game.board_count = {}
+        for key in game.history:
+            game.board_count[key] = game.board_count.get(key, 0) + 1
         return game
+
+    @staticmethod
+    def pack_delta(delta: dict) -> list:
+        """Stored form of a delta: `[key, *ActionManager.pack_delta(pieces)]`; the last moves are derived on load."""
+        return [delta["key"], *ActionManager.pack_delta(delta["pieces"])]
+
+    def unpack_deltas(self, data: list, last_move) -> list[dict]:
+        deltas = []
+        for packed in data:
+            deltas.append(self.unpack_delta(packed, last_move))
+            last_move = deltas[-1]["last_move"][1]
+        return deltas
+
+    def unpack_delta(self, data, last_move) -> dict:
+        """
+        Restore a stored delta played from a position whose last move was `last_move`.
+
+        Its own last move is rebuilt from the acting piece, which `ActionManager.create_delta`
+        always lists first. Deltas saved as dicts by earlier versions are read as they are.
+        """
+        if isinstance(data, dict):
+            return {**data, "pieces": ActionManager.delta_from_dict(data["pieces"])}
+
+        pieces = ActionManager.unpack_delta(data[1:])
+        piece_id, from_position, to_position, _, (team, *_) = pieces[0]
+        piece = self.board.get_piece_by_id(piece_id) or self.black.get_captured_piece_by_id(piece_id) or self.white.get_captured_piece_by_id(piece_id)
+        action_last_move = {
+            "action_type": "move" if from_position else "place",
+            "piece_id": piece_id,
+            "piece_name": piece.name,
+            "team": team,
+            "from_pos": from_position,
+            "to_pos": to_position,
+        }
+        return {"pieces": pieces, "last_move": [last_move, action_last_move], "key": data[0]}
     
     def get_game_data_dict(self):
         board_settings = {
@@ -91,6 +269,8 @@ class Game:
 
         game_state = {
             "pieces": self.board.pieces or {},
+            "pawn_columns": self.board.pawn_columns,
+            "empty_squares": self.board.empty_squares,
             "board_settings": board_settings,
             "board_size": board_settings["size"],
             "black_captured_pieces": self.black.captured_pieces or [],
@@ -100,15 +280,22 @@ class Game:
             "last_move": self.last_move,
             "white_checked": False,  # Placeholder for check status
             "black_checked": False,  # Placeholder for check status
-            "game_result": None,  # Game result (draw, win, etc.)
+            "game_result": self.result,  # Game result (draw, win, etc.)
             "error": None  # Error messages if any
         }
 
         return SendDataManager.create_game_data_dict(game_state)
 
     def perform_action(self, target_piece_id, promote, action_type, x, y):
+        if self.is_game_over():
+            raise ValueError("The game is already over.")
+
         # Use ActionManager to perform the action
-        last_move = ActionManager.action(self.current_player, self.board, target_piece_id, promote, action_type, x, y, self.last_move)
+        last_move, self.key, delta = ActionManager.action(self.current_player, self.board, target_piece_id, promote, action_type, x, y, self.last_move, self.key)
+        delta = {"pieces": delta, "last_move": [self.last_move, last_move], "key": self.key}
+        self.deltas.append(delta)
+        self.redo_deltas.clear()
+        self.record_event({"type": "action", "delta": Game.pack_delta(delta)})
 
         # Update the last move and check for repetition
         self.last_move = last_move
@@ -6,8 +6,8 @@ def hash_board(pieces, size, black_captured_pieces, white_captured_pieces):
     """
     def serialize_board_state():
         state = []
-        for y in range(1, size + 1):
-            for x in range(1, size + 1):
+        for y in range(size):
+            for x in range(size):
                 piece: Piece = pieces.get((x, y))
                 if piece:
                     promote_state = "P" if piece.is_promoted else "N"
@@ -1,16 +1,31 @@
-from models.piece.piece import Piece
+from bisect import bisect_left, insort
+from models.piece.piece import Piece, PieceType
 from models.game.board import Board
 import copy
 
 class Player:
-    def __init__(self, player_id: str, team: str, captured_pieces: list[Piece] = []):
+    def __init__(self, player_id: str, team: str, captured_pieces: list[Piece] | None = None):
         self.__player_id = player_id
         self.__team = team
-        self.__captured_pieces = captured_pieces
+        # 持ち駒は駒の種類ごとに piece_id 順のリストで持ち、piece_id からも引けるようにする
+        self.__hand: dict[str, list[Piece]] = {}
+        self.__pieces_by_id: dict[str, Piece] = {}
+        self.__ordered: tuple[Piece, ...] | None = ()  # captured_pieces の結果。変更したら作り直す
+        # Board と同じく、copy で複製した後は書き換える前に自分用に複製する
+        self.__shared = False
+        self.__owned: set[str] | None = None
+
+        for piece in captured_pieces or []:
+            self.add_captured_piece(piece)
 
     def copy(self):
-        return Player(self.player_id, self.team, copy.deepcopy(self.__captured_pieces))
-    
+        """Clone the player in O(1) by sharing its captured pieces (copy-on-write, see `Board.copy`)."""
+        self.__shared = True
+        self.__owned = set()
+        clone = copy.copy(self)
+        clone.__owned = set()
+        return clone
+
     @property
     def player_id(self):
         return self.__player_id
@@ -18,48 +33,98 @@ class Player:
     @property
     def team(self):
         return self.__team
-    
+
     @team.setter
     def team(self, value):
         if value in ("black", "white"):
             self.__team = value
-    
+
     @property
-    def captured_pieces(self) -> list[Piece]:
-        return list(self.__captured_pieces)
-    
+    def captured_pieces(self) -> tuple[Piece, ...]:
+        """Captured pieces in piece_id order. The tuple is reused until the hand changes, so reading it does not copy."""
+        if self.__ordered is None:
+            self.__ordered = tuple(sorted(self.__pieces_by_id.values()))
+        return self.__ordered
+
     @property
     def captured_piece_count(self):
-        return len(self.__captured_pieces)
+        return len(self.__pieces_by_id)
+
+    def count_captured_pieces(self, name) -> int:
+        return len(self.__hand.get(name, ()))
+
+    def hand_counts(self) -> dict[str, int]:
+        return {name: len(pieces) for name, pieces in self.__hand.items() if pieces}
+
+    def get_writable_captured_piece(self, piece_id) -> Piece | None:
+        """Returns a captured piece for modification, copying it first if it may be shared with a clone."""
+        piece = self.get_captured_piece_by_id(piece_id)
+        if piece is None or self.__owned is None or piece_id in self.__owned:
+            return piece
+
+        self.__unshare()
+        bucket = self.__hand[piece.name]
+        copied = copy.copy(piece)
+        bucket[bisect_left(bucket, piece)] = copied
+        self.__pieces_by_id[piece_id] = copied
+        self.__ordered = None
+        self.__owned.add(piece_id)
+        return copied
+
+    def __unshare(self):
+        if self.__shared:
+            self.__hand = {name: list(pieces) for name, pieces in self.__hand.items()}
+            self.__pieces_by_id = dict(self.__pieces_by_id)
+            self.__shared = False
 
     def add_captured_piece(self, piece: Piece):
-        self.__captured_pieces.append(piece)
-        self.__captured_pieces.sort()
+        self.__unshare()
+        insort(self.__hand.setdefault(piece.name, []), piece)
+        self.__pieces_by_id[piece.piece_id] = piece
+        self.__ordered = None
 
     def get_captured_piece_by_id(self, piece_id):
-        return next((piece for piece in self.__captured_pieces if piece.piece_id == piece_id), None)
-    
+        return self.__pieces_by_id.get(piece_id)
+
     def get_captured_piece_by_name(self, name):
-        return next((piece for piece in self.__captured_pieces if piece.name == name), None)
+        """The captured piece of that type with the smallest piece_id."""
+        pieces = self.__hand.get(name)
+        return pieces[0] if pieces else None
 
     def on_place_piece(self, piece: Piece):
-        self.__captured_pieces.remove(piece)
+        self.__unshare()
+        bucket = self.__hand.get(piece.name, [])
+        index = bisect_left(bucket, piece)
+        if index == len(bucket) or bucket[index] is not piece:
+            raise ValueError(f"{piece.piece_id} is not a captured piece of {self.__team}.")
+        del bucket[index]
+        del self.__pieces_by_id[piece.piece_id]
+        self.__ordered = None
 
     def reset_captured_pieces(self):
-        self.__captured_pieces.clear()
+        self.__unshare()
+        self.__hand.clear()
+        self.__pieces_by_id.clear()
+        self.__ordered = ()
 
     def to_dict(self):
+        piece_types: dict[PieceType, int] = {}
+        captured_pieces = [piece.to_dict(piece_types.setdefault(piece.piece_type, len(piece_types))) for piece in self.captured_pieces]
         return {
             "player_id": self.__player_id,
             "team": self.__team,
-            "captured_pieces": [piece.to_dict() for piece in self.__captured_pieces],
+            "piece_types": Piece.types_to_dict(piece_types),
+            "captured_pieces": captured_pieces,
         }
-    
+
     @staticmethod
     def from_dict(data):
-        player = Player(player_id=data["player_id"], team=data["team"])
-        player.__captured_pieces = [Board.piece_from_dict(piece) for piece in data["captured_pieces"]]
-        return player
+        piece_types = data.get("piece_types")
+        return Player(
+            player_id=data["player_id"],
+            team=data["team"],
+            captured_pieces=[Board.piece_from_dict(piece, piece_types) for piece in data["captured_pieces"]],
+        )
 
     def __repr__(self):
-        return f"Player(player_id={self.__player_id}, team={self.__team}, captured_pieces={len(self.__captured_pieces)})"
+        return f"Player(player_id={self.__player_id}, team={self.__team}, captured_pieces={len(self.__pieces_by_id)})"
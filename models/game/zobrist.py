@@ -0,0 +1,123 @@
+import base64
+import random
+import sys
+from array import array
+from models.piece.pieces_info import PIECE_CLASSES
+
+# 乱数表はプロセス間・再起動後も同じ値になるよう固定シードで生成する
+ZOBRIST_SEED = 0x5A0B2157
+MAX_BOARD_SIZE = 9
+MAX_HAND_COUNT = 40
+TEAMS = ("black", "white")
+
+# 初手フラグで合法手が変わる駒 (キャスリング・ポーンの2マス移動) だけ初手フラグを区別する
+FIRST_MOVE_SENSITIVE_PIECES = {"ChessKing", "ChessRook", "ChessPawn"}
+
+_random = random.Random(ZOBRIST_SEED)
+
+PIECE_KEYS: dict[tuple[str, str, bool, bool], list[int]] = {
+    (name, team, is_promoted, is_first_move): [_random.getrandbits(64) for _ in range(MAX_BOARD_SIZE * MAX_BOARD_SIZE)]
+    for name in PIECE_CLASSES
+    for team in TEAMS
+    for is_promoted in (False, True)
+    for is_first_move in (False, True)
+}
+
+# 持ち駒0枚は 0 にしておき、空の持ち駒がキーに影響しないようにする
+HAND_KEYS: dict[tuple[str, str], list[int]] = {
+    (name, team): [0, *(_random.getrandbits(64) for _ in range(MAX_HAND_COUNT))]
+    for name in PIECE_CLASSES
+    for team in TEAMS
+}
+
+BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+PLACEABLE_KEYS: dict[str, int] = {name: _random.getrandbits(64) for name in PIECE_CLASSES}
+BOARD_SIZE_KEYS: dict[int, int] = {size: _random.getrandbits(64) for size in range(MAX_BOARD_SIZE + 1)}
+# アンパッサンで取れる駒のマス。既存のキーが変わらないよう、乱数表の最後に追加する
+EN_PASSANT_KEYS: list[int] = [_random.getrandbits(64) for _ in range(MAX_BOARD_SIZE * MAX_BOARD_SIZE)]
+
+
+def piece_key(name: str, team: str, is_promoted: bool, is_first_move: bool, position: tuple[int, int]) -> int:
+    first_move = bool(is_first_move) and name in FIRST_MOVE_SENSITIVE_PIECES
+    return PIECE_KEYS[(name, team, bool(is_promoted), first_move)][position[0] * MAX_BOARD_SIZE + position[1]]
+
+
+def hand_key(name: str, team: str, count: int) -> int:
+    return HAND_KEYS[(name, team)][count]
+
+
+def side_key(team: str) -> int:
+    return BLACK_TO_MOVE_KEY if team == "black" else 0
+
+
+def en_passant_move_key(pieces, team: str, from_position, to_position) -> int:
+    """
+    Key of the en passant right left by a move of `team` (see `ChessPawn.get_en_passant`).
+
+    A piece that moved two rows forward can be taken en passant by an unpromoted
+    enemy ChessPawn beside it on the next move. The key is 0 when no pawn can,
+    so positions only differ when the right changes the legal moves.
+    """
+    x, y = to_position
+    if from_position is None or y - from_position[1] != (2 if team == "black" else -2):
+        return 0
+    for dx in (-1, 1):
+        piece = pieces.get((x + dx, y))
+        if piece and piece.name == "ChessPawn" and piece.team != team and not piece.is_promoted:
+            return EN_PASSANT_KEYS[x * MAX_BOARD_SIZE + y]
+    return 0
+
+
+def en_passant_key(pieces, last_move) -> int:
+    """`en_passant_move_key` of the last move of the game (a `LastMove` dict or None)."""
+    if not last_move or not last_move.get("from_pos"):
+        return 0
+    return en_passant_move_key(pieces, last_move["team"], last_move["from_pos"], last_move["to_pos"])
+
+
+def rules_key(board_size: int, placeable_names) -> int:
+    """Key for the fixed rules of a game: board size and which piece types may be dropped."""
+    key = BOARD_SIZE_KEYS[board_size]
+    for name in placeable_names:
+        key ^= PLACEABLE_KEYS[name]
+    return key
+
+
+def compute_key(pieces, hand_counts: dict[str, dict[str, int]], side_to_move: str, board_size: int, placeable_names, last_move=None) -> int:
+    """
+    Compute a 64-bit Zobrist key from scratch.
+
+    Args:
+        pieces: Mapping of position to piece (anything with name / team / is_promoted / is_first_move)
+        hand_counts (dict[str, dict[str, int]]): Captured piece counts per team and piece name
+        side_to_move (str): The team to move
+        board_size (int): Size of the board
+        placeable_names: Piece names that may be dropped from hand
+        last_move (LastMove | None): The move that led to the position, for the en passant right
+
+    Returns:
+        int: The position key
+    """
+    key = rules_key(board_size, placeable_names) ^ side_key(side_to_move) ^ en_passant_key(pieces, last_move)
+    for position, piece in pieces.items():
+        key ^= piece_key(piece.name, piece.team, piece.is_promoted, piece.is_first_move, position)
+    for team, counts in hand_counts.items():
+        for name, count in counts.items():
+            key ^= hand_key(name, team, count)
+    return key
+
+
+def pack_keys(keys: list[int]) -> str:
+    """Encode position keys as base64 of little-endian unsigned 64-bit integers (8 bytes per key)."""
+    packed = array("Q", keys)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+
+def unpack_keys(data: str) -> list[int]:
+    packed = array("Q")
+    packed.frombytes(base64.b64decode(data))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tolist()
@@ -0,0 +1,85 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import tracemalloc
+from models.ai.bench import MIDDLEGAMES
+from models.ai.perft import create_game
+from models.game.board_initializer import BoardInitializer
+
+
+def size_positions() -> list[tuple[str, str, str, str, list[tuple]]]:
+    """Every initial layout pair and the bench middlegames as (name, board_type, black_board, white_board, moves)."""
+    positions = [
+        (f"{board_type} {black_board} vs {white_board}", board_type, black_board, white_board, [])
+        for board_type, black_board, white_board in BoardInitializer.layout_pairs()
+    ]
+    positions += [
+        (f"{board_type} {layout} middlegame", board_type, layout, layout, moves)
+        for board_type, layout, moves in MIDDLEGAMES
+    ]
+    return positions
+
+
+def measure_game(board_type: str, black_board: str, white_board: str, moves: list[tuple], copies: int) -> dict:
+    """
+    Memory and stored size of one game.
+
+    Builds `copies` independent games (through `Game.from_dict`, as a request
+    does) and reports the tracked objects and bytes they hold per game.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        stored = json.dumps(create_game(board_type, black_board, white_board, moves).to_dict())
+
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    tracemalloc.start()
+    from models.game.game import Game
+    games = [Game.from_dict(json.loads(stored)) for _ in range(copies)]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    objects = len(gc.get_objects()) - objects_before
+    pieces = len(games[0].board.pieces) + games[0].black.captured_piece_count + games[0].white.captured_piece_count
+
+    return {
+        "pieces": pieces,
+        "objects": objects / copies,
+        "bytes": allocated / copies,
+        "storedBytes": len(stored),
+    }
+
+
+def run_game_size(copies: int = 50) -> dict:
+    results = [
+        {"position": name, **measure_game(board_type, black_board, white_board, moves, copies)}
+        for name, board_type, black_board, white_board, moves in size_positions()
+    ]
+    return {
+        "positions": results,
+        "objects": sum(result["objects"] for result in results) / len(results),
+        "bytes": sum(result["bytes"] for result in results) / len(results),
+        "storedBytes": sum(result["storedBytes"] for result in results) / len(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report objects, memory and stored JSON size per game for every board variant.")
+    parser.add_argument("--copies", type=int, default=50, help="Games built per position to average the memory over")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    args = parser.parse_args()
+
+    result = run_game_size(args.copies)
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    for position in result["positions"]:
+        print(f"{position['position']}: {position['pieces']} pieces, {position['objects']:.0f} objects, "
+              f"{position['bytes'] / 1024:.1f} KiB, stored {position['storedBytes'] / 1024:.1f} KiB")
+    print(f"Average: {result['objects']:.0f} objects, {result['bytes'] / 1024:.1f} KiB, stored {result['storedBytes'] / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
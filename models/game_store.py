@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+from urllib.parse import quote
+from models.game.game import Game
+
+# データ保存 (14日間 = 14 * 24 * 60 * 60秒)
+TTL_IN_SECONDS = 14 * 24 * 60 * 60
+# 操作ログの末尾がこの件数に達したら、ゲーム全体のスナップショットを書き直す
+SNAPSHOT_INTERVAL = int(os.getenv("GAME_SNAPSHOT_INTERVAL", 16))
+
+# 読み込んだ後にゲームが作り直されておらず、ログも伸びていなければ追記する。
+# スナップショットを渡した場合は末尾を空にする
+#   KEYS: ログ, 末尾, スナップショット, 世代
+#   ARGV: 読み込み時の世代, 読み込み時のログの件数, TTL, スナップショット ("" なら追記だけ), 操作...
+APPEND_SCRIPT = """
+if (redis.call("GET", KEYS[4]) or "0") ~= ARGV[1] or redis.call("LLEN", KEYS[1]) ~= tonumber(ARGV[2]) then
+    return -1
+end
+if ARGV[4] ~= "" then
+    redis.call("SET", KEYS[3], ARGV[4])
+    redis.call("DEL", KEYS[2])
+end
+for i = 5, #ARGV do
+    redis.call("RPUSH", KEYS[1], ARGV[i])
+    if ARGV[4] == "" then
+        redis.call("RPUSH", KEYS[2], ARGV[i])
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call("EXPIRE", key, ARGV[3])
+end
+return redis.call("LLEN", KEYS[1])
+"""
+
+
+class StaleGameError(ValueError):
+    """The stored game changed after it was loaded, so its events cannot be appended."""
+
+
+def game_key(user_id) -> str:
+    return f"game_cls_dict:{user_id}"
+
+
+def game_tail_key(user_id) -> str:
+    return f"game_tail:{user_id}"
+
+
+def game_log_key(user_id) -> str:
+    return f"game_log:{user_id}"
+
+
+def game_generation_key(user_id) -> str:
+    return f"game_generation:{user_id}"
+
+
+class RedisGameLog:
+    """
+    Games stored in Redis as a snapshot, the events since the snapshot and the
+    append-only log of every event. Old saves are a snapshot without events.
+
+    Appends are checked against the log length and a generation counter that
+    `reset` increments, so a writer that loaded a game before it was created
+    again cannot append to the new one even when the logs have the same length.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.append_script = redis_client.register_script(APPEND_SCRIPT)
+
+    def read(self, user_id) -> tuple[str | None, list[str], int, int]:
+        """Return the snapshot, the events after it, the generation and the length of the log."""
+        pipe = self.redis_client.pipeline()
+        pipe.get(game_key(user_id))
+        pipe.lrange(game_tail_key(user_id), 0, -1)
+        pipe.get(game_generation_key(user_id))
+        pipe.llen(game_log_key(user_id))
+        snapshot, tail, generation, version = pipe.execute()
+        return snapshot, tail, int(generation or 0), version
+
+    def read_log(self, user_id) -> list[str]:
+        return self.redis_client.lrange(game_log_key(user_id), 0, -1)
+
+    def reset(self, user_id, snapshot: str) -> int:
+        """Store a new game in place of any previous one and return its generation."""
+        pipe = self.redis_client.pipeline()
+        pipe.incr(game_generation_key(user_id))
+        pipe.expire(game_generation_key(user_id), TTL_IN_SECONDS)
+        pipe.set(game_key(user_id), snapshot, ex=TTL_IN_SECONDS)
+        pipe.delete(game_tail_key(user_id), game_log_key(user_id))
+        generation, *_ = pipe.execute()
+        return generation
+
+    def append(self, user_id, generation: int, version: int, events: list[str], snapshot: str | None = None) -> int | None:
+        """
+        Append events if the game is still `generation` and its log still has `version`
+        entries; return the new length or None if either changed.
+        """
+        keys = [game_log_key(user_id), game_tail_key(user_id), game_key(user_id), game_generation_key(user_id)]
+        length = self.append_script(keys=keys, args=[generation, version, TTL_IN_SECONDS, snapshot or "", *events])
+        return None if length < 0 else length
+
+
+class FileGameLog:
+    """
+    Stand-in for `RedisGameLog` that keeps the same records as files in a directory.
+
+    Meant for tests and local runs in a single process; there is no TTL.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.__lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def read(self, user_id) -> tuple[str | None, list[str], int, int]:
+        with self.__lock:
+            snapshot = self.__read_text(self.__path(user_id, "json"))
+            return snapshot, self.__read_lines(user_id, "tail"), self.__read_generation(user_id), len(self.__read_lines(user_id, "log"))
+
+    def read_log(self, user_id) -> list[str]:
+        with self.__lock:
+            return self.__read_lines(user_id, "log")
+
+    def reset(self, user_id, snapshot: str) -> int:
+        with self.__lock:
+            generation = self.__read_generation(user_id) + 1
+            self.__write_text(self.__path(user_id, "generation"), str(generation))
+            self.__write_text(self.__path(user_id, "json"), snapshot)
+            for name in ("tail", "log"):
+                self.__write_text(self.__path(user_id, f"{name}.jsonl"), "")
+            return generation
+
+    def append(self, user_id, generation: int, version: int, events: list[str], snapshot: str | None = None) -> int | None:
+        with self.__lock:
+            log = self.__read_lines(user_id, "log")
+            if self.__read_generation(user_id) != generation or len(log) != version:
+                return None
+            if snapshot is not None:
+                self.__write_text(self.__path(user_id, "json"), snapshot)
+                self.__write_text(self.__path(user_id, "tail.jsonl"), "")
+            names = ("log",) if snapshot is not None else ("log", "tail")
+            for name in names:
+                with open(self.__path(user_id, f"{name}.jsonl"), "a", encoding="utf-8") as f:
+                    f.writelines(f"{event}\n" for event in events)
+            return len(log) + len(events)
+
+    def __path(self, user_id, suffix: str) -> str:
+        return os.path.join(self.directory, f"{quote(str(user_id), safe='')}.{suffix}")
+
+    def __read_generation(self, user_id) -> int:
+        return int(self.__read_text(self.__path(user_id, "generation")) or 0)
+
+    def __read_lines(self, user_id, name: str) -> list[str]:
+        text = self.__read_text(self.__path(user_id, f"{name}.jsonl"))
+        return text.splitlines() if text else []
+
+    @staticmethod
+    def __read_text(path: str) -> str | None:
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    @staticmethod
+    def __write_text(path: str, text: str):
+        # 途中で落ちても壊れたファイルが残らないように、書き終えてから置き換える
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(f"{path}.tmp", path)
+
+
+_file_game_log = None
+
+
+def get_game_log(redis_client):
+    """
+    Return where games are stored.
+
+    `GAME_STORE_BACKEND=file` selects files under `GAME_STORE_DIR`, anything else Redis.
+    """
+    global _file_game_log
+    if os.getenv("GAME_STORE_BACKEND", "redis").lower() == "file":
+        if _file_game_log is None:
+            _file_game_log = FileGameLog(os.getenv("GAME_STORE_DIR", "games"))
+        return _file_game_log
+    return RedisGameLog(redis_client)
+
+
+def load_game(redis_client, user_id, game_log=None) -> Game | None:
+    """保存されたゲームを、スナップショットに以降の操作を適用して復元する。存在しない場合は None を返す"""
+    snapshot, tail, generation, version = (game_log or get_game_log(redis_client)).read(user_id)
+    if not snapshot:
+        return None
+
+    game = Game.from_dict(json.loads(snapshot))
+    for event in tail:
+        game.apply_event(json.loads(event))
+
+    game.events = []
+    game.log_generation = generation
+    game.log_version = version
+    game.log_tail_length = len(tail)
+    return game
+
+
+def save_game(redis_client, user_id, game: Game, game_log=None):
+    """
+    ゲームを保存し、TTL を更新する。
+
+    読み込んだゲームは保存していない操作だけを追記し、末尾が SNAPSHOT_INTERVAL 件に
+    達したらスナップショットを書き直す。新しく作ったゲームは記録を消して保存し直す。
+
+    Raises:
+        StaleGameError: 読み込んだ後に別のリクエストがゲームを保存した、または作り直した場合
+    """
+    game_log = game_log or get_game_log(redis_client)
+
+    if game.events is None:
+        game.log_generation = game_log.reset(user_id, json.dumps(game.to_dict()))
+        version, tail_length = 0, 0
+    else:
+        tail_length = game.log_tail_length + len(game.events)
+        snapshot = None
+        if tail_length >= SNAPSHOT_INTERVAL:
+            snapshot = json.dumps(game.to_dict())
+            tail_length = 0
+        version = game_log.append(user_id, game.log_generation, game.log_version, [json.dumps(event) for event in game.events], snapshot)
+        if version is None:
+            raise StaleGameError("The game was updated by another request.")
+
+    game.events = []
+    game.log_version = version
+    game.log_tail_length = tail_length
+
+
+def load_game_record(redis_client, user_id) -> list[dict]:
+    """Every stored event of a game since it was created, in order (see `Game.apply_event`)."""
+    return [json.loads(event) for event in get_game_log(redis_client).read_log(user_id)]
@@ -2,10 +2,14 @@ from models.piece.piece import Piece
 from models.type import Pieces, LastMove
 
 class ChessPiece(Piece):    
+    __slots__ = ()
+
     def __init__(self, piece_id, team, board_size, promote_line, is_banned_place=True, is_banned_promote=True, is_promoted=False, immobile_row=None, last_position=None, is_rearranged=False):
         super().__init__(piece_id, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row, last_position, is_rearranged)
 
 class ChessKing(ChessPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(_):
         """King's legal moves: one square in any direction, plus expanded castling"""
@@ -109,12 +113,16 @@ class ChessKing(ChessPiece):
 
 
 class ChessQueen(ChessPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(_):
         """Queen's legal moves: any number of squares in all directions"""
         return None, Piece.EVERY_DIRECTION()
 
 class ChessRook(ChessPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(_):
         """Rook's legal moves: any number of squares vertically or horizontally"""
@@ -148,12 +156,16 @@ class ChessRook(ChessPiece):
 
 
 class ChessBishop(ChessPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(_):
         """Bishop's legal moves: any number of squares diagonally"""
         return None, [(-1, -1), (1, -1), (-1, 1), (1, 1)]
 
 class ChessKnight(ChessPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(_):
         """Knight's legal moves: L-shaped moves"""
@@ -162,6 +174,8 @@ class ChessKnight(ChessPiece):
         return directions, None
 
 class ChessPawn(ChessPiece):
+    __slots__ = ()
+
     def __init__(self, piece_id, team, board_size, promote_line, is_banned_place=True, is_banned_promote=False, is_promoted=False, immobile_row=1, last_position=None, is_rearranged=False):
         super().__init__(piece_id, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row, last_position, is_rearranged)
 
@@ -242,6 +256,8 @@ class ChessPawn(ChessPiece):
         return Piece.get_valid_moves(position, team, board_size, pieces, positions, directions)
 
 class ChessPillar(ChessPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(_):
         """Bishop's legal moves: any number of squares diagonally"""
@@ -249,6 +265,8 @@ class ChessPillar(ChessPiece):
         return positions, None
 
 class ChessWisp(ChessPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(_):
         """Bishop's legal moves: any number of squares diagonally"""
@@ -256,6 +274,8 @@ class ChessWisp(ChessPiece):
         return positions, None
 
 class ChessLance(ChessPiece):
+    __slots__ = ()
+
     def __init__(self, piece_id, team, board_size, promote_line, is_banned_place=True, is_banned_promote=False, is_promoted=False, immobile_row=1, last_position=None, is_rearranged=False):
         super().__init__(piece_id, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row, last_position, is_rearranged)
 
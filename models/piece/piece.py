@@ -1,6 +1,34 @@
+from typing import NamedTuple
 from models.type import PieceBase, Pieces
 
+
+class PieceType(NamedTuple):
+    """Attributes shared by every piece of one class and layout in a game (flyweight)."""
+    class_name: str
+    board_size: int
+    promote_line: int
+    is_banned_place: bool
+    is_banned_promote: bool
+    immobile_row: int | None
+
+
+# 同じ属性の PieceType は一つのインスタンスを全ての駒・ゲームで共有する
+_piece_types: dict[PieceType, PieceType] = {}
+
+
+def get_piece_type(*attributes) -> PieceType:
+    piece_type = PieceType(*attributes)
+    return _piece_types.setdefault(piece_type, piece_type)
+
+
+# 行き所のない段を除いた、持ち駒を打てるマス。(チーム, 盤の大きさ, immobile_row) ごとに一度だけ作る
+_placeable_squares: dict[tuple[str, int, int | None], frozenset[tuple[int, int]]] = {}
+
+
 class Piece:
+    # 駒ごとに持つのは状態だけにする。サブクラスも __slots__ = () を宣言して __dict__ を持たない
+    __slots__ = ("__piece_id", "__type", "__team", "__is_promoted", "__last_position", "__is_rearranged")
+
     def __init__(
             self,
             piece_id: str,
@@ -15,11 +43,8 @@ class Piece:
             is_rearranged=False
     ):
         self.__piece_id = piece_id
-        self.__board_size = board_size
-        self.__promote_line = promote_line
-        self.__is_banned_place = is_banned_place
-        self.__is_banned_promote = is_banned_promote
-        self.__immobile_row = immobile_row
+        # 駒の種類と配置で決まる属性は共有し、駒ごとには状態だけを持つ
+        self.__type = get_piece_type(self.__class__.__name__, board_size, promote_line, is_banned_place, is_banned_promote, immobile_row)
 
         self.__is_rearranged = is_rearranged
 
@@ -49,13 +74,17 @@ class Piece:
         if value in ("black", "white"):
             self.__team = value
 
+    @property
+    def piece_type(self) -> PieceType:
+        return self.__type
+
     @property
     def board_size(self):
-        return self.__board_size
+        return self.__type.board_size
 
     @property
     def promote_line(self):
-        return self.__promote_line
+        return self.__type.promote_line
 
     @property
     def is_promoted(self):
@@ -67,15 +96,15 @@ class Piece:
 
     @property
     def is_banned_place(self):
-        return self.__is_banned_place
+        return self.__type.is_banned_place
 
     @property
     def is_banned_promote(self):
-        return self.__is_banned_promote
+        return self.__type.is_banned_promote
 
     @property
     def immobile_row(self):
-        return self.__immobile_row
+        return self.__type.immobile_row
 
     @property
     def is_rearranged(self):
@@ -106,6 +135,13 @@ class Piece:
         if not self.is_banned_promote and Piece.can_promote_static(self.team, from_y, to_y, self.board_size, self.promote_line):
             self.is_promoted = True
 
+    def get_state(self) -> tuple:
+        """The mutable attributes of the piece, as restored by `restore_state` (used for takebacks)."""
+        return (self.__team, self.__is_promoted, self.__last_position, self.__is_rearranged)
+
+    def restore_state(self, state):
+        self.__team, self.__is_promoted, self.__last_position, self.__is_rearranged = state
+
     def on_captured(self, captured_team):
         self.is_promoted = False
         self.team = captured_team
@@ -128,11 +164,17 @@ class Piece:
         if auto_promote and self.immobile_row and not Piece.is_behind_line(self.team, self.board_size, to_position[1], self.immobile_row):
             self.is_promoted = True
 
-    def on_place(self, position, pieces: Pieces):
-        if self.can_place(position, pieces):
+    def on_place(self, position, pieces: Pieces, pawn_columns=None):
+        if self.can_place(position, pieces, pawn_columns):
             self.__is_rearranged = True
 
-    def can_place(self, position, pieces: dict[tuple[int, int], PieceBase]) -> bool:
+    def can_place(self, position, pieces: dict[tuple[int, int], PieceBase], pawn_columns=None) -> bool:
+        """
+        Whether this captured piece can be dropped on `position`.
+
+        `pawn_columns` is the unpromoted pawn count per column of each team as kept by
+        `Board.pawn_columns` / `LightBoard.pawn_columns`; without it pieces that need it scan `pieces`.
+        """
         is_within_board = Piece.is_within_board(self.board_size, position)
         is_empty_position = not pieces.get(position)
         is_valid_row = not self.immobile_row or Piece.is_behind_line(self.team, self.board_size, position[1], self.immobile_row)
@@ -144,6 +186,12 @@ class Piece:
             and is_valid_row
         )
 
+    def get_legal_places(self, pieces: dict[tuple[int, int], PieceBase], pawn_columns=None, empty_squares=None) -> list[tuple[int, int]]:
+        """Squares this captured piece can be dropped on, in (x, y) order (see `get_legal_places_static`)."""
+        if self.is_banned_place:
+            return []
+        return type(self).get_legal_places_static(self.team, self.board_size, pieces, self.immobile_row, pawn_columns, empty_squares)
+
     def get_legal_moves(self, position, pieces: dict[tuple[int, int], PieceBase], last_move=None):
         if position:
             return self.get_legal_moves_static(position, self.team, self.is_promoted, self.board_size, pieces, self.is_first_move, self.is_rearranged, last_move)
@@ -159,6 +207,23 @@ class Piece:
     @staticmethod
     def is_behind_line(team, board_size, y, line):
         return (team == 'white' and y >= line) or (team == 'black' and y <= board_size - line - 1)
+
+    @staticmethod
+    def get_empty_squares(board_size, pieces: Pieces) -> set[tuple[int, int]]:
+        return {(x, y) for x in range(board_size) for y in range(board_size)} - pieces.keys()
+
+    @staticmethod
+    def get_placeable_squares(team, board_size, immobile_row=None) -> frozenset[tuple[int, int]]:
+        """Squares a piece of `team` may be dropped on when empty, i.e. outside its immobile rows."""
+        key = (team, board_size, immobile_row)
+        squares = _placeable_squares.get(key)
+        if squares is None:
+            squares = frozenset(
+                (x, y) for x in range(board_size) for y in range(board_size)
+                if not immobile_row or Piece.is_behind_line(team, board_size, y, immobile_row)
+            )
+            _placeable_squares[key] = squares
+        return squares
     
     @staticmethod
     def can_promote_static(from_y, to_y, team, board_size, promote_line):
@@ -312,7 +377,7 @@ class Piece:
     
     
     @classmethod
-    def can_place_static(cls, position: tuple[int, int], team, board_size, pieces: dict[tuple[int, int], PieceBase], immobile_row=None):
+    def can_place_static(cls, position: tuple[int, int], team, board_size, pieces: dict[tuple[int, int], PieceBase], immobile_row=None, pawn_columns=None):
         is_within_board = Piece.is_within_board(board_size, position)
         is_empty_position = not pieces.get(position)
         is_valid_row = not immobile_row or Piece.is_behind_line(team, board_size, position[1], immobile_row)
@@ -324,11 +389,21 @@ class Piece:
         )
 
     @classmethod
-    def get_legal_places_static(cls, team, board_size, pieces: dict[tuple[int, int], PieceBase], immobile_row=None) -> list[tuple[int, int]]:
+    def get_legal_places_static(cls, team, board_size, pieces: dict[tuple[int, int], PieceBase], immobile_row=None, pawn_columns=None, empty_squares=None) -> list[tuple[int, int]]:
+        """
+        Squares a captured piece of this class can be dropped on by `team`, in (x, y) order.
+
+        With `empty_squares` (`Board.empty_squares` / `LightBoard.empty_squares`) they are
+        the empty squares outside the immobile rows, found by a set intersection instead
+        of testing every square of the board.
+        """
+        if empty_squares is not None:
+            return sorted(Piece.get_placeable_squares(team, board_size, immobile_row) & empty_squares)
+
         positions = []
         for x in range(board_size):
             for y in range(board_size):
-                if cls.can_place_static((x, y), team, board_size, pieces, immobile_row):
+                if cls.can_place_static((x, y), team, board_size, pieces, immobile_row, pawn_columns):
                     positions.append((x, y))
         return positions
     
@@ -338,17 +413,25 @@ class Piece:
         return Piece(piece_id, position, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row)
 
     # ---- Conversion Methods ----
-    def to_dict(self):
-        return {
-            "class_name": self.__class__.__name__,
+    def to_dict(self, type_index: int | None = None):
+        """
+        Serialize the piece. With `type_index` the shared attributes are replaced by
+        an index into a `PieceType` table stored once next to the pieces.
+        """
+        data = {
             "piece_id": self.__piece_id,
             "team": self.__team,
-            "board_size": self.__board_size,
-            "promote_line": self.__promote_line,
-            "is_banned_place": self.__is_banned_place,
-            "is_banned_promote": self.__is_banned_promote,
             "is_promoted": self.__is_promoted,
-            "immobile_row": self.__immobile_row,
             "last_position": self.__last_position,
             "is_rearranged": self.__is_rearranged
         }
+        if type_index is not None:
+            data["type"] = type_index
+        else:
+            data.update(self.__type._asdict())
+        return data
+
+    @staticmethod
+    def types_to_dict(piece_types: dict[PieceType, int]) -> list[list]:
+        """The table referenced by `to_dict(type_index)`, in index order."""
+        return [list(piece_type) for piece_type in piece_types]
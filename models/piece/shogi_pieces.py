@@ -2,6 +2,8 @@ from models.piece.piece import Piece
 from models.type import Pieces
 
 class ShogiPiece(Piece):
+    __slots__ = ()
+
     DEFAULT_PROMOTE_MOVES = [
         (-1, 1), (0, 1), (1, 1),
         (-1, 0),        (1, 0),
@@ -9,6 +11,8 @@ class ShogiPiece(Piece):
     ]
 
 class ShogiKing(ShogiPiece):
+    __slots__ = ()
+
     def __init__(self, piece_id, team, board_size, promote_line, is_banned_place=False, is_banned_promote=True, is_promoted=False, immobile_row=None, last_position=None, is_rearranged=False):
         super().__init__(piece_id, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row, last_position, is_rearranged)
 
@@ -18,6 +22,8 @@ class ShogiKing(ShogiPiece):
         return Piece.EVERY_DIRECTION(), None
 
 class ShogiRook(ShogiPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(is_promoted):
         """飛車の合法手: 縦横全て"""
@@ -26,6 +32,8 @@ class ShogiRook(ShogiPiece):
         return positions, directions
 
 class ShogiBishop(ShogiPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(is_promoted):
         """角行の合法手: 斜め全て"""
@@ -34,6 +42,8 @@ class ShogiBishop(ShogiPiece):
         return positions, directions
 
 class ShogiPawn(ShogiPiece):
+    __slots__ = ()
+
     def __init__(self, piece_id, team, board_size, promote_line, is_banned_place=False, is_banned_promote=False, is_promoted=False, immobile_row=1, last_position=None, is_rearranged=False):
         super().__init__(piece_id, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row, last_position, is_rearranged)
 
@@ -44,17 +54,44 @@ class ShogiPawn(ShogiPiece):
         return directions, None
     
     @staticmethod
-    def has_pawn_in_column(team, x, pieces: Pieces):
-        return any(piece.name == "ShogiPawn" and piece.team == team and not piece.is_promoted and pos[0] == x for pos, piece in pieces.items())
+    def blocks_column(name, is_promoted) -> bool:
+        """Whether a piece forbids its team to drop a pawn in the same column (二歩)."""
+        return name == "ShogiPawn" and not is_promoted
+
+    @staticmethod
+    def count_pawn_columns(pieces: Pieces, board_size) -> dict[str, list[int]]:
+        """Unpromoted pawn count per column for each team, the index kept by the boards as `pawn_columns`."""
+        pawn_columns = {"black": [0] * board_size, "white": [0] * board_size}
+        for (x, _), piece in pieces.items():
+            if ShogiPawn.blocks_column(piece.name, piece.is_promoted):
+                pawn_columns[piece.team][x] += 1
+        return pawn_columns
+
+    @staticmethod
+    def has_pawn_in_column(team, x, pieces: Pieces, pawn_columns=None):
+        if pawn_columns is not None:
+            return pawn_columns[team][x] > 0
+        return any(ShogiPawn.blocks_column(piece.name, piece.is_promoted) and piece.team == team and pos[0] == x for pos, piece in pieces.items())
 
-    def can_place(self, position, pieces: Pieces):
-        return super().can_place(position, pieces) and not ShogiPawn.has_pawn_in_column(self.team, position[0], pieces)
+    def can_place(self, position, pieces: Pieces, pawn_columns=None):
+        return super().can_place(position, pieces) and not ShogiPawn.has_pawn_in_column(self.team, position[0], pieces, pawn_columns)
     
     @classmethod
-    def can_place_static(cls, position, team, board_size, pieces: Pieces, immobile_row=None):
-        return super().can_place_static(position, team, board_size, pieces, immobile_row) and not ShogiPawn.has_pawn_in_column(team, position[0], pieces)
+    def can_place_static(cls, position, team, board_size, pieces: Pieces, immobile_row=None, pawn_columns=None):
+        return super().can_place_static(position, team, board_size, pieces, immobile_row) and not ShogiPawn.has_pawn_in_column(team, position[0], pieces, pawn_columns)
+
+    @classmethod
+    def get_legal_places_static(cls, team, board_size, pieces: Pieces, immobile_row=None, pawn_columns=None, empty_squares=None):
+        positions = super().get_legal_places_static(team, board_size, pieces, immobile_row, pawn_columns, empty_squares)
+        if empty_squares is None:
+            return positions
+        # 空きマスから求めた場合は、二歩になる列をまとめて除く
+        columns = (pawn_columns if pawn_columns is not None else ShogiPawn.count_pawn_columns(pieces, board_size))[team]
+        return [position for position in positions if not columns[position[0]]]
 
 class ShogiLance(ShogiPiece):
+    __slots__ = ()
+
     def __init__(self, piece_id, team, board_size, promote_line, is_banned_place=False, is_banned_promote=False, is_promoted=False, immobile_row=1, last_position=None, is_rearranged=False):
         super().__init__(piece_id, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row, last_position, is_rearranged)
 
@@ -65,6 +102,8 @@ class ShogiLance(ShogiPiece):
         return positions, directions
 
 class ShogiKnight(ShogiPiece):
+    __slots__ = ()
+
     def __init__(self, piece_id, team, board_size, promote_line, is_banned_place=False, is_banned_promote=False, is_promoted=False, immobile_row=2, last_position=None, is_rearranged=False):
         super().__init__(piece_id, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row, last_position, is_rearranged)
 
@@ -75,6 +114,8 @@ class ShogiKnight(ShogiPiece):
         return directions, None
 
 class ShogiGold(ShogiPiece):
+    __slots__ = ()
+
     def __init__(self, piece_id, team, board_size, promote_line, is_banned_place=False, is_banned_promote=True, is_promoted=False, immobile_row=None, last_position=None, is_rearranged=False):
         super().__init__(piece_id, team, board_size, promote_line, is_banned_place, is_banned_promote, is_promoted, immobile_row, last_position, is_rearranged)
 
@@ -85,6 +126,8 @@ class ShogiGold(ShogiPiece):
         return directions, None
 
 class ShogiSilver(ShogiPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(is_promoted):
         """銀将の合法手: 前後斜め"""
@@ -94,6 +137,8 @@ class ShogiSilver(ShogiPiece):
         return directions, None
 
 class ShogiPhoenix(ShogiPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(_):
         """鳳凰の合法手: 縦横斜め全て"""
@@ -101,6 +146,8 @@ class ShogiPhoenix(ShogiPiece):
         return None, directions
     
 class ShogiJumper(ShogiPiece):
+    __slots__ = ()
+
     @staticmethod
     def get_relative_legal_moves(is_promoted):
         directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
@@ -0,0 +1,99 @@
+import argparse
+import contextlib
+import io
+import json
+import tempfile
+import time
+from models import game_store
+from models.ai.bench import MIDDLEGAMES
+from models.game.board import Board
+from models.game.game import Game
+from models.game.player import Player
+
+STAGES = ("load", "action", "response", "save")
+
+
+def replay_requests(game_log, board_type: str, layout: str, moves: list[tuple], timings: dict[str, float]):
+    """
+    Play a move list the way `/action` does: every ply loads the stored game,
+    performs the action, builds the response and stores the game again.
+    """
+    game = Game(
+        black=Player("black", "black", []),
+        white=Player("white", "white", []),
+        board=Board(board_type, layout, layout, True, True),
+    )
+    user_id = f"{board_type}-{layout}"
+    game_store.save_game(None, user_id, game, game_log)
+
+    for move in moves:
+        started_at = time.perf_counter()
+        game = game_store.load_game(None, user_id, game_log)
+        loaded_at = time.perf_counter()
+
+        if isinstance(move[0], str):
+            piece = game.current_player.get_captured_piece_by_name(move[0])
+            game.perform_action(piece.piece_id, False, "place", *move[1])
+        else:
+            piece = game.board.get_piece(move[0])
+            game.perform_action(piece.piece_id, len(move) > 2 and move[2], "move", *move[1])
+        acted_at = time.perf_counter()
+
+        json.dumps(game.get_game_data_dict())
+        responded_at = time.perf_counter()
+
+        game_store.save_game(None, user_id, game, game_log)
+        saved_at = time.perf_counter()
+
+        timings["load"] += loaded_at - started_at
+        timings["action"] += acted_at - loaded_at
+        timings["response"] += responded_at - acted_at
+        timings["save"] += saved_at - responded_at
+
+
+def run_request_bench(repeat: int = 5) -> dict:
+    """
+    Time the stages of the request path over the bench middlegame move lists.
+
+    Each stage reports the fastest of `repeat` passes, which is far less
+    sensitive to other load on the machine than the mean.
+    """
+    best = {stage: float("inf") for stage in STAGES}
+    requests = sum(len(moves) for _, _, moves in MIDDLEGAMES)
+    # 詰み判定のログで出力が埋まらないようにする
+    with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as directory:
+        game_log = game_store.FileGameLog(directory)
+        for _ in range(repeat):
+            timings = {stage: 0.0 for stage in STAGES}
+            for board_type, layout, moves in MIDDLEGAMES:
+                replay_requests(game_log, board_type, layout, moves, timings)
+            for stage in STAGES:
+                best[stage] = min(best[stage], timings[stage])
+
+    return {
+        "requests": requests,
+        "stagesUs": {stage: best[stage] / requests * 1e6 for stage in STAGES},
+        "totalUs": sum(best.values()) / requests * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time load / action / response / save of the /action request path, storing games in files instead of Redis.")
+    parser.add_argument("--repeat", type=int, default=10, help="Passes over the move lists; the fastest pass of each stage is reported")
+    parser.add_argument("--snapshot-interval", type=int, default=game_store.SNAPSHOT_INTERVAL, help="Events between full snapshots; 1 rewrites the whole game on every request")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    args = parser.parse_args()
+    game_store.SNAPSHOT_INTERVAL = args.snapshot_interval
+
+    result = run_request_bench(args.repeat)
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    for stage, us in result["stagesUs"].items():
+        print(f"{stage:<8}: {us:8.0f} us/request")
+    print(f"{'total':<8}: {result['totalUs']:8.0f} us/request ({result['requests']} requests per pass)")
+
+
+if __name__ == "__main__":
+    main()
@@ -58,21 +58,24 @@ class SendDataManager:
         return legals, ally_blocks
 
     @staticmethod
-    def get_legal_places(captured_pieces: list[Piece], pieces: dict[tuple[int, int], PieceBase], size: int) -> dict:
+    def get_legal_places(captured_pieces: list[Piece], pieces: dict[tuple[int, int], PieceBase], size: int, pawn_columns=None, empty_squares=None) -> dict:
+        if empty_squares is None:
+            empty_squares = Piece.get_empty_squares(size, pieces)
+
         legals = {}
+        # 同じ種類・チームの持ち駒は打てるマスも同じなので、一度だけ求めて共有する
+        places_by_type: dict[tuple, list] = {}
         for piece in captured_pieces:
-            legal_positions = []
-            for x in range(size):
-                for y in range(size):
-                    if piece.can_place((x, y), pieces):
-                        legal_positions.append((x, y))
-            legals[piece.piece_id] = legal_positions
+            key = (piece.piece_type, piece.team)
+            if key not in places_by_type:
+                places_by_type[key] = piece.get_legal_places(pieces, pawn_columns, empty_squares)
+            legals[piece.piece_id] = places_by_type[key]
         return legals
 
     @staticmethod
-    def create_legal_actions(pieces: dict[tuple[int, int], Piece], last_move: LastMove, captured_pieces: list[Piece], size: int) -> dict:
+    def create_legal_actions(pieces: dict[tuple[int, int], Piece], last_move: LastMove, captured_pieces: list[Piece], size: int, pawn_columns=None, empty_squares=None) -> dict:
         legal_moves, ally_blocks = SendDataManager.get_legal_moves_method(pieces, last_move)
-        legal_places = SendDataManager.get_legal_places(captured_pieces, pieces, size)
+        legal_places = SendDataManager.get_legal_places(captured_pieces, pieces, size, pawn_columns, empty_squares)
         actions = {}
         for piece in [*pieces.values(), *captured_pieces]:
             actions[piece.piece_id] = {
@@ -95,7 +98,9 @@ class SendDataManager:
                 game_state["pieces"],
                 game_state["last_move"], 
                 [*game_state["black_captured_pieces"], *game_state["white_captured_pieces"]], 
-                game_state["board_size"]
+                game_state["board_size"],
+                game_state.get("pawn_columns"),
+                game_state.get("empty_squares")
             ),
             "turn": {
                 "player": game_state["current_team"],
@@ -1,9 +1,21 @@
+import json
 import logging
-from flask import Blueprint, request, jsonify, json
+import queue
+import threading
+import time
+import uuid
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from models.game.game import Game
 from models.game.board import Board
 from models.game.player import Player
 from models.ai.ai_player import AIPlayer
+from models.ai.analysis import MAX_ANALYSIS_CANDIDATES, analyze_game
+from models.ai.difficulty import create_context, get_difficulty
+from models.ai.job_queue import create_job, get_job_queue
+from models.ai.result_cache import get_result_cache
+from models.ai.search_context import MAX_SEARCH_SECONDS, SearchContext, SearchStats, validate_search_limits
+from models.ai.search_stream import format_event, is_stop_requested, request_stop
+from models.game_store import StaleGameError, load_game, save_game
 from models.redis_client import get_redis_client
 
 # ログ設定（必要に応じて設定を変更）
@@ -12,9 +24,6 @@ logger = logging.getLogger(__name__)
 
 game_routes = Blueprint("game_routes", __name__)
 
-# データ保存 (14日間 = 14 * 24 * 60 * 60秒)
-TTL_IN_SECONDS = 14 * 24 * 60 * 60
-
 def validate_initialize_data(data: dict) -> None:
     """ゲーム初期化用の入力データのバリデーション"""
     required_keys = ["userId", "boardType", "black", "white"]
@@ -61,8 +70,7 @@ def initialize_game():
         game = Game(black=black, white=white, board=board)
 
         # ゲーム状態を保存 (Redisまたはデータベース)
-        game_data = json.dumps(game.to_dict())
-        get_redis_client().set(f"game_cls_dict:{user_id}", game_data, ex=TTL_IN_SECONDS)
+        save_game(get_redis_client(), user_id, game)
 
         logger.info(f"Game initialized for user_id: {user_id}")
         return jsonify({"message": "Game initialized successfully.", "userId": user_id}), 200
@@ -80,14 +88,11 @@ def get_game_instance(user_id):
     指定されたユーザーのゲーム状態を返します。
     """
     try:
-        redis_client = get_redis_client()
-        game_state_json = redis_client.get(f"game_cls_dict:{user_id}")
+        game_instance = load_game(get_redis_client(), user_id)
 
-        if not game_state_json:
+        if not game_instance:
             return jsonify({"error": "Game not initialized."}), 400
 
-        game_cls_dict = json.loads(game_state_json)
-        game_instance = Game.from_dict(game_cls_dict)
         return jsonify(game_instance.get_game_data_dict()), 200
 
     except Exception as e:
@@ -110,17 +115,22 @@ def perform_action():
             if param not in data:
                 raise ValueError(f"'{param}' is required in the request data.")
 
+        # difficulty が指定された場合は depth の代わりに強さの段階の予算で探索する
+        difficulty = data.get("difficulty")
+        if difficulty is not None:
+            get_difficulty(difficulty)
+        # depth 0 はランダムに指す
+        if data.get("isAIResponds"):
+            validate_search_limits(data.get("depth", 1) if difficulty is None else None, data.get("aiTimeout"), min_depth=0)
+
         user_id = data["userId"]
         redis_client = get_redis_client()
-        game_state_json = redis_client.get(f"game_cls_dict:{user_id}")
+        game = load_game(redis_client, user_id)
 
-        if not game_state_json:
+        if not game:
             return jsonify({"error": "Game not initialized."}), 400
 
-        game_cls_dict = json.loads(game_state_json)
-
         # アクションの実行
-        game = Game.from_dict(game_cls_dict)
         try:
             game.perform_action(
                 target_piece_id=data["targetPieceId"],
@@ -133,30 +143,277 @@ def perform_action():
             logger.error(f"Error during perform_action: {ve}")
             return jsonify({"error": str(ve)}), 400
 
-        # AIの行動
+        # AIの行動 (aiAsync の場合はジョブとしてキューに積み、すぐに返す)
+        # 千日手などで終局した場合は AI に指させない
+        ai_responds = data.get("isAIResponds") and not game.is_game_over()
+        if ai_responds and data.get("aiAsync"):
+            save_game(redis_client, user_id, game)
+            job = create_job(user_id, game.step, data.get("depth", 1), data.get("aiTimeout"), bool(data.get("aiStats")), difficulty)
+            get_job_queue().enqueue(job)
+
+            return jsonify({
+                "aiAction": None,
+                "aiJob": {"jobId": job["jobId"], "status": job["status"]},
+                "gameState": game.get_game_data_dict()
+            }), 202
+
         ai_action = None
-        if data.get("isAIResponds"):
+        ai_stats = None
+        if ai_responds:
             try:
-                ai_depth = data.get("depth", 1)  # depthが指定されていなければデフォルト値を使用
-                ai_action = AIPlayer.take_action(game, ai_depth)
+                # aiStats が指定された場合だけ探索の統計を集める
+                stats = SearchStats() if data.get("aiStats") else None
+                # aiTimeout を省略した場合も上限の秒数で打ち切る
+                deadline = time.monotonic() + (data.get("aiTimeout") or MAX_SEARCH_SECONDS)
+                if difficulty is not None:
+                    ai_depth = get_difficulty(difficulty)["depth"]
+                    context = create_context(difficulty, deadline, stats=stats)
+                else:
+                    ai_depth = data.get("depth", 1)  # depthが指定されていなければデフォルト値を使用
+                    context = SearchContext(deadline=deadline, stats=stats)
+                ai_action = AIPlayer.take_action(game, ai_depth, context, result_cache=get_result_cache())
+                if stats is not None:
+                    ai_stats = stats.to_dict(context)
+                    logger.info(f"AI search stats: {json.dumps({'userId': user_id, 'depth': ai_depth, 'difficulty': difficulty, **ai_stats})}")
             except Exception as ai_e:
                 logger.exception("Error during AI action")
                 # AIのエラーはゲーム自体への影響がないので、ログ出力にとどめる
                 ai_action = {"error": "AI failed to take action."}
 
         # 状態を更新
-        updated_game_data = json.dumps(game.to_dict())
-        redis_client.set(f"game_cls_dict:{user_id}", updated_game_data, ex=TTL_IN_SECONDS)
-        redis_client.expire(f"game_cls_dict:{user_id}", TTL_IN_SECONDS)
+        save_game(redis_client, user_id, game)
 
-        return jsonify({
+        response = {
             "aiAction": ai_action,
             "gameState": game.get_game_data_dict()
-        }), 200
+        }
+        if ai_stats is not None:
+            response["aiStats"] = ai_stats
+        return jsonify(response), 200
 
+    except StaleGameError as se:
+        # 別のリクエストが先に保存した。クライアントは読み直してやり直す
+        logger.warning(f"Stale game in perform_action: {se}")
+        return jsonify({"error": str(se)}), 409
     except ValueError as ve:
         logger.error(f"Validation error in perform_action: {ve}")
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
         logger.exception("Unexpected error during perform_action")
         return jsonify({"error": "Internal server error."}), 500
+
+def take_back(redo: bool):
+    """待った / やり直しの共通処理。保存済みの差分から局面を戻す (進める)"""
+    try:
+        data = request.get_json(force=True)
+        if not data:
+            return jsonify({"error": "No input data provided."}), 400
+        if "userId" not in data:
+            raise ValueError("'userId' is required in the request data.")
+
+        count = data.get("count", 1)
+        if not isinstance(count, int) or count < 1:
+            raise ValueError("'count' must be a positive integer.")
+
+        redis_client = get_redis_client()
+        game = load_game(redis_client, data["userId"])
+        if not game:
+            return jsonify({"error": "Game not initialized."}), 400
+
+        if redo:
+            game.redo(count)
+        else:
+            game.undo(count)
+        save_game(redis_client, data["userId"], game)
+
+        return jsonify({
+            "gameState": game.get_game_data_dict(),
+            "undoCount": len(game.deltas),
+            "redoCount": len(game.redo_deltas),
+        }), 200
+
+    except StaleGameError as se:
+        # 別のリクエストが先に保存した。クライアントは読み直してやり直す
+        logger.warning(f"Stale game in take_back: {se}")
+        return jsonify({"error": str(se)}), 409
+    except ValueError as ve:
+        logger.error(f"Validation error in take_back: {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        logger.exception("Unexpected error during take_back")
+        return jsonify({"error": "Internal server error."}), 500
+
+@game_routes.route("/undo", methods=["POST"])
+def undo_action():
+    """
+    直前の count 手 (既定 1 手) を取り消します。AI の応手も 1 手として数えます。
+    """
+    return take_back(redo=False)
+
+@game_routes.route("/redo", methods=["POST"])
+def redo_action():
+    """
+    取り消した手を count 手 (既定 1 手) やり直します。新しく指すとやり直せなくなります。
+    """
+    return take_back(redo=True)
+
+@game_routes.route("/analysis/<user_id>", methods=["GET"])
+def get_analysis(user_id):
+    """
+    現在の局面の候補手 (上位 k 手) を評価値と読み筋付きで返します。
+    """
+    try:
+        depth = request.args.get("depth", default=2, type=int)
+        k = request.args.get("k", default=3, type=int)
+        if not 1 <= k <= MAX_ANALYSIS_CANDIDATES:
+            raise ValueError(f"'k' must be an integer between 1 and {MAX_ANALYSIS_CANDIDATES}.")
+        validate_search_limits(depth)
+
+        redis_client = get_redis_client()
+        game = load_game(redis_client, user_id)
+        if not game:
+            return jsonify({"error": "Game not initialized."}), 400
+
+        return jsonify(analyze_game(game, depth, k, redis_client)), 200
+
+    except ValueError as ve:
+        logger.error(f"Validation error in get_analysis: {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        logger.exception(f"Unexpected error during analysis for user_id: {user_id}")
+        return jsonify({"error": "Internal server error."}), 500
+
+@game_routes.route("/ai/metrics", methods=["GET"])
+def get_ai_metrics():
+    """
+    AIジョブキューの滞留数と待ち時間・実行時間、結果キャッシュのヒット率を返します。
+    """
+    try:
+        return jsonify({**get_job_queue().metrics(), "resultCache": get_result_cache().stats()}), 200
+    except Exception as e:
+        logger.exception("Unexpected error retrieving AI job metrics")
+        return jsonify({"error": "Internal server error."}), 500
+
+@game_routes.route("/ai/<job_id>", methods=["GET"])
+def get_ai_job(job_id):
+    """
+    AIジョブの状態を返します。完了している場合は更新後のゲーム状態も返します。
+    """
+    try:
+        job = get_job_queue().get(job_id)
+        if not job:
+            return jsonify({"error": "AI job not found."}), 404
+
+        response = {
+            "jobId": job["jobId"],
+            "status": job["status"],
+            "aiAction": job["aiAction"],
+            "error": job["error"],
+        }
+        if job["status"] == "done":
+            game = load_game(get_redis_client(), job["userId"])
+            response["gameState"] = game.get_game_data_dict() if game else None
+
+        return jsonify(response), 200
+
+    except Exception as e:
+        logger.exception(f"Unexpected error retrieving AI job: {job_id}")
+        return jsonify({"error": "Internal server error."}), 500
+
+@game_routes.route("/ai/stream/<user_id>", methods=["GET"])
+def stream_ai_search(user_id):
+    """
+    AIの探索経過を Server-Sent Events で配信し、探索終了後に最善手を指します。
+
+    反復ごとに深さ・評価値・読み筋・ノード数・NPS を "iteration" イベントで送り、
+    最後に指した手と更新後のゲーム状態を "bestmove" イベントで送ります。
+    timeout を省略した場合は上限の秒数で打ち切ります。途中で接続が切れた場合は探索を止め、手は指しません。
+    """
+    try:
+        depth = request.args.get("depth", default=3, type=int)
+        timeout = request.args.get("timeout", default=MAX_SEARCH_SECONDS, type=float)
+        difficulty = request.args.get("difficulty")
+        if difficulty is not None:
+            depth = get_difficulty(difficulty)["depth"]
+        validate_search_limits(depth, timeout)
+        search_id = request.args.get("searchId") or uuid.uuid4().hex
+
+        redis_client = get_redis_client()
+        game = load_game(redis_client, user_id)
+        if not game:
+            return jsonify({"error": "Game not initialized."}), 400
+
+    except ValueError as ve:
+        logger.error(f"Validation error in stream_ai_search: {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        logger.exception(f"Unexpected error starting AI stream for user_id: {user_id}")
+        return jsonify({"error": "Internal server error."}), 500
+
+    events = queue.Queue()
+    # クライアントが切断したら探索を打ち切り、受け取られない手を保存しない
+    disconnected = threading.Event()
+
+    def run_search():
+        try:
+            step = game.step
+            deadline = time.monotonic() + timeout
+            should_stop = lambda: disconnected.is_set() or is_stop_requested(redis_client, search_id)
+            on_iteration = lambda info: events.put(("iteration", info))
+            if difficulty is not None:
+                context = create_context(difficulty, deadline, should_stop=should_stop, on_iteration=on_iteration)
+            else:
+                context = SearchContext(deadline=deadline, should_stop=should_stop, on_iteration=on_iteration)
+            ai_action = AIPlayer.take_action(game, depth, context)
+            if disconnected.is_set():
+                logger.info(f"Streamed AI search for user_id: {user_id} ended after the client disconnected")
+                return
+
+            current = load_game(redis_client, user_id)
+            if current is None or current.step != step:
+                events.put(("error", {"error": "Game state changed while the AI was searching."}))
+                return
+
+            save_game(redis_client, user_id, game)
+            events.put(("bestmove", {
+                "aiAction": ai_action,
+                "depth": context.completed_depth,
+                "nodes": context.nodes,
+                "gameState": game.get_game_data_dict(),
+            }))
+        except StaleGameError:
+            events.put(("error", {"error": "Game state changed while the AI was searching."}))
+        except Exception:
+            logger.exception(f"Error during streamed AI search for user_id: {user_id}")
+            events.put(("error", {"error": "AI failed to take action."}))
+        finally:
+            events.put(None)
+
+    def generate():
+        try:
+            yield format_event("start", {"searchId": search_id})
+            threading.Thread(target=run_search, daemon=True).start()
+            while (item := events.get()) is not None:
+                yield format_event(*item)
+        finally:
+            # 切断 (GeneratorExit) でも正常終了でも探索スレッドに伝える
+            disconnected.set()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@game_routes.route("/ai/stream/<search_id>/stop", methods=["POST"])
+def stop_ai_search(search_id):
+    """
+    配信中の探索を打ち切り、その時点の最善手を指させます。
+    """
+    try:
+        request_stop(get_redis_client(), search_id)
+        return jsonify({"searchId": search_id, "stopRequested": True}), 200
+
+    except Exception as e:
+        logger.exception(f"Unexpected error stopping AI search: {search_id}")
+        return jsonify({"error": "Internal server error."}), 500
@@ -0,0 +1,158 @@
+# test_game_store.py
+import json
+import random
+
+import pytest
+
+from models import game_store
+from models.ai.perft import create_game, game_actions
+from models.game.game import Game
+from models.game_store import FileGameLog, StaleGameError, load_game, save_game
+
+
+def new_game():
+    return create_game("shogi", "shogi", "shogi", [])
+
+
+def play_random(game, rng, n):
+    """Play up to `n` random actions and return them as `perform_action` arguments."""
+    actions = []
+    for _ in range(n):
+        if game.is_game_over():
+            break
+        action = rng.choice(game_actions(game))
+        game.perform_action(*action)
+        actions.append(action)
+    return actions
+
+
+def state(game):
+    return game.key, json.dumps(game.get_game_data_dict(), sort_keys=True), len(game.deltas), len(game.redo_deltas)
+
+
+@pytest.fixture
+def game_log(tmp_path):
+    return FileGameLog(str(tmp_path))
+
+
+def test_load_replays_saved_actions(game_log):
+    rng = random.Random(1)
+    game = new_game()
+    save_game(None, "u", game, game_log)
+
+    for _ in range(5):
+        game = load_game(None, "u", game_log)
+        play_random(game, rng, 2)
+        save_game(None, "u", game, game_log)
+        assert state(load_game(None, "u", game_log)) == state(game)
+
+    assert len(game_log.read_log("u")) == 10
+    assert load_game(None, "missing", game_log) is None
+
+
+def test_snapshot_is_rewritten_every_interval(game_log, monkeypatch):
+    monkeypatch.setattr(game_store, "SNAPSHOT_INTERVAL", 4)
+    rng = random.Random(2)
+    game = new_game()
+    save_game(None, "u", game, game_log)
+    first_step = game.step
+
+    for saved in range(1, 11):
+        game = load_game(None, "u", game_log)
+        play_random(game, rng, 1)
+        save_game(None, "u", game, game_log)
+
+        snapshot, tail, _, version = game_log.read("u")
+        assert version == saved
+        assert len(tail) == saved % 4
+        assert json.loads(snapshot)["step"] == first_step + saved - saved % 4
+        assert state(load_game(None, "u", game_log)) == state(game)
+
+
+def test_concurrent_save_is_rejected(game_log):
+    rng = random.Random(3)
+    save_game(None, "u", new_game(), game_log)
+
+    first = load_game(None, "u", game_log)
+    second = load_game(None, "u", game_log)
+    play_random(first, rng, 1)
+    save_game(None, "u", first, game_log)
+
+    play_random(second, rng, 1)
+    with pytest.raises(StaleGameError):
+        save_game(None, "u", second, game_log)
+    assert state(load_game(None, "u", game_log)) == state(first)
+
+
+def test_save_after_game_is_created_again_is_rejected(game_log):
+    # 作り直したゲームのログが同じ件数まで伸びても、古いゲームからは保存できない
+    rng = random.Random(4)
+    game = new_game()
+    play_random(game, rng, 1)
+    save_game(None, "u", game, game_log)
+    stale = load_game(None, "u", game_log)
+
+    save_game(None, "u", new_game(), game_log)
+    game = load_game(None, "u", game_log)
+    play_random(game, rng, 1)
+    save_game(None, "u", game, game_log)
+
+    play_random(stale, rng, 1)
+    with pytest.raises(StaleGameError):
+        save_game(None, "u", stale, game_log)
+    assert state(load_game(None, "u", game_log)) == state(game)
+
+
+def test_undo_and_redo_are_stored_as_events(game_log):
+    rng = random.Random(5)
+    save_game(None, "u", new_game(), game_log)
+    game = load_game(None, "u", game_log)
+    play_random(game, rng, 6)
+    game.undo(3)
+    game.redo(1)
+    save_game(None, "u", game, game_log)
+
+    events = [json.loads(event) for event in game_log.read_log("u")]
+    assert [event["type"] for event in events] == ["action"] * 6 + ["undo", "redo"]
+    assert events[-2:] == [{"type": "undo", "count": 3}, {"type": "redo", "count": 1}]
+
+    loaded = load_game(None, "u", game_log)
+    assert state(loaded) == state(game)
+    loaded.redo(2)
+    game.redo(2)
+    assert state(loaded) == state(game)
+
+
+def test_undo_all_and_redo_all_round_trip():
+    rng = random.Random(6)
+    game = new_game()
+    actions = play_random(game, rng, 60)
+    expected = state(game)
+
+    game.undo(len(game.deltas))
+    assert state(game) == state(new_game())[:2] + (0, len(actions))
+
+    # 取り消した手は詰めた差分のまま JSON を経由しても戻せる
+    game = Game.from_dict(json.loads(json.dumps(game.to_dict())))
+    game.redo(len(game.redo_deltas))
+    assert state(game) == expected
+
+    replayed = new_game()
+    for action in actions:
+        replayed.perform_action(*action)
+    assert state(game) == state(replayed)
+    assert game.history == replayed.history
+
+
+def test_copy_does_not_share_state():
+    rng = random.Random(7)
+    game = new_game()
+    play_random(game, rng, 4)
+    expected = state(game)
+
+    clone = game.copy()
+    play_random(clone, rng, 4)
+    clone.undo(6)
+
+    assert state(game) == expected
+    assert game.compute_key() == game.key
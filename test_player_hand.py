@@ -0,0 +1,66 @@
+# test_player_hand.py
+import random
+
+import pytest
+
+from models.ai.perft import create_game, game_actions
+from models.game.player import Player
+
+
+def assert_hand_consistent(player: Player):
+    pieces = player.captured_pieces
+    assert list(pieces) == sorted(pieces, key=lambda piece: piece.piece_id)
+    assert player.captured_piece_count == len(pieces)
+
+    for piece in pieces:
+        assert player.get_captured_piece_by_id(piece.piece_id) is piece
+        assert piece.team == player.team
+
+    names = {piece.name for piece in pieces}
+    assert player.hand_counts() == {name: sum(piece.name == name for piece in pieces) for name in names}
+    for name in names:
+        # 同じ種類では piece_id が最小の駒を打つ
+        assert player.get_captured_piece_by_name(name) is min((piece for piece in pieces if piece.name == name), key=lambda piece: piece.piece_id)
+        assert player.count_captured_pieces(name) == player.hand_counts()[name]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_hand_after_captures_and_drops(seed):
+    rng = random.Random(seed)
+    game = create_game("shogi", "shogi", "shogi", [])
+    captures = drops = 0
+
+    for _ in range(200):
+        if game.is_game_over():
+            break
+        actions = game_actions(game)
+        # 打てる駒があれば打つ手を優先して、持ち駒の出し入れを増やす
+        places = [action for action in actions if action[2] == "place"]
+        action = rng.choice(places if places and rng.random() < 0.5 else actions)
+
+        player, opponent = game.current_player, (game.white if game.current_player is game.black else game.black)
+        before = {piece.piece_id for piece in player.captured_pieces}
+        opponent_before = {piece.piece_id for piece in opponent.captured_pieces}
+        game.perform_action(*action)
+
+        after = {piece.piece_id for piece in player.captured_pieces}
+        if action[2] == "place":
+            drops += 1
+            assert after == before - {action[0]}
+            assert player.get_captured_piece_by_id(action[0]) is None
+        elif after != before:
+            captures += 1
+            assert len(after - before) == 1 and before <= after
+        assert {piece.piece_id for piece in opponent.captured_pieces} == opponent_before
+
+        assert_hand_consistent(game.black)
+        assert_hand_consistent(game.white)
+
+    assert captures and drops
+
+
+def test_place_rejects_a_piece_not_in_hand():
+    game = create_game("shogi", "shogi", "shogi", [])
+    piece = next(iter(game.board.pieces.values()))
+    with pytest.raises(ValueError):
+        game.current_player.on_place_piece(piece)
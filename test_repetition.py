@@ -0,0 +1,38 @@
+# test_repetition.py
+from models.ai.perft import create_game
+from models.game.game import Game
+
+
+def move(game: Game, from_position, to_position):
+    piece = game.board.get_piece(from_position)
+    game.perform_action(piece.piece_id, False, "move", *to_position)
+
+
+def test_fourth_occurrence_ends_the_game_by_repetition():
+    game = create_game("chess", "chess", "chess", [])
+    start = game.key
+    shuffle = [((6, 7), (5, 5)), ((6, 0), (5, 2)), ((5, 5), (6, 7)), ((5, 2), (6, 0))]
+
+    for cycle in range(3):
+        for from_position, to_position in shuffle:
+            assert game.result is None
+            move(game, from_position, to_position)
+        assert game.key == start
+        assert game.board_count[start] == cycle + 2
+
+    assert game.result == {"winner": None, "reason": "repetition"}
+
+
+def test_saved_history_keeps_counting_repetitions():
+    game = create_game("chess", "chess", "chess", [])
+    shuffle = [((6, 7), (5, 5)), ((6, 0), (5, 2)), ((5, 5), (6, 7)), ((5, 2), (6, 0))]
+    for _ in range(2):
+        for from_position, to_position in shuffle:
+            move(game, from_position, to_position)
+
+    # 保存・復元した後も、それまでの出現回数から数える
+    game = Game.from_dict(game.to_dict())
+    assert game.board_count[game.key] == 3
+    for from_position, to_position in shuffle:
+        move(game, from_position, to_position)
+    assert game.result == {"winner": None, "reason": "repetition"}
@@ -0,0 +1,81 @@
+# test_result_cache.py
+from models.ai.result_cache import AIResultCache
+
+MOVE = {"type": "move", "name": "ChessPawn", "from": (0, 1), "to": (0, 2), "promote": False}
+
+
+class FakeRedis:
+    """The few Redis commands the result cache uses, kept in dicts."""
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hincrby(self, key, field, amount):
+        counters = self.hashes.setdefault(key, {})
+        counters[field] = counters.get(field, 0) + amount
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def hincrby(self, *args):
+        self.commands.append(args)
+
+    def execute(self):
+        for args in self.commands:
+            self.redis.hincrby(*args)
+
+
+def test_front_cache_hits_and_misses():
+    cache = AIResultCache(front_size=4)
+    assert cache.get(1, "white", 3) is None
+
+    cache.put(1, "white", 3, MOVE, 1.5)
+    assert cache.get(1, "white", 3) == {"move": MOVE, "score": 1.5, "depth": 3}
+    # 手番と深さもキーに含まれる
+    assert cache.get(1, "black", 3) is None
+    assert cache.get(1, "white", 4) is None
+
+    assert cache.stats() == {"local": {"frontHits": 1, "redisHits": 0, "misses": 3, "hitRatio": 0.25}}
+
+
+def test_front_cache_evicts_the_least_recently_used_entry():
+    cache = AIResultCache(front_size=2)
+    cache.put(1, "white", 1, MOVE, 0)
+    cache.put(2, "white", 1, MOVE, 0)
+    cache.get(1, "white", 1)
+    cache.put(3, "white", 1, MOVE, 0)
+
+    assert cache.get(2, "white", 1) is None
+    assert cache.get(1, "white", 1) is not None
+    assert cache.get(3, "white", 1) is not None
+
+
+def test_redis_hits_fill_the_front_cache_and_share_the_counters():
+    redis = FakeRedis()
+    AIResultCache(redis, flush_interval=1).put(1, "white", 2, MOVE, 0.5)
+
+    cache = AIResultCache(redis, flush_interval=100)
+    result = cache.get(1, "white", 2)
+    # JSON を通った位置はタプルに戻す
+    assert result["move"] == MOVE
+    assert cache.get(1, "white", 2) == result
+    assert cache.get(2, "white", 2) is None
+
+    stats = cache.stats()
+    assert (stats["local"]["frontHits"], stats["local"]["redisHits"], stats["local"]["misses"]) == (1, 1, 1)
+    assert (stats["shared"]["frontHits"], stats["shared"]["redisHits"], stats["shared"]["misses"]) == (1, 1, 1)
@@ -1,21 +1,97 @@
 # test_routes.py
+import os
+import tempfile
 import unittest
+from unittest import mock
+
 from app import app  # アプリのインスタンスを作成するファクトリ関数
+from models import game_store
+from models.ai.perft import game_actions
+
 
-class TestRedisRoutes(unittest.TestCase):
+class TestGameRoutes(unittest.TestCase):
     def setUp(self):
         self.app = app  # Flaskアプリを作成
         self.client = self.app.test_client()  # テストクライアントを作成
 
-    def test_set_and_get(self):
-        # POSTリクエストでデータを設定
-        response = self.client.post('/set_example')
+        # Redis の代わりに一時ディレクトリへ保存する
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patcher in (
+            mock.patch.dict(os.environ, {"GAME_STORE_BACKEND": "file"}),
+            mock.patch.object(game_store, "_file_game_log", game_store.FileGameLog(directory.name)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_initialize_and_get_state(self):
+        # POSTリクエストでゲームを初期化
+        response = self.client.post('/initialize', json={
+            "userId": "user",
+            "boardType": "shogi",
+            "black": {"name": "black", "boardType": "shogi", "piecePlaceable": True},
+            "white": {"name": "white", "boardType": "shogi", "piecePlaceable": True},
+        })
         self.assertEqual(response.status_code, 200)
 
-        # GETリクエストでデータを取得
-        response = self.client.get('/get_example')
-        data = response.get_json()
-        self.assertEqual(data['example_key'], 'Hello from Redis!')
+        # GETリクエストで状態を取得
+        response = self.client.get('/state/user')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("board", response.get_json())
+
+        response = self.client.get('/state/unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_action_accepts_depth_zero(self):
+        self.client.post('/initialize', json={
+            "userId": "user",
+            "boardType": "shogi",
+            "black": {"name": "black", "boardType": "shogi", "piecePlaceable": True},
+            "white": {"name": "white", "boardType": "shogi", "piecePlaceable": True},
+        })
+
+        # depth 0 はランダムに指す
+        for is_ai_responds in (False, True):
+            game = game_store.load_game(None, "user")
+            piece_id, promote, action_type, x, y = game_actions(game)[0]
+            response = self.client.post('/action', json={
+                "userId": "user", "targetPieceId": piece_id, "actionType": action_type,
+                "promote": promote, "x": x, "y": y, "isAIResponds": is_ai_responds, "depth": 0,
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()["aiAction"] is not None, is_ai_responds)
+
+        response = self.client.post('/action', json={
+            "userId": "user", "targetPieceId": piece_id, "actionType": action_type,
+            "promote": promote, "x": x, "y": y, "isAIResponds": True, "depth": 99,
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_stale_save_returns_conflict(self):
+        self.client.post('/initialize', json={
+            "userId": "user",
+            "boardType": "shogi",
+            "black": {"name": "black", "boardType": "shogi", "piecePlaceable": True},
+            "white": {"name": "white", "boardType": "shogi", "piecePlaceable": True},
+        })
+        game = game_store.load_game(None, "user")
+        piece_id, promote, action_type, x, y = game_actions(game)[0]
+
+        # 別のリクエストが先に保存した場合は 400 ではなく 409 を返す
+        with mock.patch("routes.game_routes.save_game", side_effect=game_store.StaleGameError("stale")):
+            response = self.client.post('/action', json={
+                "userId": "user", "targetPieceId": piece_id, "actionType": action_type,
+                "promote": promote, "x": x, "y": y, "isAIResponds": False,
+            })
+            self.assertEqual(response.status_code, 409)
+
+        self.client.post('/action', json={
+            "userId": "user", "targetPieceId": piece_id, "actionType": action_type,
+            "promote": promote, "x": x, "y": y, "isAIResponds": False,
+        })
+        with mock.patch("routes.game_routes.save_game", side_effect=game_store.StaleGameError("stale")):
+            response = self.client.post('/undo', json={"userId": "user"})
+            self.assertEqual(response.status_code, 409)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,61 @@
+# test_tablebase.py
+import pytest
+
+from models.ai.ai_player import AIPlayer
+from models.ai.light import LightBoard, LightPiece
+from models.ai.tablebase import TablebaseGenerator, Tablebases, parse_signature
+
+BOARD_SIZE = 5
+
+
+@pytest.fixture(scope="module")
+def tablebases(tmp_path_factory):
+    # 5x5 の KRK (と取られた後の KK) だけを作る
+    directory = tmp_path_factory.mktemp("tablebases")
+    TablebaseGenerator(BOARD_SIZE, str(directory), log=lambda message: None).generate(
+        parse_signature("wChessKing_wChessRook_bChessKing")
+    )
+    return Tablebases(str(directory), BOARD_SIZE)
+
+
+def light_board(pieces: dict, side_to_move: str, board_size: int = BOARD_SIZE) -> LightBoard:
+    return LightBoard.from_pieces(
+        {position: LightPiece(i, name, team, False, False, False) for i, (position, (team, name)) in enumerate(pieces.items())},
+        board_size,
+        side_to_move,
+    )
+
+
+def test_probe_and_best_move_shorten_the_mate(tablebases):
+    board = light_board({(0, 0): ("black", "ChessKing"), (2, 2): ("white", "ChessKing"), (4, 4): ("white", "ChessRook")}, "white")
+    outcome, dtm = tablebases.probe(board, "white")
+    assert outcome == "win" and dtm > 0
+    assert tablebases.score(board, "white") > 0
+
+    # 最善手を指し続けると、1手ごとに詰みまでの手数が1つ減る
+    team = "white"
+    while dtm > 1:
+        move = tablebases.best_move(board, team)
+        AIPlayer.perform_move(move, board, team)
+        team = "black" if team == "white" else "white"
+        next_outcome, next_dtm = tablebases.probe(board, team)
+        assert next_outcome == ("loss" if outcome == "win" else "win")
+        assert next_dtm == dtm - 1
+        outcome, dtm = next_outcome, next_dtm
+
+
+def test_best_move_captures_an_undefended_rook(tablebases):
+    board = light_board({(0, 0): ("black", "ChessKing"), (1, 1): ("white", "ChessRook"), (4, 4): ("white", "ChessKing")}, "black")
+    assert tablebases.probe(board, "black") == ("draw", 0)
+    assert tablebases.best_move(board, "black")["to"] == (1, 1)
+
+
+def test_positions_outside_the_tables_are_not_probed(tablebases):
+    # 駒割りの表がない
+    board = light_board({(0, 0): ("black", "ChessKing"), (2, 2): ("white", "ChessKing"), (4, 4): ("white", "ChessQueen")}, "white")
+    assert tablebases.probe(board, "white") is None
+    assert tablebases.best_move(board, "white") is None
+
+    # 盤の大きさが違う
+    board = light_board({(0, 0): ("black", "ChessKing"), (2, 2): ("white", "ChessKing"), (5, 5): ("white", "ChessRook")}, "white", 6)
+    assert tablebases.probe(board, "white") is None
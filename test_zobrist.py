@@ -0,0 +1,49 @@
+# test_zobrist.py
+import random
+
+from models.ai.light import LightBoard, LightPlayer
+from models.ai.perft import create_game, game_actions
+from models.game.game import Game
+
+
+def move(game: Game, from_position, to_position):
+    piece = game.board.get_piece(from_position)
+    game.perform_action(piece.piece_id, False, "move", *to_position)
+
+
+def light_key(game: Game) -> int:
+    return LightBoard(game, LightPlayer(game.white), LightPlayer(game.black)).key
+
+
+def test_key_matches_recomputation_around_en_passant():
+    game = create_game("chess", "chess", "chess", [])
+    plies = [
+        ((4, 6), (4, 4)),
+        ((0, 1), (0, 2)),
+        ((4, 4), (4, 3)),
+        ((3, 1), (3, 3)),  # 2マス進んだので白はアンパッサンで取れる
+        ((4, 3), (3, 2)),
+    ]
+    keys = [game.key]
+    for from_position, to_position in plies:
+        move(game, from_position, to_position)
+        assert game.key == game.compute_key()
+        assert game.key == light_key(game)
+        keys.append(game.key)
+    assert game.board.get_piece((3, 3)) is None
+
+    # 待ったで戻したキーも一致する
+    for expected in reversed(keys[:-1]):
+        game.undo()
+        assert game.key == expected == game.compute_key()
+
+
+def test_key_matches_recomputation_in_random_games():
+    rng = random.Random(7)
+    for board_type in ("chess", "shogi"):
+        game = create_game(board_type, board_type, board_type, [])
+        for _ in range(120):
+            if game.is_game_over():
+                break
+            game.perform_action(*rng.choice(game_actions(game)))
+            assert game.key == game.compute_key()
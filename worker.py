@@ -0,0 +1,46 @@
+import argparse
+import logging
+import multiprocessing
+import os
+from models.ai.job_queue import RedisAIJobQueue, run_ai_job
+from models.redis_client import get_redis_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def work_loop():
+    """Redis のキューから AI ジョブを取り出して実行し続ける"""
+    redis_client = get_redis_client()
+    job_queue = RedisAIJobQueue(redis_client)
+    logger.info(f"AI worker started (pid: {os.getpid()})")
+
+    while True:
+        job = job_queue.pop(timeout=5)
+        if not job:
+            continue
+        job = run_ai_job(job_queue, job, redis_client)
+        logger.info(
+            f"AI job {job['jobId']} {job['status']} "
+            f"(wait: {job['startedAt'] - job['enqueuedAt']:.3f}s, run: {job['finishedAt'] - job['startedAt']:.3f}s)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run AI search workers consuming the Redis job queue.")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("AI_WORKER_PROCESSES", 1)))
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        work_loop()
+        return
+
+    processes = [multiprocessing.Process(target=work_loop, daemon=True) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()